@@ -1,14 +1,40 @@
 import csv
+import itertools
 
 from django.urls import reverse
-from django.contrib import admin
-from django.http import HttpResponse
+from django.contrib import admin, messages
+from django.http import StreamingHttpResponse
 from django.template import defaultfilters
 from django.contrib.auth.models import User
+from django.utils.html import format_html
 from django.utils.safestring import mark_safe
+from django.db.models.functions import Length
+
+from .search import search_filter
+from .ranking import get_ranking
+from .assignment import assign_reviewers
 
 from .models import (Profile, Submission, SubmissionReview, FrontPage, SubmissionDeadline, RegistrationStatus,
-    HelpPageItem)
+    HelpPageItem, QueuedEmail, ExtractedText, ReviewAssignment, REVIEW_STATS_FIELDS)
+
+
+# Rows fetched from the database per round trip when exporting, bounding memory use regardless of the export size
+CSV_EXPORT_CHUNK_SIZE = 2000
+
+
+class Echo:
+    """Pseudo-buffer that hands each CSV line straight back to the caller instead of storing it"""
+    def write(self, value):
+        return value
+
+
+def _csv_response(filename, header, rows):
+    """Stream rows out as a CSV attachment, fetching them from a single query in chunks"""
+    writer = csv.writer(Echo())
+    lines = (writer.writerow(row) for row in rows.iterator(chunk_size=CSV_EXPORT_CHUNK_SIZE))
+    response = StreamingHttpResponse(itertools.chain([writer.writerow(header)], lines), content_type="text/csv")
+    response["Content-Disposition"] = f"attachment; filename={filename}"
+    return response
 
 
 class ProfileAdmin(admin.ModelAdmin):
@@ -42,13 +68,19 @@ class SubmissionAdmin(admin.ModelAdmin):
         '_username',
         '_timestamp',
         '_score',
+        '_calibrated_score',
     )
     list_filter = (
         'user__username',
         'submitted_on',
     )
-    readonly_fields = ('file_hash',)
-    actions = ['_export_to_csv']
+    # Searched as well as the full text of the submission, see get_search_results()
+    search_fields = [
+        'user__username',
+        'user__profile__name',
+    ]
+    readonly_fields = ('file_hash',) + REVIEW_STATS_FIELDS + ('_calibrated_score', '_similar',)
+    actions = ['_export_to_csv', '_assign_reviewers']
 
     # Adds button in top right which will open the submission on the live site
     def view_on_site(self, obj):
@@ -66,26 +98,63 @@ class SubmissionAdmin(admin.ModelAdmin):
 
     def _score(self, obj):
         return obj.get_average_score()
+    _score.admin_order_field = 'average_score'
+
+    # Corrected for reviewers' harshness and expertise, with its 95% confidence interval, see gambit.ranking
+    def _calibrated_score(self, obj):
+        score = get_ranking().get(obj.pk)
+        if score is None:
+            return "-"
+        return f"{score.score:.2f} ({score.low:.2f}–{score.high:.2f}), controversy {score.controversy:.2f}"
+    _calibrated_score.short_description = "Calibrated score"
+
+    # Links to the change pages of submissions with nearly the same text, see Submission.get_similar()
+    def _similar(self, obj):
+        links = [
+            format_html(
+                "<a href='{}'>{}</a> ({})",
+                reverse("admin:gambit_submission_change", args=(similar.uuid,)), similar.title,
+                f"{similar.similarity:.0%}",
+            )
+            for similar in obj.get_similar()
+        ]
+        return mark_safe("<br>".join(links)) if links else "-"
+    _similar.short_description = "Similar submissions"
+
+    def get_search_results(self, request, queryset, search_term):
+        results, use_distinct = super(SubmissionAdmin, self).get_search_results(request, queryset, search_term)
+        matches = search_filter(search_term)
+        if matches is not None:
+            results |= queryset.filter(matches)
+        return results, use_distinct
 
     def _export_to_csv(self, request, queryset):
-        """I apologise for this horrendous method."""
-        response = HttpResponse(content_type="text/csv")
-        response["Content-Disposition"] = "attachment; filename=cfp-submissions.csv"
-        writer = csv.writer(response)
-        writer.writerow(['Title', 'Authors', 'Contact', 'Submitted On', 'Score', 'Submitter', 'Submitter Email', 'Country',])
-        submissions = queryset.values_list('title', 'authors', 'contact_email', 'submitted_on',)
-        for index, submission in enumerate(submissions):
-            # submission is iterated out to create a list instead of a tuple so that the score can be appended
-            # I was lazy with this and there's probably a far more elegant way to do it
-            submission = [field for field in submission]
-            submission.append(queryset[index].get_average_score())
-            submission.append(queryset[index].user.profile.name)
-            submission.append(queryset[index].user.email)
-            submission.append(queryset[index].user.profile.country)
-            writer.writerow(submission)
-        return response
+        header = ['Title', 'Authors', 'Contact', 'Submitted On', 'Score', 'Submitter', 'Submitter Email', 'Country',]
+        submissions = queryset.values_list(
+            'title',
+            'authors',
+            'contact_email',
+            'submitted_on',
+            'average_score',
+            'user__profile__name',
+            'user__email',
+            'user__profile__country',
+        )
+        return _csv_response("cfp-submissions.csv", header, submissions)
     _export_to_csv.short_description = "Export to CSV"
 
+    # Same as the assign_reviewers management command, for the selected submissions
+    def _assign_reviewers(self, request, queryset):
+        result = assign_reviewers(queryset)
+        self.message_user(request, f"Made {result.assigned} review assignments.")
+        if result.unassigned:
+            self.message_user(
+                request,
+                f"{result.unassigned} reviews could not be assigned without a conflict or exceeding the maximum load.",
+                messages.WARNING,
+            )
+    _assign_reviewers.short_description = "Assign reviewers"
+
 
 admin.site.register(Submission, SubmissionAdmin)
 
@@ -121,20 +190,72 @@ class SubmissionReviewAdmin(admin.ModelAdmin):
     _uuid_snip.short_description = "UUID"
 
     def _export_to_csv(self, request, queryset):
-        response = HttpResponse(content_type="text/csv")
-        response["Content-Disposition"] = "attachment; filename=cfp-review-comments.csv"
-        writer = csv.writer(response)
-        writer.writerow(['Reviewer', 'Comments', 'Submission Title'])
+        header = ['Reviewer', 'Comments', 'Submission Title']
         reviews = queryset.values_list('user__profile__name', 'comments', 'submission__title',)
-        for review in reviews:
-            writer.writerow(review)
-        return response
+        return _csv_response("cfp-review-comments.csv", header, reviews)
     _export_to_csv.short_description = "Export to CSV"
 
 
 admin.site.register(SubmissionReview, SubmissionReviewAdmin)
 
 
+class ReviewAssignmentAdmin(admin.ModelAdmin):
+    # Made by the assign_reviewers management command or the Submission admin action, and can be adjusted by hand
+    list_display = (
+        '_submission',
+        '_reviewer',
+        'affinity',
+        'assigned_on',
+    )
+    list_filter = (
+        'user__username',
+        'assigned_on',
+    )
+    list_select_related = ('submission', 'user')
+    raw_id_fields = ('submission', 'user')
+    readonly_fields = ('affinity', 'assigned_on',)
+
+    def _submission(self, obj):
+        return obj.submission.title
+    _submission.admin_order_field = 'submission__title'
+
+    def _reviewer(self, obj):
+        return obj.user.username
+    _reviewer.admin_order_field = 'user__username'
+
+
+admin.site.register(ReviewAssignment, ReviewAssignmentAdmin)
+
+
+class ExtractedTextAdmin(admin.ModelAdmin):
+    # Written by the extract_submission_text management command; delete a row to have its file extracted again
+    list_display = (
+        'file_hash',
+        'extracted_on',
+        '_length',
+        'error',
+    )
+    search_fields = [
+        'file_hash',
+    ]
+    readonly_fields = ('file_hash', 'text', 'error', 'extracted_on',)
+
+    def has_add_permission(self, *args, **kwargs):
+        return False
+
+    # Lets the list be sorted by the length of the text
+    def get_queryset(self, request):
+        return super(ExtractedTextAdmin, self).get_queryset(request).annotate(text_length=Length('text'))
+
+    def _length(self, obj):
+        return obj.text_length
+    _length.short_description = "Characters"
+    _length.admin_order_field = 'text_length'
+
+
+admin.site.register(ExtractedText, ExtractedTextAdmin)
+
+
 class FrontPageAdmin(admin.ModelAdmin):
     # This model is naively used to control the content display on the front page of the website
     # In later versions, this will be superceded by a content management system accessed through the website
@@ -177,3 +298,26 @@ class HelpPageItemAdmin(admin.ModelAdmin):
 
 
 admin.site.register(HelpPageItem, HelpPageItemAdmin)
+
+
+class QueuedEmailAdmin(admin.ModelAdmin):
+    list_display = (
+        'subject',
+        'recipients',
+        'status',
+        'attempts',
+        'created_on',
+        'sent_on',
+    )
+    list_filter = (
+        'status',
+        'created_on',
+    )
+    search_fields = [
+        'subject',
+        'recipients',
+    ]
+    readonly_fields = ('created_on', 'sent_on', 'last_error',)
+
+
+admin.site.register(QueuedEmail, QueuedEmailAdmin)
@@ -1,6 +1,17 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class GambitConfig(AppConfig):
     name = "gambit"
     verbose_name = "Gambit"
+
+    def ready(self):
+        # Connects the managed content cache invalidation signals
+        from . import singletons  # noqa: F401
+        # Connects the calibrated score cache invalidation signals
+        from . import ranking  # noqa: F401
+        # Registers the metrics fed by gambit.timing instrumentation
+        from . import metrics  # noqa: F401
+        from .schema import create_indexes
+        post_migrate.connect(create_indexes, sender=self)
@@ -0,0 +1,301 @@
+import re
+import math
+import heapq
+import operator
+import unicodedata
+from collections import Counter, defaultdict, namedtuple
+
+from django.conf import settings
+from django.db import transaction
+from django.contrib.auth.models import User
+
+from .permissions import PROGRAMME_COMMITTEE
+from .models import Submission, SubmissionReview, ReviewAssignment
+
+
+# Assigns Programme Committee members to review submissions: every submission gets a target number of reviewers,
+# no reviewer gets more than a maximum load, nobody reviews a submission they are conflicted with, and within those
+# constraints the total affinity of reviewers for their submissions is as high as possible.
+#
+# Affinity is the similarity of a submission's text to the submissions a reviewer has reviewed before, weighted by
+# the expertise they claimed. Conflicts are the reviewer's own submissions, and those that name them (or give their
+# email address) in the free-text conflicts or authors fields.
+#
+# The optimisation is solved with an auction (see solve()), which handles thousands of submissions and dozens of
+# reviewers in seconds in pure Python.
+
+# Affinities are scaled to integers in 0..AFFINITY_SCALE for the solver
+AFFINITY_SCALE = 1000
+# Terms kept in each reviewer's interest profile
+PROFILE_TERMS = 100
+# Terms found in more than this fraction of submissions say nothing about their subject
+MAX_DOCUMENT_FREQUENCY = 0.2
+
+Result = namedtuple("Result", ["assigned", "unassigned"])
+
+
+def solve(benefits, demands, capacities):
+    """Return the reviewers assigned to each submission, maximising the total benefit
+
+    benefits[i] maps each reviewer j who may review submission i to the integer benefit of them doing so; a reviewer
+    missing from the mapping can't be assigned to i. Submission i needs demands[i] distinct reviewers, and reviewer j
+    can take at most capacities[j] submissions. Returns a list, per submission, of the reviewers assigned to it, which
+    has fewer than demanded only where the constraints can't all be met.
+
+    This is a forward auction with epsilon scaling (Bertsekas) for the b-matching problem. Each place on a submission
+    is a bidder, and each unit of a reviewer's capacity an object for sale. A place bids for the reviewer offering the
+    most benefit net of price, raising the price of that reviewer's cheapest unit by the margin over its second choice
+    plus epsilon and outbidding whoever held it. The places of one submission never bid for a reviewer another of them
+    holds. A place that can't be filled is assigned to nobody, a reviewer worth a penalty larger than any total of
+    benefits less than the others, and units that no place needs go to idle bidders. That keeps the problem symmetric,
+    so that prices carried between scaling phases can't strand a place or a unit. The final phase runs with epsilon at
+    1, leaving the total benefit within one per place of the optimum.
+    """
+    places = [i for i, demand in enumerate(demands) for _ in range(demand)]
+    if not places:
+        return [[] for _ in demands]
+    forbidden = float("-inf")
+    largest = max((benefit for reviewers in benefits for benefit in reviewers.values()), default=0)
+    # Leaving a place empty costs more than any reassignment of the others could gain
+    penalty = (largest + 1) * len(places)
+    # A place is left empty by assigning it to nobody. Places left empty by a greedy assignment bound how many the
+    # optimum leaves empty, so nobody needs only that many units, which is usually none.
+    remaining = list(capacities)
+    empty = 0
+    for reviewers, demand in zip(benefits, demands):
+        chosen = heapq.nlargest(demand, (j for j in reviewers if remaining[j]), key=remaining.__getitem__)
+        for j in chosen:
+            remaining[j] -= 1
+        empty += demand - len(chosen)
+    nobody = len(capacities)
+    capacities = list(capacities) + [empty]
+    idle = len(demands)
+    places += [idle] * (sum(capacities) - len(places))
+    # Dense rows of benefits, so that each bid is evaluated by C loops in map() and max(). Rather than places paying
+    # the penalty for nobody, idle bidders are paid it, which is the same up to a constant and keeps them off reviewers
+    # that places want
+    rows = [[reviewers.get(j, forbidden) for j in range(nobody)] + [0] for reviewers in benefits]
+    rows.append([0] * nobody + [penalty])
+
+    # Each reviewer's units of capacity, as a heap of [price, unit], and the price of the cheapest
+    units = [[[0, unit] for unit in range(capacity)] for capacity in capacities]
+    lowest = [0 if capacity else float("inf") for capacity in capacities]
+    prices = [[0] * capacity for capacity in capacities]
+    holders = [[None] * capacity for capacity in capacities]
+    assigned_to = [None] * len(places)
+    held_units = [None] * len(places)
+    epsilon = max(largest // 2, 1)
+    while True:
+        # Every place bids again with the smaller epsilon, but an idle bidder can keep a unit still within epsilon of
+        # its best choice, which is most of them
+        floor = max(map(operator.sub, rows[idle], lowest)) - epsilon
+        queue = []
+        for place, j in enumerate(assigned_to):
+            if j is not None and places[place] == idle and rows[idle][j] - prices[j][held_units[place]] >= floor:
+                continue
+            if j is not None:
+                holders[j][held_units[place]] = None
+                assigned_to[place] = None
+            queue.append(place)
+        # The reviewers held by the places of each submission
+        held = [[] for _ in range(idle + 1)]
+        while queue:
+            place = queue.pop()
+            i = places[place]
+            values = list(map(operator.sub, rows[i], lowest))
+            for j in held[i]:
+                values[j] = forbidden
+            best = max(values)
+            j = values.index(best)
+            values[j] = forbidden
+            # With no alternative at all, any rise in price keeps the place here
+            second = max(max(values), best - penalty)
+            heap = units[j]
+            # Another unit of the same reviewer is an alternative too
+            if len(heap) > 1:
+                second = max(second, best + lowest[j] - min(entry[0] for entry in heap[1:3]))
+            unit = heap[0][1]
+            price = lowest[j] + best - second + epsilon
+            heapq.heapreplace(heap, [price, unit])
+            lowest[j] = heap[0][0]
+            prices[j][unit] = price
+            outbid = holders[j][unit]
+            if outbid is not None:
+                if j != nobody and places[outbid] != idle:
+                    held[places[outbid]].remove(j)
+                assigned_to[outbid] = None
+                queue.append(outbid)
+            holders[j][unit] = place
+            if j != nobody and i != idle:
+                held[i].append(j)
+            assigned_to[place] = j
+            held_units[place] = unit
+        if epsilon == 1:
+            break
+        epsilon = max(epsilon // 4, 1)
+
+    assignment = [[] for _ in demands]
+    for place, j in enumerate(assigned_to):
+        if places[place] != idle and j != nobody:
+            assignment[places[place]].append(j)
+    return assignment
+
+
+def normalise(text):
+    """Fold case and accents so that names match however they were typed"""
+    text = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+def get_terms(text):
+    return re.findall(r"[^\W\d_]{3,}", normalise(text))
+
+
+def get_reviewer_names(reviewer):
+    """Return the ways a reviewer might be named in a submission's conflicts, normalised"""
+    names = {reviewer.email, reviewer.get_full_name(), getattr(getattr(reviewer, "profile", None), "name", "")}
+    # A lone first name would match far too much
+    names = {" ".join(normalise(name).split()) for name in names if name}
+    return {name for name in names if " " in name or "@" in name}
+
+
+def get_conflicts(submissions, reviewers):
+    """Return the set of (submission pk, reviewer pk) pairs that mustn't be assigned"""
+    names = defaultdict(set)
+    for reviewer in reviewers:
+        for name in get_reviewer_names(reviewer):
+            names[name].add(reviewer.pk)
+    conflicts = set()
+    pattern = None
+    if names:
+        alternatives = "|".join(
+            r"\s+".join(re.escape(part) for part in name.split()) for name in sorted(names, key=len, reverse=True)
+        )
+        pattern = re.compile(rf"(?<!\w)(?:{alternatives})(?!\w)")
+    reviewer_pks = {reviewer.pk for reviewer in reviewers}
+    for submission in submissions:
+        if submission.user_id in reviewer_pks:
+            conflicts.add((submission.pk, submission.user_id))
+        text = normalise(f"{submission.conflicts}\n{submission.authors}\n{submission.contact_email}")
+        for match in pattern.finditer(text) if pattern else ():
+            name = re.sub(r"\s+", " ", match.group())
+            conflicts.update((submission.pk, reviewer_pk) for reviewer_pk in names[name])
+    return conflicts
+
+
+def get_affinities(submissions, reviewers):
+    """Return {(submission pk, reviewer pk): affinity from 0 to 1} for the pairs with any affinity
+
+    A reviewer's interests are the terms of the submissions they've reviewed, weighted by the expertise they claimed,
+    and affinity is the cosine similarity of those interests to a submission's terms, with terms weighted by inverse
+    document frequency.
+    """
+    documents = {
+        submission.pk: Counter(get_terms(f"{submission.title} {submission.abstract}")) for submission in submissions
+    }
+    reviewed = (
+        SubmissionReview.objects.filter(user__in=reviewers)
+        .values_list("user_id", "expertise_score", "submission__title", "submission__abstract")
+    )
+    interests = defaultdict(Counter)
+    for user_id, expertise, title, abstract in reviewed.iterator():
+        for term, count in Counter(get_terms(f"{title} {abstract}")).items():
+            interests[user_id][term] += count * expertise
+    if not documents or not interests:
+        return {}
+
+    frequency = Counter(term for document in documents.values() for term in document)
+    common = len(documents) * MAX_DOCUMENT_FREQUENCY
+    idf = {
+        term: math.log(len(documents) / count) + 1 for term, count in frequency.items() if count <= max(common, 1)
+    }
+
+    def unit_vector(counts, limit=None):
+        weights = {term: count * idf[term] for term, count in counts.items() if term in idf}
+        if limit:
+            weights = dict(sorted(weights.items(), key=lambda item: item[1], reverse=True)[:limit])
+        norm = math.sqrt(sum(weight * weight for weight in weights.values()))
+        return {term: weight / norm for term, weight in weights.items()} if norm else {}
+
+    # Postings of each term in the reviewers' profiles, so each submission is only compared on the terms it has
+    postings = defaultdict(list)
+    for user_id, counts in interests.items():
+        for term, weight in unit_vector(counts, PROFILE_TERMS).items():
+            postings[term].append((user_id, weight))
+    affinities = defaultdict(float)
+    for submission_pk, counts in documents.items():
+        for term, weight in unit_vector(counts).items():
+            for user_id, reviewer_weight in postings.get(term, ()):
+                affinities[submission_pk, user_id] += weight * reviewer_weight
+    return affinities
+
+
+def get_reviewers():
+    return list(
+        User.objects.filter(groups__name=PROGRAMME_COMMITTEE, is_active=True).select_related("profile").order_by("pk")
+    )
+
+
+@transaction.atomic
+def assign_reviewers(submissions, reviews_per_submission=None, max_load=None):
+    """Assign Programme Committee members to review the given submissions, returning what was and wasn't assigned
+
+    Reviews already written or assigned count towards each submission's target and each reviewer's load, so this can
+    be run again as submissions come in. The maximum load defaults to settings.REVIEWER_MAX_LOAD, or if that is 0, to
+    an even share of all the reviews of the same conferences' submissions, both those already written or assigned and
+    those still needed.
+    """
+    if reviews_per_submission is None:
+        reviews_per_submission = settings.REVIEWS_PER_SUBMISSION
+    submissions = list(submissions.order_by("pk"))
+    reviewers = get_reviewers()
+    submission_pks = [submission.pk for submission in submissions]
+    reviewer_index = {reviewer.pk: j for j, reviewer in enumerate(reviewers)}
+
+    covered = defaultdict(set)
+    for model in (SubmissionReview, ReviewAssignment):
+        for submission_pk, user_id in model.objects.filter(submission__in=submission_pks).values_list(
+            "submission_id", "user_id",
+        ):
+            covered[submission_pk].add(user_id)
+    demands = [max(reviews_per_submission - len(covered[pk]), 0) for pk in submission_pks]
+
+    # Reviews written or assigned for the same conferences count towards a reviewer's load, once each however many
+    # of a review and an assignment there are
+    years = {submission.submitted_on.year for submission in submissions}
+    reviewed = set()
+    for model in (SubmissionReview, ReviewAssignment):
+        reviewed.update(
+            model.objects.filter(user__in=reviewers, submission__submitted_on__year__in=years)
+            .values_list("submission_id", "user_id")
+        )
+    load = Counter(user_id for _, user_id in reviewed)
+    if max_load is None:
+        max_load = settings.REVIEWER_MAX_LOAD or math.ceil((len(reviewed) + sum(demands)) / max(len(reviewers), 1))
+    capacities = [max(max_load - load[reviewer.pk], 0) for reviewer in reviewers]
+
+    conflicts = get_conflicts(submissions, reviewers)
+    affinities = get_affinities(submissions, reviewers)
+    benefits = [
+        {
+            reviewer_index[reviewer.pk]: round(affinities.get((pk, reviewer.pk), 0) * AFFINITY_SCALE)
+            for reviewer in reviewers
+            if reviewer.pk not in covered[pk] and (pk, reviewer.pk) not in conflicts
+        }
+        for pk in submission_pks
+    ]
+
+    assignment = solve(benefits, demands, capacities)
+    ReviewAssignment.objects.bulk_create(
+        ReviewAssignment(
+            submission_id=pk,
+            user_id=reviewers[j].pk,
+            affinity=affinities.get((pk, reviewers[j].pk), 0),
+        )
+        for pk, assigned in zip(submission_pks, assignment)
+        for j in assigned
+    )
+    return Result(
+        assigned=sum(len(assigned) for assigned in assignment),
+        unassigned=sum(demands) - sum(len(assigned) for assigned in assignment),
+    )
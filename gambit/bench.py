@@ -0,0 +1,336 @@
+import time
+import random
+import platform
+import statistics
+import subprocess
+from io import StringIO
+from datetime import timedelta
+from collections import namedtuple
+
+import django
+from django.conf import settings
+from django.test import Client
+from django.urls import reverse, URLPattern
+from django.utils import timezone
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.core.management import call_command
+from django.contrib.auth.models import User, Group
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.tokens import default_token_generator
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from . import cache, urls, ranking, singletons
+from .forms import SignUpForm
+from .search import search
+from .blacklist import reserved
+from .permissions import PROGRAMME_COMMITTEE
+from .tokens import account_activation_token
+from .models import (
+    Profile, Submission, SubmissionReview, SubmissionDeadline, RegistrationStatus, FrontPage, HelpPageItem,
+    refresh_review_stats,
+)
+
+
+# Seeds a realistic volume of data and times every view in gambit.urls, as each kind of user, plus a handful of model
+# hot paths. Everything runs inside a transaction that is rolled back afterwards, so it can be pointed at a copy of a
+# real database. The report is keyed by case name so that reports from different commits can be compared.
+
+REPORT_VERSION = 1
+PASSWORD = "benchmark-password"
+ROLES = ("anonymous", "submitter", "programme_committee")
+
+# Views that change state on GET, so timing them repeatedly is meaningless
+SKIPPED_URLS = {"logout", "activate"}
+
+# Model and form hot paths, timed alongside the views. Name -> callable taking the seeded Fixtures.
+cases = {}
+
+
+def case(name):
+    """Register a function to be timed by the benchmark"""
+    def decorator(func):
+        cases[name] = func
+        return func
+    return decorator
+
+
+# The seeded objects that benchmark cases and URL arguments are built from
+Fixtures = namedtuple("Fixtures", ["submitter", "reviewer", "submission", "review", "unreviewed"])
+
+
+def seed(users=5000, submissions=3000, reviews=30000, reviewers=50, random_seed=0):
+    """Bulk create users, profiles, submissions and reviews, returning the Fixtures used by the benchmark"""
+    rng = random.Random(random_seed)
+    reviewers = min(reviewers, users)
+    password = make_password(PASSWORD)
+    prefix = f"bench{int(time.time())}"
+
+    User.objects.bulk_create(
+        (
+            User(username=f"{prefix}.{i}", email=f"{prefix}.{i}@example.org", password=password, is_active=True)
+            for i in range(users)
+        ),
+    )
+    # Not every database returns primary keys from bulk_create
+    created = list(User.objects.filter(username__startswith=f"{prefix}.").order_by("pk"))
+    Profile.objects.bulk_create(
+        (
+            Profile(user_id=user.pk, name=f"Benchmark User {i}", country=rng.choice(["United Kingdom", "France", "Canada"]))
+            for i, user in enumerate(created)
+        ),
+    )
+    committee, _ = Group.objects.get_or_create(name=PROGRAMME_COMMITTEE)
+    committee_members, speakers = created[:reviewers], created[reviewers:] or created
+    Group.user_set.through.objects.bulk_create(
+        Group.user_set.through(user_id=user.pk, group=committee) for user in committee_members
+    )
+
+    Submission.objects.bulk_create(
+        (
+            Submission(
+                user=rng.choice(speakers),
+                title=f"Benchmark submission {i}",
+                contact_email=f"speaker{i}@example.org",
+                abstract=" ".join(rng.choice(["python", "security", "data", "web", "talk"]) for _ in range(200)),
+            )
+            for i in range(submissions)
+        ),
+    )
+    seeded = list(Submission.objects.filter(title__startswith="Benchmark submission ").values_list("pk", flat=True))
+
+    # Each reviewer reviews a submission at most once
+    pairs = set()
+    limit = min(reviews, len(seeded) * len(committee_members))
+    while len(pairs) < limit:
+        pairs.add((rng.randrange(len(committee_members)), rng.randrange(len(seeded))))
+    SubmissionReview.objects.bulk_create(
+        (
+            SubmissionReview(
+                user=committee_members[reviewer],
+                submission_id=seeded[submission],
+                expertise_score=rng.randint(1, 5),
+                submission_score=rng.randint(1, 5),
+                comments="Benchmark review",
+            )
+            for reviewer, submission in sorted(pairs)
+        ),
+    )
+    # bulk_create doesn't send signals, so the denormalised statistics need rebuilding
+    call_command("rebuild_review_stats", stdout=StringIO())
+    seed_managed_content()
+
+    reviewer = committee_members[0]
+    submission = Submission.objects.select_related("user").get(pk=seeded[0])
+    review = SubmissionReview.objects.filter(user=reviewer).first()
+    unreviewed = Submission.objects.exclude(submissionreview__user=reviewer).first()
+    return Fixtures(submission.user, reviewer, submission, review, unreviewed)
+
+
+def seed_managed_content():
+    """Add the managed content that pages expect, where it's missing"""
+    if not SubmissionDeadline.objects.exists():
+        SubmissionDeadline.objects.create(name="Deadline", date=timezone.now() + timedelta(days=30))
+    if not RegistrationStatus.objects.exists():
+        RegistrationStatus.objects.create(name="Registration", disabled=False)
+    if not FrontPage.objects.exists():
+        FrontPage.objects.create(name="Front page", leading_paragraph="Benchmark")
+    if not HelpPageItem.objects.exists():
+        HelpPageItem.objects.create(name="Help", title="Help", content="Benchmark")
+
+
+def get_url_kwargs(fixtures):
+    """Return URL name -> reverse() kwargs for the views that take arguments"""
+    uidb64 = urlsafe_base64_encode(force_bytes(fixtures.submitter.pk)).decode()
+    return {
+        "submission": {"uuid": fixtures.submission.pk},
+        "update_submission": {"pk": fixtures.submission.pk},
+        "download_submission": {"pk": fixtures.submission.pk},
+        "new_review": {"uuid": fixtures.unreviewed.pk if fixtures.unreviewed else fixtures.submission.pk},
+        "update_review": {"pk": fixtures.review.pk if fixtures.review else fixtures.submission.pk},
+        "activate": {"uidb64": uidb64, "token": account_activation_token.make_token(fixtures.submitter)},
+        "password_reset_confirm": {
+            "uidb64": uidb64,
+            "token": default_token_generator.make_token(fixtures.submitter),
+        },
+    }
+
+
+def get_urls(fixtures, names=None):
+    """Return (name, path) for every view in gambit.urls, skipping included URLconfs such as the admin"""
+    kwargs = get_url_kwargs(fixtures)
+    found = []
+    for pattern in urls.urlpatterns:
+        if not isinstance(pattern, URLPattern) or not pattern.name:
+            continue
+        if pattern.name in SKIPPED_URLS or (names and pattern.name not in names):
+            continue
+        if pattern.pattern.regex.groups and pattern.name not in kwargs:
+            continue
+        found.append((pattern.name, reverse(pattern.name, kwargs=kwargs.get(pattern.name))))
+    return found
+
+
+def summarise(timings):
+    """Return summary statistics, in milliseconds, for a list of timings in seconds"""
+    timings = sorted(t * 1000 for t in timings)
+    return {
+        "rounds": len(timings),
+        "min": timings[0],
+        "max": timings[-1],
+        "mean": statistics.mean(timings),
+        "median": statistics.median(timings),
+        "p95": timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+        "stddev": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+    }
+
+
+def measure(func, repeat, warmup=1):
+    """Time repeated calls of func, returning its last result, the number of queries it ran and the timings"""
+    for _ in range(warmup):
+        func()
+    timings = []
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            result = func()
+            timings.append(time.perf_counter() - started)
+    return result, len(queries), timings
+
+
+def get_client(role, fixtures):
+    client = Client()
+    if role == "submitter":
+        client.force_login(fixtures.submitter)
+    elif role == "programme_committee":
+        client.force_login(fixtures.reviewer)
+    return client
+
+
+def bench_urls(fixtures, repeat=10, names=None):
+    """Time a GET of every URL as every role"""
+    results = []
+    # Test clients talk to "testserver" over plain HTTP
+    with override_settings(ALLOWED_HOSTS=["*"], SECURE_SSL_REDIRECT=False):
+        for role in ROLES:
+            client = get_client(role, fixtures)
+            for name, path in get_urls(fixtures, names):
+                result = {"name": f"GET {name} as {role}", "path": path}
+                try:
+                    response, queries, timings = measure(lambda: client.get(path), repeat)
+                except Exception as e:
+                    # The test client re-raises errors from views; record them rather than abandon the run
+                    result["error"] = f"{e.__class__.__name__}: {e!s}"
+                else:
+                    content = b"".join(response.streaming_content) if response.streaming else response.content
+                    result.update({
+                        "status": response.status_code,
+                        "bytes": len(content),
+                        "queries": queries,
+                        "stats": summarise(timings),
+                    })
+                results.append(result)
+    return results
+
+
+def bench_cases(fixtures, repeat=10, names=None):
+    """Time every registered case"""
+    results = []
+    for name, func in sorted(cases.items()):
+        if names and name not in names:
+            continue
+        _, queries, timings = measure(lambda: func(fixtures), repeat)
+        results.append({"name": name, "queries": queries, "stats": summarise(timings)})
+    return results
+
+
+@case("submission_list")
+def submission_list(fixtures):
+    return list(Submission.objects.with_review_stats())
+
+
+@case("submission_search")
+def submission_search(fixtures):
+    return list(search(Submission.objects.with_review_stats(), "python secur")[:20])
+
+
+@case("calculate_ranking")
+def calculate_ranking(fixtures):
+    return ranking.calculate_ranking()
+
+
+@case("refresh_review_stats")
+def refresh_stats(fixtures):
+    refresh_review_stats(fixtures.submission.pk)
+
+
+@case("signup_form_validation")
+def signup_form_validation(fixtures):
+    form = SignUpForm(data={
+        "username": "new.speaker",
+        "email": "new.speaker@example.org",
+        "password1": PASSWORD,
+        "password2": PASSWORD,
+        "name": "New Speaker",
+        "country": "United Kingdom",
+    })
+    return form.is_valid()
+
+
+@case("reserved_username_check")
+def reserved_username_check(fixtures):
+    return [username in reserved for username in ("new.speaker", "Adm1nistrator", "billing-support")]
+
+
+def get_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(volumes, repeat=10, names=None, keep=False):
+    """Seed the database, run every benchmark and return the report"""
+    started = time.perf_counter()
+    try:
+        with transaction.atomic():
+            fixtures = seed(**volumes)
+            seeded = time.perf_counter() - started
+            results = bench_urls(fixtures, repeat, names) + bench_cases(fixtures, repeat, names)
+            transaction.set_rollback(not keep)
+    finally:
+        # Cached managed content and calibrated scores may refer to rows that were just rolled back
+        for model in (SubmissionDeadline, RegistrationStatus, FrontPage, HelpPageItem):
+            singletons.invalidate(model)
+        cache.bump(ranking.NAMESPACE)
+        ranking.clear()
+    return {
+        "version": REPORT_VERSION,
+        "commit": get_commit(),
+        "created_on": timezone.now().isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "database": connection.vendor,
+            "cache": settings.CACHES["default"]["BACKEND"],
+            "machine": platform.machine(),
+        },
+        "volumes": volumes,
+        "repeat": repeat,
+        "seed_seconds": seeded,
+        "results": sorted(results, key=lambda result: result["name"]),
+    }
+
+
+def compare(baseline, report):
+    """Return (name, baseline median, median, percentage change) for the results present in both reports"""
+    previous = {result["name"]: result["stats"]["median"] for result in baseline["results"] if "stats" in result}
+    changes = []
+    for result in report["results"]:
+        if result["name"] in previous and "stats" in result:
+            before, after = previous[result["name"]], result["stats"]["median"]
+            changes.append((result["name"], before, after, (after - before) / before * 100 if before else 0.0))
+    return changes
@@ -1,3 +1,9 @@
+import unicodedata
+from collections import deque
+
+from django.conf import settings
+
+
 # List of vanity usernames to restrict
 # Includes common system usernames, TLD's, and languages
 
@@ -441,3 +447,133 @@ reserved_usernames = [
     'zm',
     'zw',
 ]
+
+# Patterns restricting whole families of usernames; "*" matches any run of characters at the start and/or end
+reserved_patterns = [
+    'admin*',
+    '*-admin',
+    '*_admin',
+    '*.admin',
+    '*-support',
+    '*_support',
+    '*.support',
+    'hostmaster*',
+    'no-reply*',
+    'noreply*',
+    'postmaster*',
+    'webmaster*',
+]
+
+
+# Characters that are commonly mistaken for one another, mapped onto a single representative. Usernames are compared
+# by this "skeleton", so that e.g. "Adm1n" or a Cyrillic "аdmin" can't be registered to impersonate "admin".
+CONFUSABLES = str.maketrans({
+    # Digits and symbols standing in for letters
+    '0': 'o', '1': 'l', 'i': 'l', '|': 'l', '!': 'l', '$': 's', '@': 'a',
+    # Cyrillic
+    'а': 'a', 'в': 'b', 'е': 'e', 'ё': 'e', 'һ': 'h', 'і': 'l', 'ї': 'l', 'ј': 'j', 'к': 'k', 'м': 'm', 'н': 'h',
+    'о': 'o', 'р': 'p', 'с': 'c', 'т': 't', 'у': 'y', 'х': 'x', 'ѕ': 's', 'ԁ': 'd', 'ԛ': 'q', 'ԝ': 'w',
+    # Greek
+    'α': 'a', 'β': 'b', 'ε': 'e', 'η': 'n', 'ι': 'l', 'κ': 'k', 'ν': 'v', 'ο': 'o', 'ρ': 'p', 'τ': 't', 'υ': 'u',
+    'χ': 'x', 'ω': 'w',
+    # Latin lookalikes
+    'ı': 'l', 'ǀ': 'l', 'ɑ': 'a', 'ɡ': 'g', 'ʀ': 'r',
+})
+
+
+def skeleton(username):
+    """Return the normalised form of a username used for comparisons"""
+    username = unicodedata.normalize('NFKC', username).casefold()
+    # Strip combining marks so that accented letters match their base letter
+    username = ''.join(c for c in unicodedata.normalize('NFD', username) if not unicodedata.combining(c))
+    return username.translate(CONFUSABLES).replace('rn', 'm').replace('vv', 'w')
+
+
+# Anchors wrapped around usernames before they are scanned by the pattern automaton. Usernames can't contain control
+# characters, so neither can appear in a username itself.
+_START = '\x02'
+_END = '\x03'
+
+
+class PatternAutomaton:
+    """Aho-Corasick automaton matching many substrings in a single pass over the input"""
+
+    def __init__(self, needles):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [False]
+        for needle in needles:
+            state = 0
+            for char in needle:
+                if char not in self.goto[state]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append(False)
+                    self.goto[state][char] = len(self.goto) - 1
+                state = self.goto[state][char]
+            self.output[state] = True
+        # Breadth-first so that every state's failure link is known before its children need it
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self.goto[state].items():
+                queue.append(child)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0)
+                self.output[child] = self.output[child] or self.output[self.fail[child]]
+
+    def search(self, text):
+        """Return whether any needle occurs in text"""
+        state = 0
+        for char in text:
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            if self.output[state]:
+                return True
+        return False
+
+
+class ReservedUsernames:
+    """Compiled set of reserved usernames and patterns, supporting `username in reserved`"""
+
+    def __init__(self, entries):
+        names = set()
+        needles = set()
+        for entry in entries:
+            entry = entry.strip()
+            if not entry or entry.startswith('#'):
+                continue
+            prefix = entry.startswith('*')
+            suffix = entry.endswith('*')
+            name = skeleton(entry.strip('*'))
+            if not name:
+                continue
+            if not prefix and not suffix:
+                names.add(name)
+            else:
+                # "admin*" has to match at the start of a username, "*-support" at the end and "*root*" anywhere
+                needles.add(f"{'' if prefix else _START}{name}{'' if suffix else _END}")
+        self.names = frozenset(names)
+        self.patterns = PatternAutomaton(needles) if needles else None
+
+    def __contains__(self, username):
+        name = skeleton(username)
+        if name in self.names:
+            return True
+        return self.patterns is not None and self.patterns.search(f"{_START}{name}{_END}")
+
+
+def _load_entries(path):
+    """Read an external list of reserved usernames and patterns, one per line"""
+    if not path:
+        return []
+    with open(path, encoding='utf-8') as f:
+        return f.read().splitlines()
+
+
+reserved = ReservedUsernames(
+    reserved_usernames + reserved_patterns + _load_entries(settings.RESERVED_USERNAMES_FILE)
+)
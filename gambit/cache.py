@@ -0,0 +1,81 @@
+import time
+
+from django.core.cache import cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+
+
+# Application-wide access to the shared cache.
+#
+# Every key lives in a namespace ("gambit:<namespace>:<generation>:<key>"). Namespaces carry a generation number that
+# is part of every key, so bump() invalidates everything in a namespace with a single write: the old keys are never
+# read again and fall out of the cache on their own. Deployment-wide invalidation is handled by the cache VERSION,
+# set through the CACHE_URL (e.g. ?version=2).
+#
+# Values are stored wrapped in a tuple so that None can be cached and told apart from a miss.
+
+KEY_PREFIX = "gambit"
+
+# Name -> callable that populates the cache, run by the warm_cache management command
+warmers = {}
+
+
+def _generation_key(namespace):
+    return f"{KEY_PREFIX}:{namespace}:generation"
+
+
+def generation(namespace):
+    """Return the current generation of a namespace"""
+    value = cache.get(_generation_key(namespace))
+    if value is None:
+        # add() rather than set() so that a concurrent bump() isn't overwritten
+        cache.add(_generation_key(namespace), 1, None)
+        value = cache.get(_generation_key(namespace), 1)
+    return value
+
+
+def bump(namespace):
+    """Invalidate every key in a namespace by moving it on to a new generation"""
+    try:
+        return cache.incr(_generation_key(namespace))
+    except ValueError:
+        # The generation was never stored or has been evicted. Anything cached under the old generation may still be
+        # present, so pick a value that can't collide with it.
+        value = int(time.time() * 1000)
+        cache.set(_generation_key(namespace), value, None)
+        return value
+
+
+def make_key(namespace, key):
+    """Return the full cache key for a key in a namespace"""
+    return f"{KEY_PREFIX}:{namespace}:{generation(namespace)}:{key}"
+
+
+def get(namespace, key, default=None):
+    wrapped = cache.get(make_key(namespace, key))
+    return default if wrapped is None else wrapped[0]
+
+
+def set(namespace, key, value, timeout=DEFAULT_TIMEOUT):
+    cache.set(make_key(namespace, key), (value,), timeout)
+
+
+def delete(namespace, key):
+    cache.delete(make_key(namespace, key))
+
+
+def get_or_set(namespace, key, default, timeout=DEFAULT_TIMEOUT):
+    """Return the cached value of a key, computing and storing it with default() on a miss"""
+    full_key = make_key(namespace, key)
+    wrapped = cache.get(full_key)
+    if wrapped is None:
+        wrapped = (default() if callable(default) else default,)
+        cache.set(full_key, wrapped, timeout)
+    return wrapped[0]
+
+
+def warmer(name):
+    """Register a function to be run by the warm_cache management command"""
+    def decorator(func):
+        warmers[name] = func
+        return func
+    return decorator
@@ -1,12 +1,12 @@
 from django.conf import settings
 
-from .models import SubmissionDeadline
+from .singletons import get_submission_deadline
 
 
 # Globally-accessible custom variables
 # These all require matching declarations in settings.py
 def global_settings(request):
-    deadline = SubmissionDeadline.objects.first()
+    deadline = get_submission_deadline()
     try:
         release_hash = settings.RAVEN_CONFIG['release']
     except AttributeError:
@@ -0,0 +1,215 @@
+import os
+import re
+import logging
+import zipfile
+import multiprocessing
+from io import BytesIO
+from xml.etree import ElementTree
+
+from django.conf import settings
+from django.db.models import Q
+from pdfminer.high_level import extract_text as extract_pdf_text
+
+from .models import Submission, ExtractedText
+
+
+logger = logging.getLogger(__name__)
+
+
+# Extracts plain text from uploaded PDF, DOCX and PPTX files, and from those inside zip uploads, so that the content of
+# a submission's file can be searched. Extraction is slow and CPU bound, so it never happens during a request: the
+# extract_submission_text management command picks up files without an ExtractedText and extracts each in a child
+# process of its own, several at a time, so that one that hangs can be killed. The children only read files; every
+# database write happens in the parent process.
+
+# Text kept per file, which bounds the size of the search index however long the paper
+MAX_TEXT_LENGTH = 100000
+MAX_PDF_PAGES = 100
+# Zip members larger than this uncompressed are skipped, as are zips nested any deeper
+MAX_MEMBER_SIZE = settings.MAX_UPLOAD_SIZE
+MAX_ZIP_DEPTH = 2
+
+WORD_NAMESPACE = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+DRAWING_NAMESPACE = "{http://schemas.openxmlformats.org/drawingml/2006/main}"
+
+
+def _extract_xml(file, namespace):
+    """Return the text of a WordprocessingML or DrawingML part, one paragraph per line"""
+    paragraphs = []
+    words = []
+    for event, element in ElementTree.iterparse(file):
+        if element.tag == f"{namespace}t":
+            words.append(element.text or "")
+        elif element.tag == f"{namespace}p":
+            paragraphs.append("".join(words))
+            words = []
+            # Paragraphs are finished with once read, so don't keep the whole tree in memory
+            element.clear()
+    return "\n".join(paragraph for paragraph in paragraphs if paragraph.strip())
+
+
+def extract_docx(file, depth=0):
+    with zipfile.ZipFile(file) as archive, archive.open("word/document.xml") as document:
+        return _extract_xml(document, WORD_NAMESPACE)
+
+
+def _slide_number(name):
+    return int(re.search(r"(\d+)\.xml$", name).group(1))
+
+
+def extract_pptx(file, depth=0):
+    with zipfile.ZipFile(file) as archive:
+        slides = [name for name in archive.namelist() if re.match(r"^ppt/slides/slide\d+\.xml$", name)]
+        texts = []
+        for name in sorted(slides, key=_slide_number):
+            with archive.open(name) as slide:
+                texts.append(_extract_xml(slide, DRAWING_NAMESPACE))
+        return "\n\n".join(texts)
+
+
+def extract_pdf(file, depth=0):
+    return extract_pdf_text(file, maxpages=MAX_PDF_PAGES)
+
+
+def extract_zip(file, depth=0):
+    """Return the text of every supported file in a zip, skipping any that are too big or nested too deeply"""
+    if depth >= MAX_ZIP_DEPTH:
+        return ""
+    texts = []
+    with zipfile.ZipFile(file) as archive:
+        for member in archive.infolist():
+            if member.is_dir() or member.file_size > MAX_MEMBER_SIZE or get_extractor(member.filename) is None:
+                continue
+            # Members are read into memory since extractors need to seek, which compressed members can't
+            with archive.open(member) as data:
+                content = data.read()
+            try:
+                texts.append(extract_text(content, member.filename, depth + 1))
+            except Exception as e:
+                # One broken member shouldn't lose the text of the rest
+                logger.warning("Could not extract text from %s: %s", member.filename, e)
+    return "\n\n".join(text for text in texts if text)
+
+
+extractors = {
+    ".docx": extract_docx,
+    ".pptx": extract_pptx,
+    ".pdf": extract_pdf,
+    ".zip": extract_zip,
+}
+
+
+def get_extractor(name):
+    _, extension = os.path.splitext(name)
+    return extractors.get(extension.lower())
+
+
+def clean_text(text):
+    """Collapse runs of blank space and drop the NULs that PostgreSQL can't store"""
+    text = text.replace("\x00", "")
+    text = re.sub(r"[ \t\f\v]+", " ", text)
+    text = re.sub(r"\s*\n\s*", "\n", text)
+    return text.strip()[:MAX_TEXT_LENGTH]
+
+
+def extract_text(content, name, depth=0):
+    """Return the text of a file given its content as bytes, or an empty string if it isn't a supported type"""
+    extractor = get_extractor(name)
+    if extractor is None:
+        return ""
+    return clean_text(extractor(BytesIO(content), depth))
+
+
+def extract_file(path):
+    """Return (text, error) for a stored file; run in a child process by extract_file_with_timeout()"""
+    try:
+        extractor = get_extractor(path)
+        if extractor is None:
+            return "", ""
+        with open(path, "rb") as file:
+            return clean_text(extractor(file)), ""
+    except Exception as e:
+        # Uploads are only checked by content type, so anything might turn up; a bad file mustn't stop the batch
+        return "", f"{e.__class__.__name__}: {e!s}"
+
+
+def _send_extracted_file(path, connection):
+    connection.send(extract_file(path))
+    connection.close()
+
+
+def extract_file_with_timeout(path, timeout):
+    """Return (text, error) for a stored file, extracted in a child process that is killed after timeout seconds"""
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(target=_send_extracted_file, args=(path, sender), daemon=True)
+    process.start()
+    sender.close()
+    try:
+        if not receiver.poll(timeout):
+            return "", f"Timed out after {timeout:g} seconds"
+        try:
+            return receiver.recv()
+        except EOFError:
+            # The child died without sending anything, e.g. killed for running out of memory
+            process.join()
+            return "", f"Extraction process exited with code {process.exitcode}"
+    finally:
+        if process.is_alive():
+            process.kill()
+        process.join()
+        receiver.close()
+
+
+def get_pending(limit, retry_before=None):
+    """Return (file hash, stored name) for up to limit distinct files whose text hasn't been extracted
+
+    Files that failed to extract are tried again if they failed before retry_before.
+    """
+    extracted = ExtractedText.objects.all()
+    if retry_before:
+        extracted = extracted.filter(Q(error="") | Q(extracted_on__gte=retry_before))
+    pending = (
+        Submission.objects.exclude(file_hash="").exclude(file="")
+        .exclude(file_hash__in=extracted.values("file_hash"))
+        .order_by("file_hash").values_list("file_hash", "file")
+    )
+    files = {}
+    for file_hash, name in pending.iterator():
+        files.setdefault(file_hash, name)
+        if len(files) == limit:
+            break
+    return list(files.items())
+
+
+def extract_pending(executor, batch_size=100, retry_before=None):
+    """Extract the text of a batch of files in the executor's workers, returning the number extracted and failed
+
+    Each file is extracted in a child process of the worker's, which is killed if it takes longer than
+    settings.EXTRACTION_TIMEOUT seconds and the file recorded as failed, so a file that hangs the extractor can't hold
+    up the rest or tie up a worker.
+    """
+    pending = get_pending(batch_size, retry_before)
+    storage = Submission._meta.get_field("file").storage
+    results = executor.map(
+        extract_file_with_timeout,
+        [storage.path(name) for file_hash, name in pending],
+        [settings.EXTRACTION_TIMEOUT] * len(pending),
+    )
+    extracted = failed = 0
+    for (file_hash, name), (text, error) in zip(pending, results):
+        if error:
+            logger.warning("Could not extract text from %s: %s", name, error)
+            failed += 1
+        else:
+            extracted += 1
+        ExtractedText.objects.update_or_create(file_hash=file_hash, defaults={"text": text, "error": error})
+        if text:
+            for submission in Submission.objects.filter(file_hash=file_hash).only("uuid", "abstract", "file_hash"):
+                submission.update_similarity()
+    return extracted, failed
+
+
+def prune_extracted_text():
+    """Delete the text of files that no submission has any more, returning the number deleted"""
+    deleted, _ = ExtractedText.objects.exclude(file_hash__in=Submission.objects.values("file_hash")).delete()
+    return deleted
@@ -1,12 +1,14 @@
 from django import forms
 from django.conf import settings
+from django.db.models import Q
 from django.contrib.auth.models import User
+from django.db.models.functions import Lower
 from django.db.models.fields.files import FieldFile
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.forms import AuthenticationForm, PasswordResetForm, SetPasswordForm, PasswordChangeForm
 
 from .models import Submission, SubmissionReview, Profile
-from .blacklist import reserved_usernames
+from .blacklist import reserved
 
 
 class LoginForm(AuthenticationForm):
@@ -83,6 +85,15 @@ class ChangeUserPasswordForm(PasswordChangeForm):
 
 
 class ResetUserPasswordForm(PasswordResetForm):
+    def get_users(self, email):
+        """Match email addresses case-insensitively in a way that can use the lower(email) index"""
+        active_users = User.objects.annotate(email_lower=Lower("email")).filter(
+            ~Q(email=""),
+            email_lower=email.lower(),
+            is_active=True,
+        )
+        return (u for u in active_users if u.has_usable_password())
+
     email = forms.EmailField(
         label="Email Address",
         max_length=254,
@@ -206,17 +217,36 @@ class SignUpForm(UserCreationForm):
     )
 
     def clean(self):
-        email = self.cleaned_data["email"]
-        username = self.cleaned_data["username"]
+        email = self.cleaned_data.get("email", "").lower()
+        username = self.cleaned_data.get("username", "").lower()
 
-        if email and User.objects.filter(email=email).exists():
-            raise forms.ValidationError("Email address has already been used.")
+        # Checked first as it doesn't need the database
+        if username and username in reserved:
+            raise forms.ValidationError("This username is restricted or otherwise unavailable. Please pick another.")
 
-        if username and User.objects.filter(username=username).exists():
+        # Both conflicts in one query, matching the case-insensitive unique indexes created by gambit.schema
+        conflicts = Q()
+        if email:
+            conflicts |= Q(email_lower=email) & ~Q(email="")
+        if username:
+            conflicts |= Q(username_lower=username)
+        if not conflicts:
+            return
+        existing = list(
+            User.objects.annotate(email_lower=Lower("email"), username_lower=Lower("username"))
+            .filter(conflicts)
+            .values_list("email_lower", "username_lower")[:2]
+        )
+        # An invalid email address leaves email blank, which a matching username's blank email mustn't be taken for
+        if email and any(existing_email == email for existing_email, existing_username in existing):
+            raise forms.ValidationError("Email address has already been used.")
+        if existing:
             raise forms.ValidationError("Username already exists.")
 
-        if username in reserved_usernames:
-            raise forms.ValidationError("This username is restricted or otherwise unavailable. Please pick another.")
+    def validate_unique(self):
+        # clean() has already checked the username along with the email address, and the unique indexes catch any
+        # signup that races past it
+        pass
 
 
     class Meta:
@@ -1,7 +1,63 @@
+import time
+
+from django.conf import settings
 from django.contrib.auth.hashers import BCryptSHA256PasswordHasher
 
+from .timing import timed
+
+
+# bcrypt accepts cost factors from 4 to 31, each one doubling the work
+MIN_ROUNDS = 4
+MAX_ROUNDS = 31
+
+
+class CalibratedBCryptSHA256PasswordHasher(BCryptSHA256PasswordHasher):
+    """A BCryptSHA256PasswordHasher using the cost factor from settings.PASSWORD_HASHER_ROUNDS
+
+    Run the calibrate_hasher management command on the production hardware to find the cost factor that meets a
+    target hashing time. Passwords hashed with any other cost factor are rehashed when their user next logs in.
+    """
+
+    @property
+    def rounds(self):
+        return settings.PASSWORD_HASHER_ROUNDS
+
+    def encode(self, password, salt):
+        # Also used by verify(), so this covers every login, as long as this is the only bcrypt_sha256 hasher in
+        # settings.PASSWORD_HASHERS
+        with timed("password_hash"):
+            return super(CalibratedBCryptSHA256PasswordHasher, self).encode(password, salt)
+
 
 class ParanoidBCryptSHA256PasswordHasher(BCryptSHA256PasswordHasher):
-    """A subclass of BCryptSHA256PasswordHasher to increase iterations"""
+    """A subclass of BCryptSHA256PasswordHasher to increase iterations
+
+    Deprecated: bcrypt truncates the fractional cost factor, so this hashes with 12 rounds while reporting every
+    stored hash as needing an upgrade. Use CalibratedBCryptSHA256PasswordHasher instead.
+    """
 
     rounds = BCryptSHA256PasswordHasher.rounds + 0.5
+
+
+def time_hash(rounds, repeat=3):
+    """Return the fastest of several timings, in seconds, of hashing a password with the given cost factor"""
+    bcrypt = BCryptSHA256PasswordHasher()._load_library()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        bcrypt.hashpw(b"calibration", bcrypt.gensalt(rounds))
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def calibrate(target, timer=time_hash):
+    """Return the highest cost factor that hashes within target seconds, and the timings of each factor tried"""
+    timings = {}
+    rounds = MIN_ROUNDS
+    while rounds <= MAX_ROUNDS:
+        timings[rounds] = timer(rounds)
+        if timings[rounds] > target:
+            break
+        rounds += 1
+    # The last factor tried went over the target, or was the maximum; never go below the minimum
+    return max(MIN_ROUNDS, min(rounds - 1, MAX_ROUNDS)), timings
@@ -0,0 +1,145 @@
+import json
+import base64
+from datetime import timedelta
+from email.mime.base import MIMEBase
+
+from django.conf import settings
+from django.db import models, transaction
+from django.utils import timezone
+from django.core.mail import get_connection, EmailMultiAlternatives
+from django.core.mail.backends.base import BaseEmailBackend
+
+from .models import QueuedEmail
+
+
+# Outgoing mail is written to the QueuedEmail table by QueuedEmailBackend (the EMAIL_BACKEND) and delivered in the
+# background by the send_queued_mail management command through QUEUED_EMAIL_BACKEND, so requests never wait on the
+# mail provider.
+
+
+def serialise_message(message):
+    """Return a JSON representation of an EmailMessage
+
+    Raises ValueError for a message with an attachment given as a MIME object, which couldn't be rebuilt.
+    """
+    attachments = []
+    for attachment in message.attachments:
+        if isinstance(attachment, MIMEBase):
+            raise ValueError(f"Can't queue {message.subject!r}: attachments must be (filename, content, mimetype)")
+        filename, content, mimetype = attachment
+        if isinstance(content, str):
+            content = content.encode()
+        attachments.append([filename, base64.b64encode(content).decode("ascii"), mimetype])
+    return json.dumps({
+        'subject': message.subject,
+        'body': message.body,
+        'from_email': message.from_email,
+        'to': message.to,
+        'cc': message.cc,
+        'bcc': message.bcc,
+        'reply_to': message.reply_to,
+        'headers': message.extra_headers,
+        'alternatives': getattr(message, 'alternatives', []),
+        'attachments': attachments,
+        'content_subtype': message.content_subtype,
+        'mixed_subtype': message.mixed_subtype,
+    })
+
+
+def deserialise_message(data, connection=None):
+    """Rebuild an EmailMessage from serialise_message() output"""
+    data = json.loads(data)
+    alternatives = data.pop('alternatives')
+    # Messages queued before attachments and subtypes were serialised have neither
+    attachments = data.pop('attachments', [])
+    content_subtype = data.pop('content_subtype', EmailMultiAlternatives.content_subtype)
+    mixed_subtype = data.pop('mixed_subtype', EmailMultiAlternatives.mixed_subtype)
+    message = EmailMultiAlternatives(connection=connection, **data)
+    message.content_subtype = content_subtype
+    message.mixed_subtype = mixed_subtype
+    for content, mimetype in alternatives:
+        message.attach_alternative(content, mimetype)
+    for filename, content, mimetype in attachments:
+        message.attach(filename, base64.b64decode(content), mimetype)
+    return message
+
+
+class QueuedEmailBackend(BaseEmailBackend):
+    """Email backend that queues messages in the database instead of sending them"""
+
+    def send_messages(self, email_messages):
+        queued = [
+            QueuedEmail(
+                subject=message.subject,
+                recipients=", ".join(message.recipients()),
+                message=serialise_message(message),
+            )
+            for message in email_messages if message.recipients()
+        ]
+        QueuedEmail.objects.bulk_create(queued)
+        return len(queued)
+
+
+def _claim_batch(batch_size):
+    """Reserve a batch of due messages for this worker"""
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            QueuedEmail.objects.select_for_update(skip_locked=True)
+            .filter(status=QueuedEmail.QUEUED, next_attempt_on__lte=now)
+            .order_by("next_attempt_on")[:batch_size]
+        )
+        # Push the claimed messages into the future so that other workers leave them alone while they are sent. If
+        # this worker dies they become due again once the lease runs out.
+        QueuedEmail.objects.filter(pk__in=[email.pk for email in batch]).update(
+            next_attempt_on=now + timedelta(seconds=settings.QUEUED_EMAIL_LEASE),
+        )
+    return batch
+
+
+def send_queued_mail(batch_size=100):
+    """Send one batch of due messages over a single connection, returning the number sent and failed"""
+    batch = _claim_batch(batch_size)
+    if not batch:
+        return 0, 0
+    sent = []
+    failed = 0
+    connection = get_connection(settings.QUEUED_EMAIL_BACKEND)
+    try:
+        connection.open()
+    except Exception as e:
+        # Nothing in the batch can be sent, but each message still backs off and counts the attempt
+        for email in batch:
+            _retry_later(email, e)
+        return 0, len(batch)
+    try:
+        for email in batch:
+            try:
+                if not deserialise_message(email.message, connection).send():
+                    raise RuntimeError("The email backend did not send the message")
+            except Exception as e:
+                failed += 1
+                _retry_later(email, e)
+            else:
+                sent.append(email.pk)
+    finally:
+        connection.close()
+    QueuedEmail.objects.filter(pk__in=sent).update(
+        status=QueuedEmail.SENT,
+        sent_on=timezone.now(),
+        attempts=models.F("attempts") + 1,
+        last_error="",
+    )
+    return len(sent), failed
+
+
+def _retry_later(email, error):
+    """Schedule a failed message for another attempt with exponential backoff, or give up on it"""
+    email.attempts += 1
+    email.last_error = f"{error.__class__.__name__}: {error!s}"
+    if email.attempts >= settings.QUEUED_EMAIL_MAX_ATTEMPTS:
+        email.status = QueuedEmail.FAILED
+    else:
+        delay = settings.QUEUED_EMAIL_RETRY_DELAY * 2 ** (email.attempts - 1)
+        email.next_attempt_on = timezone.now() + timedelta(seconds=delay)
+    email.save(update_fields=["attempts", "last_error", "status", "next_attempt_on"])
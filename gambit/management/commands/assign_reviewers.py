@@ -0,0 +1,40 @@
+import time
+
+from django.conf import settings
+from django.utils import timezone
+from django.core.management.base import BaseCommand
+
+from gambit.models import Submission
+from gambit.assignment import assign_reviewers
+
+
+class Command(BaseCommand):
+    help = "Assign Programme Committee members to review a year's submissions, avoiding conflicts of interest"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--year", type=int, default=None, help="Year of the submissions (default: CONFERENCE_YEAR or this year)",
+        )
+        parser.add_argument(
+            "--reviews-per-submission", type=int, default=None,
+            help="Reviewers each submission needs (default: REVIEWS_PER_SUBMISSION)",
+        )
+        parser.add_argument(
+            "--max-load", type=int, default=None,
+            help="Most submissions assigned to one reviewer (default: REVIEWER_MAX_LOAD, or an even share)",
+        )
+
+    def handle(self, *args, **options):
+        year = options["year"] or int(settings.CONFERENCE_YEAR or timezone.now().year)
+        started = time.perf_counter()
+        result = assign_reviewers(
+            Submission.objects.filter(submitted_on__year=year),
+            reviews_per_submission=options["reviews_per_submission"],
+            max_load=options["max_load"],
+        )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"Made {result.assigned} review assignments in {elapsed:.2f}s"))
+        if result.unassigned:
+            self.stderr.write(self.style.WARNING(
+                f"{result.unassigned} reviews could not be assigned without a conflict or exceeding the maximum load"
+            ))
@@ -0,0 +1,58 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from gambit import bench
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a large volume of data, time every view and model hot path, and write a JSON report. The seeded data is "
+        "rolled back afterwards, but run this against a copy of the database rather than production."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=5000)
+        parser.add_argument("--submissions", type=int, default=3000)
+        parser.add_argument("--reviews", type=int, default=30000)
+        parser.add_argument("--reviewers", type=int, default=50, help="Users added to the Programme Committee")
+        parser.add_argument("--seed", type=int, default=0, help="Random seed, so runs seed identical data")
+        parser.add_argument("--repeat", type=int, default=10, help="Timed rounds per case (default: 10)")
+        parser.add_argument("--output", default="bench.json", help="Where to write the report (default: bench.json)")
+        parser.add_argument("--compare", help="A previous report to compare median timings against")
+        parser.add_argument("--keep", action="store_true", help="Commit the seeded data instead of rolling it back")
+        parser.add_argument("names", nargs="*", help="Only run these URL names and cases (default: all)")
+
+    def handle(self, *args, **options):
+        if settings.DEBUG:
+            self.stderr.write(self.style.WARNING("DEBUG is enabled, which skews the timings"))
+        volumes = {
+            "users": options["users"],
+            "submissions": options["submissions"],
+            "reviews": options["reviews"],
+            "reviewers": options["reviewers"],
+            "random_seed": options["seed"],
+        }
+        report = bench.run(volumes, options["repeat"], options["names"], options["keep"])
+        self.stdout.write(f"Seeded in {report['seed_seconds']:.1f}s")
+        for result in report["results"]:
+            if "error" in result:
+                self.stdout.write(self.style.ERROR(f"  {result['name']}: {result['error']}"))
+                continue
+            stats = result["stats"]
+            self.stdout.write(
+                f"  {result['name']:<60} {stats['median']:9.2f}ms median {stats['p95']:9.2f}ms p95 "
+                f"{result['queries']:4d} queries"
+            )
+        with open(options["output"], "w") as f:
+            json.dump(report, f, indent=2)
+
+        if options["compare"]:
+            with open(options["compare"]) as f:
+                baseline = json.load(f)
+            self.stdout.write(f"Compared with {baseline.get('commit') or options['compare']}:")
+            for name, before, after, change in bench.compare(baseline, report):
+                style = self.style.ERROR if change > 10 else self.style.SUCCESS if change < -10 else str
+                self.stdout.write(style(f"  {name:<60} {before:9.2f}ms -> {after:9.2f}ms ({change:+.1f}%)"))
+        self.stdout.write(self.style.SUCCESS(f"Wrote {len(report['results'])} results to {options['output']}"))
@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.hashers import BCryptSHA256PasswordHasher
+
+from gambit.hashers import calibrate
+
+
+class Command(BaseCommand):
+    help = "Benchmark bcrypt on this machine and recommend a PASSWORD_HASHER_ROUNDS that meets a target hashing time"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--target-ms", type=float, default=250, help="Time to spend hashing each login (default: 250)")
+
+    def handle(self, *args, **options):
+        if options["target_ms"] <= 0:
+            raise CommandError("--target-ms must be greater than zero")
+        rounds, timings = calibrate(options["target_ms"] / 1000)
+        for tried, seconds in timings.items():
+            marker = " <-" if tried == rounds else ""
+            self.stdout.write(f"  {tried:2d} rounds: {seconds * 1000:8.1f}ms{marker}")
+        seconds = timings[rounds]
+        self.stdout.write(
+            f"Each login costs {seconds * 1000:.0f}ms of CPU, so one worker process can verify at most "
+            f"{1 / seconds:.1f} logins/s"
+        )
+        if rounds < BCryptSHA256PasswordHasher.rounds:
+            self.stderr.write(self.style.WARNING(
+                f"This is below Django's default of {BCryptSHA256PasswordHasher.rounds} rounds; consider a higher "
+                f"--target-ms"
+            ))
+        self.stdout.write(f"Currently PASSWORD_HASHER_ROUNDS={settings.PASSWORD_HASHER_ROUNDS}")
+        self.stdout.write(self.style.SUCCESS(f"Recommended: PASSWORD_HASHER_ROUNDS={rounds}"))
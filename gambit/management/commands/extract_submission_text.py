@@ -0,0 +1,49 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.utils import timezone
+from django.core.management.base import BaseCommand
+
+from gambit.extraction import extract_pending, prune_extracted_text
+
+
+class Command(BaseCommand):
+    help = "Extract the text of uploaded submission files for search, optionally running forever as a worker"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=None, help="Files extracted at once (default: one per CPU)")
+        parser.add_argument("--batch-size", type=int, default=100, help="Files handed to the workers at a time")
+        parser.add_argument("--retry-failed", action="store_true", help="Try again with files that failed before")
+        parser.add_argument("--loop", action="store_true", help="Keep polling for new files instead of exiting")
+        parser.add_argument("--interval", type=float, default=30, help="Seconds to wait when there is nothing to do")
+
+    def handle(self, *args, **options):
+        pruned = prune_extracted_text()
+        if pruned:
+            self.stdout.write(f"Deleted the text of {pruned} files no longer submitted")
+        retry_before = timezone.now() if options["retry_failed"] else None
+        total_extracted = total_failed = 0
+        started = time.perf_counter()
+        # Each thread waits on the child process extracting its file, so threads are enough for the files to be
+        # extracted in parallel
+        with ThreadPoolExecutor(max_workers=options["workers"] or os.cpu_count()) as executor:
+            while True:
+                batch_started = time.perf_counter()
+                extracted, failed = extract_pending(executor, options["batch_size"], retry_before)
+                if extracted or failed:
+                    self.report(extracted, failed, time.perf_counter() - batch_started)
+                    total_extracted += extracted
+                    total_failed += failed
+                # A full batch suggests there is more waiting, so carry on straight away
+                if extracted + failed == options["batch_size"]:
+                    continue
+                if not options["loop"]:
+                    break
+                time.sleep(options["interval"])
+        if not options["loop"]:
+            self.report(total_extracted, total_failed, time.perf_counter() - started, self.style.SUCCESS)
+
+    def report(self, extracted, failed, elapsed, style=str):
+        rate = (extracted + failed) / elapsed if elapsed else 0
+        self.stdout.write(style(f"Extracted {extracted}, failed {failed} in {elapsed:.2f}s ({rate:.1f} files/s)"))
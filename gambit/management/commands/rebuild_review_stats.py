@@ -0,0 +1,27 @@
+from django.db import models
+from django.db.models.functions import Coalesce
+from django.core.management.base import BaseCommand
+
+from gambit.models import Submission, SubmissionReview
+
+
+class Command(BaseCommand):
+    help = "Recalculate the denormalised review statistics stored on every submission"
+
+    def handle(self, *args, **options):
+        reviews = SubmissionReview.objects.filter(submission=models.OuterRef("pk")).order_by().values("submission")
+
+        def review_stat(aggregate, output_field):
+            return Coalesce(
+                models.Subquery(reviews.annotate(value=aggregate).values("value"), output_field=output_field),
+                0,
+            )
+
+        # A single UPDATE statement, so the rebuild is atomic without holding locks in Python
+        updated = Submission.objects.update(
+            review_count=review_stat(models.Count("pk"), models.IntegerField()),
+            score_sum=review_stat(models.Sum("submission_score"), models.IntegerField()),
+            expertise_sum=review_stat(models.Sum("expertise_score"), models.IntegerField()),
+            average_score=review_stat(models.Avg("submission_score"), models.FloatField()),
+        )
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt review statistics for {updated} submissions"))
@@ -0,0 +1,46 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.db import models, transaction
+from django.core.management.base import BaseCommand
+
+from gambit import similarity
+from gambit.models import Submission, ExtractedText, SimilarityBucket
+
+
+class Command(BaseCommand):
+    help = "Recalculate the MinHash signature and LSH buckets of every submission, e.g. after changing their parameters"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per CPU)")
+        parser.add_argument("--batch-size", type=int, default=500, help="Submissions signed at a time")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        file_text = ExtractedText.objects.filter(file_hash=models.OuterRef("file_hash")).exclude(file_hash="")
+        submissions = (
+            Submission.objects.order_by()
+            .annotate(file_text=models.Subquery(file_text.values("text")))
+            .values_list("pk", "abstract", "file_text")
+        )
+        # Only the keys are held in memory, the texts are fetched a batch at a time
+        pks = list(Submission.objects.order_by("pk").values_list("pk", flat=True))
+        batch_size = options["batch_size"]
+        # Rebuilt in one transaction, so that similar submissions can still be looked up in the meantime
+        with ProcessPoolExecutor(max_workers=options["workers"]) as executor, transaction.atomic():
+            SimilarityBucket.objects.all().delete()
+            for start in range(0, len(pks), batch_size):
+                batch = list(submissions.filter(pk__in=pks[start:start + batch_size]))
+                texts = [similarity.get_text(abstract, text) for _, abstract, text in batch]
+                buckets = []
+                for (pk, _, _), signature in zip(batch, executor.map(similarity.get_signature, texts)):
+                    # Django 2.1 has no bulk_update
+                    Submission.objects.filter(pk=pk).update(minhash=signature)
+                    if signature is not None:
+                        keys = similarity.get_band_keys(signature)
+                        buckets.extend(SimilarityBucket(submission_id=pk, key=key) for key in keys)
+                SimilarityBucket.objects.bulk_create(buckets)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt similarity signatures for {len(pks)} submissions in {elapsed:.2f}s"
+        ))
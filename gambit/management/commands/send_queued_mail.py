@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from gambit.mail import send_queued_mail
+
+
+class Command(BaseCommand):
+    help = "Send the email waiting in the outbox, optionally running forever as a worker"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100, help="Messages sent per connection (default: 100)")
+        parser.add_argument("--loop", action="store_true", help="Keep polling for new messages instead of exiting")
+        parser.add_argument("--interval", type=float, default=5, help="Seconds to wait when the outbox is empty")
+
+    def handle(self, *args, **options):
+        total_sent = total_failed = 0
+        started = time.perf_counter()
+        while True:
+            batch_started = time.perf_counter()
+            sent, failed = send_queued_mail(options["batch_size"])
+            if sent or failed:
+                self.report(sent, failed, time.perf_counter() - batch_started)
+                total_sent += sent
+                total_failed += failed
+            # A full batch suggests there is more waiting, so carry on straight away
+            if sent + failed == options["batch_size"]:
+                continue
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
+        if not options["loop"]:
+            self.report(total_sent, total_failed, time.perf_counter() - started, self.style.SUCCESS)
+
+    def report(self, sent, failed, elapsed, style=str):
+        rate = sent / elapsed if elapsed else 0
+        self.stdout.write(style(f"Sent {sent}, failed {failed} in {elapsed:.2f}s ({rate:.1f} messages/s)"))
@@ -0,0 +1,25 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from gambit import cache
+
+
+class Command(BaseCommand):
+    help = "Populate the shared cache with frequently read data, e.g. after a deploy or cache restart"
+
+    def add_arguments(self, parser):
+        parser.add_argument("warmers", nargs="*", help="Only run these warmers (default: all)")
+
+    def handle(self, *args, **options):
+        names = options["warmers"] or sorted(cache.warmers)
+        unknown = set(names) - set(cache.warmers)
+        if unknown:
+            raise CommandError(f"Unknown warmers: {', '.join(sorted(unknown))}. Choose from: {', '.join(sorted(cache.warmers))}")
+        self.stdout.write(f"Warming {settings.CACHES['default']['BACKEND']}")
+        for name in names:
+            started = time.perf_counter()
+            cache.warmers[name]()
+            self.stdout.write(f"  {name}: {(time.perf_counter() - started) * 1000:.1f}ms")
+        self.stdout.write(self.style.SUCCESS(f"Ran {len(names)} cache warmers"))
@@ -0,0 +1,165 @@
+import os
+import hmac
+import time
+import base64
+import hashlib
+import binascii
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Count
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.contrib.auth import authenticate
+from django.contrib.auth.models import User
+from django.views.decorators.cache import never_cache
+from prometheus_client import CollectorRegistry, Counter, Histogram, REGISTRY, generate_latest, multiprocess
+from prometheus_client import CONTENT_TYPE_LATEST
+from prometheus_client.core import GaugeMetricFamily
+
+from . import timing
+from .models import QueuedEmail
+
+
+# Prometheus metrics for the app, exposed by the staff-only metrics view.
+#
+# Under gunicorn every worker is a separate process, so metrics are only meaningful when aggregated across them. When
+# PROMETHEUS_MULTIPROC_DIR is set (see gunicorn.conf.py), prometheus_client keeps each process's values in files in
+# that directory and the metrics view combines them. Without it, e.g. under runserver, each process reports its own.
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+REQUEST_SECONDS = Histogram(
+    "gambit_request_duration_seconds", "Time taken to respond to requests", ["view", "method"],
+    buckets=SECONDS_BUCKETS,
+)
+REQUESTS = Counter("gambit_requests_total", "Requests answered", ["view", "method", "status"])
+REQUEST_QUERIES = Histogram(
+    "gambit_request_queries", "Database queries made per request", ["view"],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200, 500),
+)
+UPLOAD_BYTES = Histogram(
+    "gambit_upload_bytes", "Size of uploaded files",
+    buckets=(1024, 10240, 102400, 1048576, 5242880, 10485760, 26214400, 52428800),
+)
+UPLOAD_SECONDS = Histogram(
+    "gambit_upload_duration_seconds", "Time taken to receive uploaded files", buckets=SECONDS_BUCKETS,
+)
+FILE_HASH_SECONDS = Histogram(
+    "gambit_file_hash_duration_seconds", "Time spent computing SHA-512 digests of submission files",
+    buckets=SECONDS_BUCKETS,
+)
+PASSWORD_HASH_SECONDS = Histogram(
+    "gambit_password_hash_duration_seconds", "Time spent hashing passwords, including verifying logins",
+    buckets=SECONDS_BUCKETS,
+)
+
+timing.observers["hash"] = FILE_HASH_SECONDS.observe
+timing.observers["password_hash"] = PASSWORD_HASH_SECONDS.observe
+
+
+def observe_upload(size, seconds):
+    UPLOAD_BYTES.observe(size)
+    UPLOAD_SECONDS.observe(seconds)
+
+
+class OutboxCollector:
+    """Reports the number of queued emails in each state, read from the database when scraped"""
+
+    def describe(self):
+        # Lets the collector be registered without querying the database
+        yield GaugeMetricFamily("gambit_outbox_messages", "Emails in the outbox", labels=["status"])
+
+    def collect(self):
+        depth = GaugeMetricFamily("gambit_outbox_messages", "Emails in the outbox", labels=["status"])
+        counts = dict(QueuedEmail.objects.order_by().values_list("status").annotate(Count("pk")))
+        for status, label in QueuedEmail.STATUS_CHOICES:
+            depth.add_metric([status], counts.get(status, 0))
+        yield depth
+
+
+class MetricsMiddleware:
+    """Records the latency, status and number of database queries of every request, labelled by URL name"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = 0
+
+        def count_query(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(count_query))
+            response = self.get_response(request)
+        # Unresolved URLs are lumped together so that probing for pages can't create unlimited label values
+        view = request.resolver_match.view_name if request.resolver_match else "unresolved"
+        REQUEST_SECONDS.labels(view, request.method).observe(time.perf_counter() - started)
+        REQUESTS.labels(view, request.method, response.status_code).inc()
+        REQUEST_QUERIES.labels(view).observe(queries)
+        return response
+
+
+def get_registry():
+    """Return the registry to expose, combining every worker process's metrics when running multiprocess"""
+    if not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    registry.register(OutboxCollector())
+    return registry
+
+
+if not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+    REGISTRY.register(OutboxCollector())
+
+
+# How long a successful Basic authentication is remembered, so that frequent scrapes don't each pay for a password hash
+BASIC_AUTH_CACHE_SECONDS = 300
+
+
+def _has_bearer_token(request):
+    """Return whether the request carries the configured METRICS_TOKEN as a Bearer token"""
+    method, _, token = request.META.get("HTTP_AUTHORIZATION", "").partition(" ")
+    if not settings.METRICS_TOKEN or method.lower() != "bearer":
+        return False
+    return hmac.compare_digest(token.encode(), settings.METRICS_TOKEN.encode())
+
+
+def _get_basic_auth_user(request):
+    """Authenticate the credentials of an HTTP Basic Authorization header, as sent by Prometheus scrapers"""
+    method, _, credentials = request.META.get("HTTP_AUTHORIZATION", "").partition(" ")
+    if method.lower() != "basic":
+        return None
+    # Keyed by a keyed digest of the credentials, so that the password itself is never stored
+    digest = hmac.new(settings.SECRET_KEY.encode(), credentials.encode(), hashlib.sha256).hexdigest()
+    cache_key = f"gambit:metrics:basic:{digest}"
+    user_id = cache.get(cache_key)
+    if user_id is not None:
+        return User.objects.filter(pk=user_id).first()
+    try:
+        username, _, password = base64.b64decode(credentials).decode().partition(":")
+    except (binascii.Error, UnicodeDecodeError):
+        return None
+    user = authenticate(request, username=username, password=password)
+    if user is not None:
+        cache.set(cache_key, user.pk, BASIC_AUTH_CACHE_SECONDS)
+    return user
+
+
+@never_cache
+def metrics(request):
+    """Expose the metrics in the Prometheus text format, to staff or a scraper holding the METRICS_TOKEN"""
+    if not _has_bearer_token(request):
+        user = request.user if request.user.is_authenticated else _get_basic_auth_user(request)
+        if user is None or not (user.is_active and user.is_staff):
+            response = HttpResponse("Staff credentials required", status=401, content_type="text/plain")
+            response["WWW-Authenticate"] = f'Basic realm="{settings.CONFERENCE_NAME} metrics"'
+            return response
+    return HttpResponse(generate_latest(get_registry()), content_type=CONTENT_TYPE_LATEST)
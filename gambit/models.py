@@ -4,11 +4,16 @@ import hashlib
 
 from django.utils import timezone
 from django.dispatch import receiver
-from django.db import models
+from django.db import connection, models, transaction
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MaxValueValidator, MinValueValidator
 
+from . import similarity
+from .timing import timed
+from .storage import ContentAddressedStorage
+
 
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -21,10 +26,12 @@ class Profile(models.Model):
         return self.user.username
 
     def get_submissions(self):
-        return Submission.objects.filter(user=self.user)
+        return Submission.objects.filter(user_id=self.user_id).only("uuid", "title", "submitted_on")
 
     def get_reviews(self):
-        return SubmissionReview.objects.filter(user=self.user)
+        return SubmissionReview.objects.filter(user_id=self.user_id).select_related("submission").only(
+            "uuid", "submitted_on", "submission_score", "expertise_score", "submission", "submission__title",
+        )
 
 
     class Meta:
@@ -40,6 +47,27 @@ def update_user_profile(sender, instance, created, **kwargs):
     instance.profile.save()
 
 
+def submission_upload_to(instance, filename):
+    """Name submission files after their SHA-512 hash, sharded over two directory levels"""
+    _, extension = os.path.splitext(filename)
+    digest = instance.file_hash
+    return f"uploads/blobs/{digest[:2]}/{digest[2:4]}/{digest}{extension.lower()}"
+
+
+class SubmissionQuerySet(models.QuerySet):
+    def with_review_stats(self):
+        """Return submissions with their review statistics and submitter profile in a single query"""
+        # Review statistics are already denormalised onto the row, so there is nothing to aggregate. The large text
+        # fields are never displayed in listings and are left unloaded.
+        return self.select_related("user__profile").defer(
+            "authors", "abstract", "conflicts", "search_vector", "minhash",
+        )
+
+
+# Submission's denormalised review statistics, which are left out of its ordinary saves
+REVIEW_STATS_FIELDS = ("review_count", "score_sum", "expertise_sum", "average_score")
+
+
 class Submission(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     uuid = models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True)
@@ -49,37 +77,174 @@ class Submission(models.Model):
     contact_email = models.EmailField()
     abstract = models.TextField(blank=True)
     conflicts = models.TextField(blank=True)
-    file = models.FileField(upload_to="uploads/submissions/%Y/%m/%d/", blank=True)
+    # Files are stored once per distinct content and shared between submissions, see release_file()
+    file = models.FileField(upload_to=submission_upload_to, storage=ContentAddressedStorage(), max_length=255,
+        blank=True)
     file_hash = models.CharField(max_length=128, blank=True)
+    # The name of the file as it was uploaded, since the stored name is derived from its content
+    file_name = models.CharField(max_length=255, blank=True, editable=False)
+    # Denormalised review statistics, maintained by the SubmissionReview signal handlers below and rebuilt in bulk by
+    # the rebuild_review_stats management command. These save an aggregate query per submission wherever scores are
+    # displayed.
+    review_count = models.PositiveIntegerField(default=0, editable=False)
+    score_sum = models.PositiveIntegerField(default=0, editable=False)
+    expertise_sum = models.PositiveIntegerField(default=0, editable=False)
+    average_score = models.FloatField(default=0, editable=False)
+    # Weighted title, authors and abstract for full-text search, maintained by a database trigger on PostgreSQL and
+    # unused elsewhere; see gambit.search
+    search_vector = SearchVectorField(null=True, editable=False)
+    # MinHash signature of the abstract and file text, filed under its LSH buckets in SimilarityBucket; see
+    # gambit.similarity
+    minhash = models.BinaryField(null=True, editable=False)
+
+    objects = SubmissionQuerySet.as_manager()
 
     def save(self, *args, **kwargs):
-        if self.file:
+        replaced_file = None
+        # Only a newly assigned file needs hashing; a file that has already been stored keeps its hash
+        if self.file and not self.file._committed:
+            # Uploads are hashed by gambit.uploadhandlers as they arrive, anything else is hashed here
+            self.file_hash = getattr(self.file.file, "sha512", None) or self._hash_file()
+            self.file_name = os.path.basename(self.file.name)
+        elif not self.file:
+            self.file_hash = ""
+            self.file_name = ""
+        if not self._state.adding and not (self.file and self.file._committed):
+            replaced_file = Submission.objects.filter(pk=self.pk).values_list("file", flat=True).first()
+        adding = self._state.adding
+        if not adding and kwargs.get("update_fields") is None:
+            # The review statistics may have changed since this instance was loaded, and only the review signal
+            # handlers write them
+            kwargs["update_fields"] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in REVIEW_STATS_FIELDS
+            ]
+        self.minhash = similarity.get_signature(self.get_similarity_text())
+        with transaction.atomic():
+            if self.file and not self.file._committed:
+                # Keeps a concurrent release from deleting the stored file until this reference to it is committed
+                lock_file(self.file.field.generate_filename(self, self.file.name))
+            super(Submission, self).save(*args, **kwargs)
+        # A new submission has no buckets to replace
+        if self.minhash is not None or not adding:
+            self.index_similarity()
+        if replaced_file and replaced_file != self.file.name:
+            self.release_file(replaced_file)
+
+    def _hash_file(self):
+        with timed("hash"):
             sha512 = hashlib.sha512()
             for chunk in self.file.chunks():
                 sha512.update(chunk)
-            self.file_hash = sha512.hexdigest()
-        super(Submission, self).save(*args, **kwargs)
+            return sha512.hexdigest()
 
     def __str__(self):
         return '{0!s}'.format(self.title)
 
     def get_reviews(self):
-        return SubmissionReview.objects.filter(submission=self)
+        return SubmissionReview.objects.filter(submission=self).prefetch_related("user__profile")
+
+    def get_similarity_text(self):
+        """Return the text compared with other submissions': the abstract and the start of the file's text"""
+        file_text = None
+        if self.file_hash:
+            file_text = ExtractedText.objects.filter(file_hash=self.file_hash).values_list("text", flat=True).first()
+        return similarity.get_text(self.abstract, file_text)
+
+    def index_similarity(self):
+        """Replace the submission's LSH buckets with those of its current signature"""
+        with transaction.atomic():
+            SimilarityBucket.objects.filter(submission_id=self.pk).delete()
+            if self.minhash is not None:
+                SimilarityBucket.objects.bulk_create(
+                    SimilarityBucket(submission_id=self.pk, key=key) for key in similarity.get_band_keys(self.minhash)
+                )
+
+    def update_similarity(self):
+        """Recalculate the signature without saving anything else, e.g. once the file's text has been extracted"""
+        self.minhash = similarity.get_signature(self.get_similarity_text())
+        Submission.objects.filter(pk=self.pk).update(minhash=self.minhash)
+        self.index_similarity()
+
+    def get_similar(self, limit=10):
+        """Return up to limit other submissions with nearly the same text, most similar first
+
+        Only submissions sharing an LSH bucket are compared, so this takes one indexed query however many submissions
+        there are. Each has its estimated similarity, from 0 to 1, as ``similarity``.
+        """
+        if self.minhash is None:
+            return []
+        buckets = SimilarityBucket.objects.filter(key__in=similarity.get_band_keys(self.minhash))
+        candidates = (
+            Submission.objects.filter(pk__in=buckets.values("submission_id")).exclude(pk=self.pk)
+            .only("uuid", "title", "submitted_on", "minhash")
+        )
+        similar = []
+        for candidate in candidates:
+            candidate.similarity = similarity.estimate_similarity(self.minhash, candidate.minhash)
+            if candidate.similarity >= similarity.THRESHOLD:
+                similar.append(candidate)
+        return sorted(similar, key=lambda candidate: candidate.similarity, reverse=True)[:limit]
 
     def get_average_score(self):
-        return self.get_reviews().aggregate(models.Avg("submission_score"))["submission_score__avg"] or 0
+        return self.average_score
 
     def get_total_score(self):
-        return self.get_reviews().aggregate(models.Sum("submission_score"))["submission_score__sum"] or 0
+        return self.score_sum
 
     def get_file_name(self):
         if self.file:
+            if self.file_name:
+                return self.file_name
             _, tail = os.path.split(self.file.name)  # Discarding path prefix
             return tail
 
+    def release_file(self, name):
+        """Delete a stored file once no submission refers to it any more
+
+        The check waits until the current transaction commits, so a rollback can't leave a submission without its file.
+        """
+        storage = self.file.storage
+        transaction.on_commit(lambda: release_stored_file(storage, name))
+
 
     class Meta:
         ordering = ["submitted_on"]
+        # Sortable columns of the server-side submission list
+        indexes = [
+            # Keyset pagination of a user's submissions
+            models.Index(fields=["user", "submitted_on", "uuid"]),
+            models.Index(fields=["title"]),
+            models.Index(fields=["review_count"]),
+            models.Index(fields=["average_score"]),
+        ]
+
+
+class ExtractedText(models.Model):
+    """Plain text extracted from an uploaded file by gambit.extraction, for searching
+
+    Keyed by the file's hash rather than by submission, so that identical files are extracted once and a file is never
+    extracted again while its content is unchanged.
+    """
+    file_hash = models.CharField(max_length=128, primary_key=True)
+    text = models.TextField(blank=True)
+    # Why the text couldn't be extracted, if it couldn't
+    error = models.TextField(blank=True)
+    extracted_on = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.file_hash
+
+
+    class Meta:
+        verbose_name = "Extracted Text"
+        verbose_name_plural = "Extracted Text"
+
+
+class SimilarityBucket(models.Model):
+    """A locality-sensitive hashing bucket that a submission's MinHash signature falls in, see gambit.similarity"""
+    submission = models.ForeignKey(Submission, on_delete=models.CASCADE, related_name="similarity_buckets")
+    key = models.BigIntegerField(db_index=True)
 
 
 class SubmissionReview(models.Model):
@@ -95,15 +260,97 @@ class SubmissionReview(models.Model):
         return '{0!s}'.format(self.uuid)
 
     def get_reviewer_name(self):
+        # Free when the reviewer was loaded along with the review, e.g. by Submission.get_reviews()
+        if SubmissionReview.user.is_cached(self):
+            return self.user.profile.name
         return Profile.objects.get(user_id=self.user_id).name
 
 
     class Meta:
         ordering = ["submitted_on"]
+        # Keyset pagination of a reviewer's reviews
+        indexes = [
+            models.Index(fields=["user", "submitted_on", "uuid"]),
+        ]
         verbose_name = "Review"
         verbose_name_plural = "Reviews"
 
 
+class ReviewAssignment(models.Model):
+    """A Programme Committee member asked to review a submission, see gambit.assignment"""
+    submission = models.ForeignKey(Submission, on_delete=models.CASCADE, related_name="review_assignments")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="review_assignments")
+    # How closely the submission matched the reviewer's past reviews when it was assigned, from 0 to 1
+    affinity = models.FloatField(default=0)
+    assigned_on = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.user} reviewing {self.submission}"
+
+
+    class Meta:
+        unique_together = ("submission", "user")
+        verbose_name = "Review Assignment"
+        verbose_name_plural = "Review Assignments"
+
+
+def lock_file(name):
+    """Serialise storing and releasing a stored file until the current transaction ends"""
+    # SQLite already serialises writers, and other databases aren't supported
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", [name])
+
+
+def release_stored_file(storage, name):
+    """Delete a stored file if no submission refers to it"""
+    with transaction.atomic():
+        # A submission saving the same content either committed before this or stores the file again after it
+        lock_file(name)
+        if not Submission.objects.filter(file=name).exists():
+            storage.delete(name)
+
+
+def aggregate_review_stats(reviews):
+    """Return the denormalised statistics fields for a queryset of reviews"""
+    stats = reviews.aggregate(
+        review_count=models.Count("pk"),
+        score_sum=models.Sum("submission_score"),
+        expertise_sum=models.Sum("expertise_score"),
+        average_score=models.Avg("submission_score"),
+    )
+    # Sum and Avg return None over an empty set
+    return {field: value or 0 for field, value in stats.items()}
+
+
+def refresh_review_stats(submission_id):
+    """Recalculate and store the review statistics of a single submission"""
+    with transaction.atomic():
+        # Lock the submission row so that concurrent review writes serialise their recalculation
+        list(Submission.objects.select_for_update().filter(pk=submission_id).values_list("pk", flat=True))
+        stats = aggregate_review_stats(SubmissionReview.objects.filter(submission_id=submission_id))
+        Submission.objects.filter(pk=submission_id).update(**stats)
+    return stats
+
+
+# Drops the stored file along with its last submission
+@receiver(post_delete, sender=Submission)
+def release_submission_file(sender, instance, **kwargs):
+    if instance.file:
+        instance.release_file(instance.file.name)
+
+
+# Keeps the denormalised statistics on Submission in step with every review write
+@receiver(post_save, sender=SubmissionReview)
+@receiver(post_delete, sender=SubmissionReview)
+def update_submission_review_stats(sender, instance, **kwargs):
+    stats = refresh_review_stats(instance.submission_id)
+    # Keep an already loaded submission consistent with the database so callers don't have to refresh it
+    if SubmissionReview.submission.is_cached(instance):
+        for field, value in stats.items():
+            setattr(instance.submission, field, value)
+
+
 class ManagedContent(models.Model):
     name = models.CharField(max_length=255)
 
@@ -150,3 +397,39 @@ class HelpPageItem(ManagedContent):
     class Meta:
         verbose_name = "Help Page"
         verbose_name_plural = "Help Page"
+
+
+class QueuedEmail(models.Model):
+    """Outgoing email waiting to be sent by the send_queued_mail management command"""
+    QUEUED = "queued"
+    SENT = "sent"
+    FAILED = "failed"
+    STATUS_CHOICES = (
+        (QUEUED, "Queued"),
+        (SENT, "Sent"),
+        (FAILED, "Failed"),
+    )
+
+    created_on = models.DateTimeField(auto_now_add=True)
+    subject = models.TextField(blank=True)
+    recipients = models.TextField(blank=True)
+    # The whole message serialised as JSON by gambit.mail
+    message = models.TextField()
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_on = models.DateTimeField(default=timezone.now)
+    sent_on = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    def __str__(self):
+        return self.subject
+
+
+    class Meta:
+        ordering = ["created_on"]
+        verbose_name = "Queued Email"
+        verbose_name_plural = "Queued Emails"
+        # Covers the worker's search for messages that are due
+        indexes = [
+            models.Index(fields=["status", "next_attempt_on"]),
+        ]
@@ -0,0 +1,63 @@
+import uuid
+import base64
+import binascii
+from collections import namedtuple
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+# Keyset ("cursor") pagination for querysets of models with submitted_on and uuid fields, newest first.
+#
+# Unlike OFFSET pagination, every page is a bounded index range scan however far back it is, and rows added while
+# someone pages through don't shift what they see. Cursors are opaque URL-safe strings holding the position of the
+# last row of the previous page.
+
+Page = namedtuple("Page", ["items", "next_cursor", "is_first"])
+
+
+def encode_cursor(item):
+    position = f"{item.submitted_on.isoformat()}|{item.uuid}"
+    return base64.urlsafe_b64encode(position.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Return the (submitted_on, uuid) position held by a cursor, or None if it isn't valid"""
+    try:
+        position = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        submitted_on, key = position.split("|")
+        submitted_on = parse_datetime(submitted_on)
+        key = uuid.UUID(key)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    return (submitted_on, key) if submitted_on else None
+
+
+def paginate(queryset, cursor=None, per_page=50):
+    """Return the page of the queryset that follows the cursor, starting from the newest if there isn't one"""
+    queryset = queryset.order_by("-submitted_on", "-uuid")
+    position = decode_cursor(cursor) if cursor else None
+    if position:
+        submitted_on, key = position
+        queryset = queryset.filter(Q(submitted_on__lt=submitted_on) | Q(submitted_on=submitted_on, uuid__lt=key))
+    # One extra row tells whether there is another page without a COUNT query
+    items = list(queryset[:per_page + 1])
+    next_cursor = encode_cursor(items[per_page - 1]) if len(items) > per_page else None
+    return Page(items[:per_page], next_cursor, position is None)
+
+
+def page_links(params, name, page):
+    """Return the query strings of the newest and older pages of a list paged by the name parameter
+
+    Other parameters, such as another list's cursor, are kept. A link is None if there is no such page to go to.
+    """
+    def query(cursor):
+        params_ = params.copy()
+        params_.pop(name, None)
+        if cursor:
+            params_[name] = cursor
+        return params_.urlencode()
+    return {
+        "newest": None if page.is_first else query(None),
+        "older": query(page.next_cursor) if page.next_cursor else None,
+    }
@@ -0,0 +1,30 @@
+from django.dispatch import receiver
+from django.contrib.auth.models import User
+from django.db.models.signals import m2m_changed
+
+
+PROGRAMME_COMMITTEE = "Programme Committee"
+
+
+def get_group_names(user):
+    """Return the names of the groups a user belongs to, queried at most once per user object"""
+    if not user.is_authenticated:
+        return frozenset()
+    # request.user is loaded afresh for every request, so memoising on it scopes the result to the request
+    try:
+        return user._group_names
+    except AttributeError:
+        user._group_names = frozenset(user.groups.values_list("name", flat=True))
+        return user._group_names
+
+
+def is_programme_committee(user):
+    """Is the user a member of the Programme Committee?"""
+    return PROGRAMME_COMMITTEE in get_group_names(user)
+
+
+# Forget the memoised group names when memberships are changed through the same user object
+@receiver(m2m_changed, sender=User.groups.through)
+def forget_group_names(sender, instance, **kwargs):
+    if isinstance(instance, User):
+        instance.__dict__.pop("_group_names", None)
@@ -0,0 +1,163 @@
+import time
+import threading
+from collections import namedtuple
+
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+from django.dispatch import receiver
+from django.db.models.signals import post_save, post_delete
+
+from . import cache
+from .models import SubmissionReview
+
+
+# Calibrated scores for ranking submissions, which correct the plain average score for how harshly each reviewer
+# scores and how much expertise they claimed.
+#
+# Each review's score becomes a z-score against its reviewer's own mean and standard deviation, mapped back onto the
+# scale of the programme as a whole. A submission's calibrated score is the mean of these, weighted by expertise, with
+# a 95% confidence interval, and its controversy is how far the reviewers disagree: the weighted standard deviation of
+# their calibrated scores. Reviewers' and submissions' statistics are shrunk towards the programme's, as if each had
+# PRIOR_REVIEWS more reviews of average score and spread, so a single review can't make its reviewer look harsh or a
+# submission look certain.
+#
+# Every review is loaded into arrays and the whole programme is calibrated in one vectorised pass, which is cached until
+# the next review is saved or deleted. Each worker also keeps the copy it last loaded for as long as the cache
+# generation it was loaded under is current, so calibrated scores can be read per row without going to the cache. As
+# with gambit.singletons, both copies last at most RANKING_CACHE_TIMEOUT seconds, which bounds how stale other workers'
+# scores get when the cache isn't shared between them.
+
+NAMESPACE = "ranking"
+PRIOR_REVIEWS = 2
+# Standard normal quantile of a two-sided 95% confidence interval
+Z_95 = 1.959964
+
+Score = namedtuple("Score", ["score", "low", "high", "controversy", "review_count"])
+
+_Entry = namedtuple("_Entry", ["value", "generation", "expires"])
+_entry = None
+_lock = threading.Lock()
+
+
+def calibrate(submissions, reviewers, scores, expertise):
+    """Return an array of (score, low, high, controversy, review count) rows, one per submission
+
+    The arguments are equal length arrays with one element per review: integer codes of the submission and reviewer
+    from 0 up, the score given and the expertise claimed. Submissions without reviews get rows of NaN.
+    """
+    scores = np.asarray(scores, dtype=float)
+    weights = np.asarray(expertise, dtype=float)
+    mean = scores.mean()
+    variance = scores.var()
+
+    count = np.bincount(reviewers)
+    total = np.bincount(reviewers, scores)
+    reviewer_mean = (total + PRIOR_REVIEWS * mean) / (count + PRIOR_REVIEWS)
+    # The sum of squared deviations from the reviewer's mean, expanded so that it takes a single pass
+    deviations = np.bincount(reviewers, scores * scores) - 2 * reviewer_mean * total + count * reviewer_mean ** 2
+    reviewer_deviation = np.sqrt((deviations + PRIOR_REVIEWS * variance) / (count + PRIOR_REVIEWS))[reviewers]
+    z_scores = np.divide(
+        scores - reviewer_mean[reviewers], reviewer_deviation,
+        out=np.zeros_like(scores), where=reviewer_deviation > 0,
+    )
+    calibrated = mean + z_scores * np.sqrt(variance)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        weight_sum = np.bincount(submissions, weights)
+        score = np.bincount(submissions, weights * calibrated) / weight_sum
+        spread = np.bincount(submissions, weights * (calibrated - score[submissions]) ** 2) / weight_sum
+        # Effective number of reviews, fewer than the real number when their weights are uneven
+        effective = weight_sum ** 2 / np.bincount(submissions, weights * weights)
+        error = np.sqrt((spread * effective + PRIOR_REVIEWS * variance) / (effective + PRIOR_REVIEWS) / effective)
+    return np.column_stack([
+        score, score - Z_95 * error, score + Z_95 * error, np.sqrt(spread), np.bincount(submissions),
+    ])
+
+
+def _key(submission_id):
+    # Primary keys as hex strings, which is how some database drivers return UUIDs and pickles far faster than them
+    return str(submission_id).replace("-", "")
+
+
+class Ranking:
+    """The calibrated scores of every reviewed submission"""
+    def __init__(self, submission_ids, rows):
+        self.submission_ids = [_key(submission_id) for submission_id in submission_ids]
+        self.rows = rows
+        self._index = None
+
+    def __getstate__(self):
+        return {"submission_ids": self.submission_ids, "rows": self.rows, "_index": None}
+
+    def __len__(self):
+        return len(self.submission_ids)
+
+    def get(self, submission_id):
+        """Return the Score of a submission, or None if it hasn't been reviewed"""
+        if self._index is None:
+            self._index = {submission_id: row for row, submission_id in enumerate(self.submission_ids)}
+        row = self._index.get(_key(submission_id))
+        if row is None:
+            return None
+        score, low, high, controversy, review_count = self.rows[row].tolist()
+        return Score(score, low, high, controversy, int(review_count))
+
+    def sort_key(self, submission_id):
+        """Return a key that orders submissions by calibrated score, with unreviewed submissions lowest"""
+        score = self.get(submission_id)
+        return (-np.inf, 0) if score is None else (score.score, score.low)
+
+
+def calculate_ranking():
+    """Load every review and return the Ranking of the submissions they review"""
+    reviews = SubmissionReview.objects.order_by().values_list(
+        "submission_id", "user_id", "submission_score", "expertise_score",
+    )
+    # Skips the ORM's conversion of every row, which takes several times as long as the query
+    sql, params = reviews.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    if not rows:
+        return Ranking([], np.empty((0, len(Score._fields))))
+    submission_ids, user_ids, scores, expertise = zip(*rows)
+    codes = {}
+    submissions = np.fromiter(
+        (codes.setdefault(submission_id, len(codes)) for submission_id in submission_ids), int, len(rows),
+    )
+    _, reviewers = np.unique(user_ids, return_inverse=True)
+    return Ranking(list(codes), calibrate(submissions, reviewers, np.array(scores), np.array(expertise)))
+
+
+def get_ranking():
+    """Return the current Ranking, calculating it only when a review has been written since it was last calculated"""
+    global _entry
+    generation = cache.generation(NAMESPACE)
+    entry = _entry
+    if entry is not None and entry.generation == generation and time.monotonic() < entry.expires:
+        return entry.value
+    # The generation is read before loading, so a write that lands in between only causes one extra calculation
+    value = cache.get_or_set(NAMESPACE, "ranking", calculate_ranking, settings.RANKING_CACHE_TIMEOUT)
+    with _lock:
+        _entry = _Entry(value, generation, time.monotonic() + settings.RANKING_CACHE_TIMEOUT)
+    return value
+
+
+@cache.warmer("ranking")
+def warm():
+    get_ranking()
+
+
+def clear():
+    """Discard the copy held by this worker"""
+    global _entry
+    with _lock:
+        _entry = None
+
+
+@receiver(post_save, sender=SubmissionReview)
+@receiver(post_delete, sender=SubmissionReview)
+def invalidate_ranking(sender, **kwargs):
+    # Bumped once the review is committed, or another request could recalculate and cache the ranking without it
+    transaction.on_commit(lambda: cache.bump(NAMESPACE))
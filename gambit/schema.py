@@ -0,0 +1,209 @@
+import re
+import logging
+
+from django.conf import settings
+from django.db.models import Count
+from django.db.models.functions import Lower
+from django.contrib.auth.models import User
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import CommandError
+from django.db import connections, transaction, DatabaseError
+
+from .search import SEARCH_FIELDS, SEARCH_WEIGHTS, FILE_TEXT_WEIGHT, SQLITE_TABLE
+
+
+logger = logging.getLogger(__name__)
+
+
+# Database objects that Django can't express as model Meta options (or that belong to another app's tables, or to one
+# database vendor) and so aren't covered by the generated migrations. They are created by create_indexes(), run after
+# every migrate, and every statement is safe to run again.
+
+# Indexes that signup relies on to keep accounts apart, and the User field each makes unique ignoring case. The rest
+# only support search, which works without them.
+REQUIRED_INDEXES = {
+    "gambit_user_email_lower_uniq": "email",
+    "gambit_user_username_lower_uniq": "username",
+}
+
+def get_index_statements(connection):
+    """Return (name, SQL) for each index, trigger or table to be created"""
+    user_table = connection.ops.quote_name(User._meta.db_table)
+    statements = [
+        # Case-insensitive uniqueness for signup; users created through the admin may have no email address
+        (
+            "gambit_user_email_lower_uniq",
+            f"CREATE UNIQUE INDEX IF NOT EXISTS gambit_user_email_lower_uniq ON {user_table} (lower(email)) "
+            f"WHERE email <> ''",
+        ),
+        (
+            "gambit_user_username_lower_uniq",
+            f"CREATE UNIQUE INDEX IF NOT EXISTS gambit_user_username_lower_uniq ON {user_table} (lower(username))",
+        ),
+    ]
+    if connection.vendor == "postgresql":
+        statements += get_postgresql_search_statements()
+    elif connection.vendor == "sqlite":
+        statements += get_sqlite_search_statements()
+    return statements
+
+
+def get_postgresql_search_statements():
+    """Maintain Submission.search_vector with triggers, and index it
+
+    The submission trigger also fires when search_vector itself is written, since saving a model writes back whatever
+    value was loaded with it; the ExtractedText trigger relies on that to have the vectors of every submission of a
+    file recalculated when its text arrives.
+    """
+    config = settings.SEARCH_CONFIG
+    if not re.match(r"^\w+$", config):
+        raise ImproperlyConfigured(f"SEARCH_CONFIG must be the name of a text search configuration, not {config!r}")
+    file_text = "(SELECT text FROM gambit_extractedtext WHERE file_hash = NEW.file_hash AND NEW.file_hash <> '')"
+    vector = " || ".join(
+        f"setweight(to_tsvector('{config}', coalesce({value}, '')), '{weight}')"
+        for value, weight in zip(
+            [f"NEW.{field}" for field in SEARCH_FIELDS] + [file_text], SEARCH_WEIGHTS + (FILE_TEXT_WEIGHT,),
+        )
+    )
+    columns = ", ".join(SEARCH_FIELDS + ("file_hash", "search_vector"))
+    return [
+        (
+            "gambit_submission_search_vector_update",
+            f"CREATE OR REPLACE FUNCTION gambit_submission_search_vector_update() RETURNS trigger AS $$ "
+            f"BEGIN NEW.search_vector := {vector}; RETURN NEW; END "
+            f"$$ LANGUAGE plpgsql",
+        ),
+        (
+            "gambit_submission_search_vector_trigger",
+            f"DROP TRIGGER IF EXISTS gambit_submission_search_vector_trigger ON gambit_submission; "
+            f"CREATE TRIGGER gambit_submission_search_vector_trigger "
+            f"BEFORE INSERT OR UPDATE OF {columns} ON gambit_submission "
+            f"FOR EACH ROW EXECUTE PROCEDURE gambit_submission_search_vector_update()",
+        ),
+        (
+            "gambit_extractedtext_search_vector_update",
+            "CREATE OR REPLACE FUNCTION gambit_extractedtext_search_vector_update() RETURNS trigger AS $$ "
+            "BEGIN "
+            "IF TG_OP = 'DELETE' THEN "
+            "UPDATE gambit_submission SET search_vector = NULL WHERE file_hash = OLD.file_hash; "
+            "ELSE "
+            "UPDATE gambit_submission SET search_vector = NULL WHERE file_hash = NEW.file_hash; "
+            "END IF; "
+            "RETURN NULL; END "
+            "$$ LANGUAGE plpgsql",
+        ),
+        (
+            "gambit_extractedtext_search_vector_trigger",
+            "DROP TRIGGER IF EXISTS gambit_extractedtext_search_vector_trigger ON gambit_extractedtext; "
+            "CREATE TRIGGER gambit_extractedtext_search_vector_trigger "
+            "AFTER INSERT OR UPDATE OF text OR DELETE ON gambit_extractedtext "
+            "FOR EACH ROW EXECUTE PROCEDURE gambit_extractedtext_search_vector_update()",
+        ),
+        # Writing the column is enough to have the trigger fill it in
+        (
+            "gambit_submission_search_vector_backfill",
+            "UPDATE gambit_submission SET search_vector = NULL WHERE search_vector IS NULL",
+        ),
+        (
+            "gambit_submission_search_vector_gin",
+            "CREATE INDEX IF NOT EXISTS gambit_submission_search_vector_gin ON gambit_submission "
+            "USING gin (search_vector)",
+        ),
+    ]
+
+
+def get_sqlite_search_statements():
+    """Maintain an FTS5 index of submissions, standing in for search_vector when developing and testing
+
+    The index keeps its own copy of the text, keyed by the submission's primary key, since the implicit rowid of a
+    table with a UUID primary key may change when the database is vacuumed.
+    """
+    columns = ", ".join(SEARCH_FIELDS)
+
+    def delete(where):
+        return f"DELETE FROM {SQLITE_TABLE} WHERE uuid IN (SELECT uuid FROM gambit_submission WHERE {where});"
+
+    def insert(where):
+        return (
+            f"INSERT INTO {SQLITE_TABLE} (uuid, {columns}, file_text) "
+            f"SELECT s.uuid, {', '.join(f's.{field}' for field in SEARCH_FIELDS)}, t.text "
+            f"FROM gambit_submission s LEFT JOIN gambit_extractedtext t ON t.file_hash = s.file_hash "
+            f"AND s.file_hash <> '' WHERE {where};"
+        )
+
+    def trigger(name, event, body):
+        return (name, f"CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {body} END")
+
+    return [
+        (
+            SQLITE_TABLE,
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_TABLE} USING fts5"
+            f"(uuid UNINDEXED, {columns}, file_text, tokenize = 'porter unicode61 remove_diacritics 1')",
+        ),
+        trigger(
+            f"{SQLITE_TABLE}_insert", "AFTER INSERT ON gambit_submission",
+            insert("s.uuid = NEW.uuid"),
+        ),
+        trigger(
+            f"{SQLITE_TABLE}_delete", "AFTER DELETE ON gambit_submission",
+            f"DELETE FROM {SQLITE_TABLE} WHERE uuid = OLD.uuid;",
+        ),
+        trigger(
+            f"{SQLITE_TABLE}_update", f"AFTER UPDATE OF uuid, {columns}, file_hash ON gambit_submission",
+            f"DELETE FROM {SQLITE_TABLE} WHERE uuid = OLD.uuid; {insert('s.uuid = NEW.uuid')}",
+        ),
+        trigger(
+            f"{SQLITE_TABLE}_text_insert", "AFTER INSERT ON gambit_extractedtext",
+            delete("file_hash = NEW.file_hash") + insert("s.file_hash = NEW.file_hash"),
+        ),
+        trigger(
+            f"{SQLITE_TABLE}_text_update", "AFTER UPDATE OF file_hash, text ON gambit_extractedtext",
+            delete("file_hash IN (OLD.file_hash, NEW.file_hash)") +
+            insert("s.file_hash IN (OLD.file_hash, NEW.file_hash)"),
+        ),
+        trigger(
+            f"{SQLITE_TABLE}_text_delete", "AFTER DELETE ON gambit_extractedtext",
+            delete("file_hash = OLD.file_hash") + insert("s.file_hash = OLD.file_hash"),
+        ),
+        (
+            f"{SQLITE_TABLE}_backfill",
+            insert(f"s.uuid NOT IN (SELECT uuid FROM {SQLITE_TABLE})").rstrip(";"),
+        ),
+    ]
+
+
+def get_duplicates(field, using="default"):
+    """Return the values of a User field that more than one user has, ignoring case"""
+    users = User.objects.using(using).exclude(**{field: ""}).annotate(value=Lower(field))
+    return sorted(
+        users.order_by().values("value").annotate(count=Count("pk")).filter(count__gt=1).values_list("value", flat=True)
+    )
+
+
+def create_indexes(using="default", verbosity=1, **kwargs):
+    """Create the indexes that aren't managed by migrations, if they don't already exist
+
+    Raises CommandError if a required index can't be created, once the rest have been.
+    """
+    connection = connections[using]
+    errors = []
+    for name, sql in get_index_statements(connection):
+        try:
+            with transaction.atomic(using=using), connection.cursor() as cursor:
+                cursor.execute(sql)
+        except DatabaseError as e:
+            if name not in REQUIRED_INDEXES:
+                logger.warning("Could not create %s: %s", name, e)
+                continue
+            # Usually existing users that break the index, who need merging or renaming by hand
+            field = REQUIRED_INDEXES[name]
+            message = f"Could not create index {name}: {e}"
+            duplicates = get_duplicates(field, using)
+            if duplicates:
+                message += f". More than one user has each of these {field}s, ignoring case: {', '.join(duplicates)}"
+            errors.append(message)
+        else:
+            if verbosity >= 2:
+                print(f"  Ensured index {name}")
+    if errors:
+        raise CommandError("\n".join(errors))
@@ -0,0 +1,101 @@
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, Q, Value, FloatField
+from django.db.models.expressions import RawSQL
+from django.contrib.postgres.search import SearchQuery, SearchRank
+
+
+# Full-text search over submission titles, authors and abstracts, and the text extracted from their files by
+# gambit.extraction, ranked with matches in the title counting most.
+#
+# On PostgreSQL, Submission.search_vector holds a weighted tsvector kept up to date by a trigger and indexed with GIN
+# (see gambit.schema). On SQLite, e.g. in development and tests, an FTS5 table kept up to date by triggers stands in.
+# Either way only the matching rows are ranked, so a search costs the same however many years of submissions are kept.
+# Any other database falls back to unindexed substring matching.
+#
+# Every term has to match, and the last one matches as a prefix so that results can follow someone's typing.
+
+SEARCH_FIELDS = ("title", "authors", "abstract")
+# Relative importance of matches in each of SEARCH_FIELDS, then in the file's text
+SEARCH_WEIGHTS = ("A", "B", "C")
+FILE_TEXT_WEIGHT = "D"
+SQLITE_WEIGHTS = (10.0, 5.0, 1.0, 0.5)
+SQLITE_TABLE = "gambit_submission_fts"
+# Guards against pathological queries
+MAX_TERMS = 16
+
+
+class InSubquery(RawSQL):
+    """Raw SQL for the right-hand side of an __in lookup
+
+    The lookup adds its own parentheses, and SQLite reads a doubly parenthesised subquery as a single value.
+    """
+
+    def as_sql(self, compiler, connection):
+        return self.sql, self.params
+
+
+class PrefixSearchQuery(SearchQuery):
+    """A SearchQuery in to_tsquery() syntax rather than plain text, which allows prefix matching"""
+
+    def as_sql(self, compiler, connection):
+        sql, params = super(PrefixSearchQuery, self).as_sql(compiler, connection)
+        return sql.replace("plainto_tsquery", "to_tsquery", 1), params
+
+
+def get_terms(query):
+    """Split a search into words, dropping the punctuation that means something to the database's query syntax"""
+    return re.findall(r"\w+", query)[:MAX_TERMS]
+
+
+def _postgresql_query(terms):
+    return PrefixSearchQuery(" & ".join(terms[:-1] + [f"{terms[-1]}:*"]), config=settings.SEARCH_CONFIG)
+
+
+def _sqlite_match(terms):
+    quoted = [f'"{term}"' for term in terms]
+    return " ".join(quoted[:-1] + [f"{quoted[-1]}*"])
+
+
+def search_filter(query):
+    """Return a Q object matching the submissions that match a search, or None if it has no words to search for"""
+    terms = get_terms(query)
+    if not terms:
+        return None
+    if connection.vendor == "postgresql":
+        return Q(search_vector=_postgresql_query(terms))
+    if connection.vendor == "sqlite":
+        return Q(pk__in=InSubquery(
+            f"SELECT uuid FROM {SQLITE_TABLE} WHERE {SQLITE_TABLE} MATCH %s", (_sqlite_match(terms),),
+        ))
+    matches = Q()
+    for term in terms:
+        matches &= Q(title__icontains=term) | Q(authors__icontains=term) | Q(abstract__icontains=term)
+    return matches
+
+
+def search_rank(query):
+    """Return an expression giving how well each submission matches a search, higher being better"""
+    terms = get_terms(query)
+    if terms and connection.vendor == "postgresql":
+        return SearchRank(F("search_vector"), _postgresql_query(terms))
+    if terms and connection.vendor == "sqlite":
+        # bm25() scores better matches lower, and takes a weight for every column, starting with the unindexed uuid
+        weights = ", ".join(str(weight) for weight in (0.0,) + SQLITE_WEIGHTS)
+        return RawSQL(
+            f"SELECT -bm25({SQLITE_TABLE}, {weights}) FROM {SQLITE_TABLE} "
+            f"WHERE {SQLITE_TABLE} MATCH %s AND {SQLITE_TABLE}.uuid = gambit_submission.uuid",
+            (_sqlite_match(terms),),
+            output_field=FloatField(),
+        )
+    return Value(0.0, output_field=FloatField())
+
+
+def search(queryset, query):
+    """Return the submissions matching a search, best match first"""
+    matches = search_filter(query)
+    if matches is None:
+        return queryset.none()
+    return queryset.filter(matches).annotate(search_rank=search_rank(query)).order_by("-search_rank", "uuid")
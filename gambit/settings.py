@@ -2,6 +2,7 @@ import os
 from pathlib import Path
 
 import environ
+from django.core.exceptions import ImproperlyConfigured
 
 import django_heroku
 import dj_database_url
@@ -20,6 +21,8 @@ USE_DJANGO_HIJACK = os.environ.get('USE_DJANGO_HIJACK', default=True)
 USE_MINIFICATION = os.environ.get('USE_MINIFICATION', default=True)
 DATABASE_URL = os.environ.get('DATABASE_URL')
 DEBUG_TOOLBAR = os.environ.get('DEBUG_TOOLBAR', default=False)
+DOWNLOAD_OFFLOAD = os.environ.get('DOWNLOAD_OFFLOAD', default='')
+DOWNLOAD_OFFLOAD_LOCATION = os.environ.get('DOWNLOAD_OFFLOAD_LOCATION')
 SENDGRID_API_KEY = os.environ.get('SENDGRID_API_KEY')
 SENDGRID_SENDER_DOMAIN = os.environ.get('SENDGRID_SENDER_DOMAIN')
 DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL')
@@ -35,6 +38,8 @@ LOGIN_URL = "login"
 LOGIN_REDIRECT_URL = "home"
 WSGI_APPLICATION = "gambit.wsgi.application"
 MINIMUM_PASSWORD_LENGTH = 12
+# Optional file of extra reserved usernames, one per line; "*" at either end makes a prefix/suffix pattern
+RESERVED_USERNAMES_FILE = os.environ.get('RESERVED_USERNAMES_FILE')
 # Whitelist of acceptable file types for submissions
 CONTENT_TYPES = [
     'application/pdf',
@@ -47,6 +52,31 @@ CONTENT_TYPES = [
     'application/x-zip-compressed',
 ]
 MAX_UPLOAD_SIZE = 52428000 #50MiB
+# Hash uploads while they stream in rather than reading them back afterwards
+FILE_UPLOAD_HANDLERS = [
+    'gambit.uploadhandlers.HashingMemoryFileUploadHandler',
+    'gambit.uploadhandlers.HashingTemporaryFileUploadHandler',
+]
+# Upper bound, in seconds, on how long a worker serves its cached copy of the managed content models
+SINGLETON_CACHE_TIMEOUT = int(os.environ.get('SINGLETON_CACHE_TIMEOUT', default=300))
+# Upper bound, in seconds, on how long calibrated scores are served after a review is written, see gambit.ranking
+RANKING_CACHE_TIMEOUT = int(os.environ.get('RANKING_CACHE_TIMEOUT', default=300))
+# Fraction of requests measured by gambit.timing.ServerTimingMiddleware (0 disables it), and how they are reported
+SERVER_TIMING_SAMPLE_RATE = float(os.environ.get('SERVER_TIMING_SAMPLE_RATE', default=0))
+SERVER_TIMING_HEADER = bool(int(os.environ.get('SERVER_TIMING_HEADER', default=1)))
+SERVER_TIMING_LOG = bool(int(os.environ.get('SERVER_TIMING_LOG', default=0)))
+# Bearer token that lets a Prometheus scraper read the metrics view without staff credentials (unset disables it)
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+# PostgreSQL text search configuration used to stem submissions and searches, see gambit.search
+SEARCH_CONFIG = os.environ.get('SEARCH_CONFIG', default='english')
+# Seconds the extract_submission_text command waits for the text of one file before recording it as failed
+EXTRACTION_TIMEOUT = float(os.environ.get('EXTRACTION_TIMEOUT', default=120))
+# Reviewers assigned to each submission by the assign_reviewers command, and the most submissions one reviewer is
+# assigned in a year (0 shares the reviews needed out evenly)
+REVIEWS_PER_SUBMISSION = int(os.environ.get('REVIEWS_PER_SUBMISSION', default=3))
+REVIEWER_MAX_LOAD = int(os.environ.get('REVIEWER_MAX_LOAD', default=0))
+# bcrypt cost factor for password hashes, found with the calibrate_hasher management command
+PASSWORD_HASHER_ROUNDS = int(os.environ.get('PASSWORD_HASHER_ROUNDS', default=12))
 
 if ENVIRONMENT == 'production':
     SECURE_HSTS_SECONDS = 3600
@@ -87,6 +117,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so that its total covers the rest of the middleware too
+    'gambit.timing.ServerTimingMiddleware',
+    'gambit.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -98,7 +131,8 @@ MIDDLEWARE = [
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # The Django backend, timing template rendering for ServerTimingMiddleware
+        'BACKEND': 'gambit.timing.DjangoTemplates',
         'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
@@ -151,6 +185,11 @@ LOGGING = {
             'level': 'INFO',
             'handlers': ['coloured_console'],
         },
+        'gambit.timing': {
+            'level': 'INFO',
+            'handlers': ['coloured_console'],
+            'propagate': False,
+        },
         'gunicorn.access': {
             'handlers': ['coloured_console'],
         },
@@ -175,10 +214,18 @@ LOGGING = {
 # Cache #
 #########
 
+# Configured from a URL, for example:
+#   locmemcache://                        per-process memory (default)
+#   filecache:///var/tmp/gambit_cache     shared between the workers of one host
+#   memcache://127.0.0.1:11211            memcached, shared between hosts
+#   rediscache://127.0.0.1:6379/1         redis (requires django-redis)
+#   dummycache://                         no caching
+# KEY_PREFIX, VERSION and TIMEOUT can be given as query parameters, e.g. memcache://127.0.0.1:11211?version=2
+
+CACHE_URL = os.environ.get('CACHE_URL', default='locmemcache://')
+
 CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
-    }
+    'default': environ.Env.cache_url_config(CACHE_URL),
 }
 
 
@@ -186,9 +233,11 @@ CACHES = {
 # Password validation #
 #######################
 
+# Only one hasher per algorithm can be listed: Django verifies with the last one listed for a hash's algorithm, so the
+# stock BCryptSHA256PasswordHasher would take over checking every login from the timed, calibrated subclass. The
+# subclass verifies bcrypt_sha256 hashes of any cost factor.
 PASSWORD_HASHERS = [
-    'gambit.hashers.ParanoidBCryptSHA256PasswordHasher',
-    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'gambit.hashers.CalibratedBCryptSHA256PasswordHasher',
 ]
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -277,19 +326,62 @@ if DEBUG_TOOLBAR:
     INTERNAL_IPS = ['127.0.0.1', 'localhost']
 
 
+####################
+# Download offload #
+####################
+
+# Once SubmissionFileView has checked permissions, the file can be handed to the front-end web server to send instead
+# of being streamed through a Python worker. Leave DOWNLOAD_OFFLOAD unset to stream in-process, e.g. in development.
+#   nginx     X-Accel-Redirect to DOWNLOAD_OFFLOAD_LOCATION (default /protected-media/), an internal location
+#             aliasing MEDIA_ROOT
+#   apache    X-Sendfile (mod_xsendfile) from DOWNLOAD_OFFLOAD_LOCATION, MEDIA_ROOT as seen by Apache (default
+#             MEDIA_ROOT)
+#   lighttpd  X-Sendfile from DOWNLOAD_OFFLOAD_LOCATION, as for apache
+
+if DOWNLOAD_OFFLOAD == 'nginx':
+    DOWNLOADVIEW_BACKEND = 'django_downloadview.nginx.XAccelRedirectMiddleware'
+    DOWNLOADVIEW_RULES = [
+        {
+            'source_url': MEDIA_URL,
+            'destination_url': DOWNLOAD_OFFLOAD_LOCATION or '/protected-media/',
+        },
+    ]
+elif DOWNLOAD_OFFLOAD in ('apache', 'lighttpd'):
+    DOWNLOADVIEW_BACKEND = f'django_downloadview.{DOWNLOAD_OFFLOAD}.XSendfileMiddleware'
+    DOWNLOADVIEW_RULES = [
+        {
+            'source_url': MEDIA_URL,
+            'destination_dir': DOWNLOAD_OFFLOAD_LOCATION or MEDIA_ROOT,
+        },
+    ]
+elif DOWNLOAD_OFFLOAD:
+    raise ImproperlyConfigured(f"Unknown DOWNLOAD_OFFLOAD '{DOWNLOAD_OFFLOAD}', choose nginx, apache or lighttpd")
+
+if DOWNLOAD_OFFLOAD:
+    MIDDLEWARE.append('django_downloadview.SmartDownloadMiddleware')
+
+
 #########
 # Email #
 #########
 
+# Mail is queued in the database and sent through QUEUED_EMAIL_BACKEND by the send_queued_mail worker
+EMAIL_BACKEND = "gambit.mail.QueuedEmailBackend"
+# Failed messages are retried after QUEUED_EMAIL_RETRY_DELAY seconds, doubling each time, up to the maximum attempts
+QUEUED_EMAIL_MAX_ATTEMPTS = int(os.environ.get('QUEUED_EMAIL_MAX_ATTEMPTS', default=5))
+QUEUED_EMAIL_RETRY_DELAY = int(os.environ.get('QUEUED_EMAIL_RETRY_DELAY', default=60))
+# Seconds a worker may hold a batch before other workers consider it abandoned
+QUEUED_EMAIL_LEASE = 300
+
 if ENVIRONMENT == 'production':
-    EMAIL_BACKEND = "anymail.backends.sendgrid.EmailBackend"
+    QUEUED_EMAIL_BACKEND = "anymail.backends.sendgrid.EmailBackend"
     ANYMAIL = {
         'SENDGRID_API_KEY': SENDGRID_API_KEY,
         'SENDGRID_SENDER_DOMAIN': SENDGRID_SENDER_DOMAIN,
     }
     DEFAULT_FROM_EMAIL = DEFAULT_FROM_EMAIL
 else:
-    EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
+    QUEUED_EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
     EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
 
 
@@ -0,0 +1,80 @@
+import re
+import struct
+import random
+import hashlib
+
+
+# MinHash signatures and locality-sensitive hashing, for finding submissions whose text is nearly the same without
+# comparing every pair.
+#
+# A text is reduced to its set of shingles (runs of SHINGLE_SIZE words). The MinHash signature holds, for each of
+# NUM_PERMUTATIONS random hash functions, the smallest hash of any shingle; the fraction of positions at which two
+# signatures agree estimates the Jaccard similarity of the two shingle sets. The signature is then cut into BANDS bands
+# of ROWS values, and each band hashed to a bucket key. Texts sharing any bucket are candidates, so finding them is an
+# indexed lookup of BANDS keys. With 16 bands of 4 rows, pairs at the THRESHOLD similarity of 0.5 share a bucket about
+# 64% of the time, pairs at 0.8 over 99% of the time, and pairs at 0.2 under 3% of the time.
+
+NUM_PERMUTATIONS = 64
+BANDS = 16
+ROWS = NUM_PERMUTATIONS // BANDS
+SHINGLE_SIZE = 3
+# Texts with fewer shingles than this, such as "TBC", get no signature rather than matching each other
+MIN_SHINGLES = 5
+# Estimated similarity at or above which submissions are reported as similar
+THRESHOLD = 0.5
+# Only the start of a file's text is compared, which keeps signing a submission under a tenth of a second
+MAX_FILE_TEXT_LENGTH = 10000
+
+# A Mersenne prime larger than any shingle hash, and the random hash functions a * x + b mod it, fixed so that
+# signatures stay comparable between processes and releases. Changing any of these means rebuilding every signature.
+PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+_rng = random.Random(20190101)
+PERMUTATIONS = [(_rng.randrange(1, PRIME), _rng.randrange(0, PRIME)) for _ in range(NUM_PERMUTATIONS)]
+SIGNATURE_FORMAT = f"<{NUM_PERMUTATIONS}I"
+
+
+def get_text(abstract, file_text=None):
+    """Return the text of a submission that is compared: its abstract and the start of its file's text"""
+    return f"{abstract}\n{file_text[:MAX_FILE_TEXT_LENGTH]}" if file_text else abstract
+
+
+def get_shingles(text):
+    """Return the set of hashed word shingles in a text, ignoring case and punctuation"""
+    words = re.findall(r"\w+", text.casefold())
+    shingles = {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(max(len(words) - SHINGLE_SIZE + 1, 0))}
+    return {
+        int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=4).digest(), "little")
+        for shingle in shingles
+    }
+
+
+def get_signature(text):
+    """Return the MinHash signature of a text, packed into bytes, or None if the text is too short to compare"""
+    shingles = get_shingles(text)
+    if len(shingles) < MIN_SHINGLES:
+        return None
+    return struct.pack(SIGNATURE_FORMAT, *(
+        min((a * shingle + b) % PRIME for shingle in shingles) & MAX_HASH for a, b in PERMUTATIONS
+    ))
+
+
+def get_band_keys(signature):
+    """Return the LSH bucket key of each band of a signature, as signed 64-bit integers for a BigIntegerField"""
+    signature = bytes(signature)
+    band_size = len(signature) // BANDS
+    return [
+        int.from_bytes(
+            hashlib.blake2b(bytes([band]) + signature[band * band_size:(band + 1) * band_size], digest_size=8).digest(),
+            "little",
+            signed=True,
+        )
+        for band in range(BANDS)
+    ]
+
+
+def estimate_similarity(signature, other):
+    """Return the estimated Jaccard similarity of the texts two signatures were computed from"""
+    values = struct.unpack(SIGNATURE_FORMAT, bytes(signature))
+    other_values = struct.unpack(SIGNATURE_FORMAT, bytes(other))
+    return sum(value == other_value for value, other_value in zip(values, other_values)) / NUM_PERMUTATIONS
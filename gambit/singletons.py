@@ -0,0 +1,94 @@
+import time
+import threading
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import transaction
+from django.dispatch import receiver
+from django.db.models.signals import post_save, post_delete
+
+from . import cache
+from .models import SubmissionDeadline, RegistrationStatus, FrontPage, HelpPageItem
+
+
+# The managed content models change a handful of times a year but are read on almost every request, so each worker
+# keeps its own copy, backed by a copy in the shared cache so that new workers don't all go to the database. Saving or
+# deleting any instance bumps the model's cache namespace, which is how other workers find out: a local copy is only
+# trusted while the namespace generation still matches the one it was loaded under, and for at most
+# SINGLETON_CACHE_TIMEOUT seconds, which bounds staleness when the cache isn't shared between workers.
+# Cached instances are shared between requests and must be treated as read-only.
+
+_Entry = namedtuple("_Entry", ["value", "generation", "expires"])
+_entries = {}
+_lock = threading.Lock()
+
+
+def _namespace(model):
+    return f"singleton:{model._meta.label_lower}"
+
+
+def _get(model, loader):
+    generation = cache.generation(_namespace(model))
+    entry = _entries.get(model)
+    if entry is not None and entry.generation == generation and time.monotonic() < entry.expires:
+        return entry.value
+    # The generation is read before loading, so a write that lands in between only causes one extra reload
+    value = cache.get_or_set(_namespace(model), "value", loader, settings.SINGLETON_CACHE_TIMEOUT)
+    with _lock:
+        _entries[model] = _Entry(value, generation, time.monotonic() + settings.SINGLETON_CACHE_TIMEOUT)
+    return value
+
+
+def get_submission_deadline():
+    """Return the SubmissionDeadline, or None if one hasn't been added yet"""
+    return _get(SubmissionDeadline, SubmissionDeadline.objects.first)
+
+
+def get_registration_status():
+    """Return the RegistrationStatus, or None if one hasn't been added yet"""
+    return _get(RegistrationStatus, RegistrationStatus.objects.first)
+
+
+def get_front_page():
+    """Return the FrontPage, or None if one hasn't been added yet"""
+    return _get(FrontPage, FrontPage.objects.first)
+
+
+def get_help_page_items():
+    """Return a list of every HelpPageItem"""
+    return _get(HelpPageItem, lambda: list(HelpPageItem.objects.all()))
+
+
+def invalidate(model):
+    """Discard the cached copy of a managed content model in every worker"""
+    with _lock:
+        _entries.pop(model, None)
+    cache.bump(_namespace(model))
+
+
+@cache.warmer("managed_content")
+def warm():
+    """Load every managed content model into the shared cache"""
+    get_submission_deadline()
+    get_registration_status()
+    get_front_page()
+    get_help_page_items()
+
+
+def clear():
+    """Discard every cached copy held by this worker"""
+    with _lock:
+        _entries.clear()
+
+
+@receiver(post_save, sender=SubmissionDeadline)
+@receiver(post_save, sender=RegistrationStatus)
+@receiver(post_save, sender=FrontPage)
+@receiver(post_save, sender=HelpPageItem)
+@receiver(post_delete, sender=SubmissionDeadline)
+@receiver(post_delete, sender=RegistrationStatus)
+@receiver(post_delete, sender=FrontPage)
+@receiver(post_delete, sender=HelpPageItem)
+def invalidate_managed_content(sender, **kwargs):
+    # Once the change is committed, or a worker could reload and cache the old value under the new generation
+    transaction.on_commit(lambda: invalidate(sender))
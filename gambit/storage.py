@@ -0,0 +1,33 @@
+import os
+import uuid
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+from .timing import timed
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """File system storage for files named after a hash of their content
+
+    Since a name identifies its content, a file that already exists is never written again: saving identical content
+    costs no disk space or write I/O and just returns the existing name. New files are staged under a unique name and
+    renamed into place, so concurrent saves of the same content can't clash. Deciding when a file is no longer
+    referenced, and so can be deleted, is left to the models that use the storage.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        with timed("storage"):
+            if self.exists(name):
+                return name
+            staged = super(ContentAddressedStorage, self).save(f"{name}.{uuid.uuid4().hex}.partial", content)
+            os.replace(self.path(staged), self.path(name))
+            return name
+
+    def delete(self, name):
+        with timed("storage"):
+            super(ContentAddressedStorage, self).delete(name)
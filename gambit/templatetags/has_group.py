@@ -1,9 +1,9 @@
 from django import template
-from django.contrib.auth.models import Group
+
+from gambit.permissions import get_group_names
 
 register = template.Library()
 
 @register.filter(name="has_group")
 def has_group(user, group_name):
-    group = Group.objects.get(name=group_name)
-    return group in user.groups.all()
+    return group_name in get_group_names(user)
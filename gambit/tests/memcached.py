@@ -0,0 +1,99 @@
+import socketserver
+import threading
+
+
+class MemcachedHandler(socketserver.StreamRequestHandler):
+    """Speaks the subset of the memcached text protocol used by Django's memcached cache backends"""
+
+    def handle(self):
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command, *args = line.decode().split()
+            handler = getattr(self, f"do_{command}", None)
+            if handler is None:
+                self.reply("ERROR")
+            else:
+                handler(*args)
+
+    def reply(self, *lines):
+        for line in lines:
+            self.wfile.write((line if isinstance(line, bytes) else line.encode()) + b"\r\n")
+
+    def do_get(self, *keys):
+        lines = []
+        for key in keys:
+            if key in self.server.data:
+                flags, value = self.server.data[key]
+                lines += [f"VALUE {key} {flags} {len(value)}", value]
+        self.reply(*lines, "END")
+
+    do_gets = do_get
+
+    def _store(self, key, flags, exptime, length, *noreply):
+        value = self.rfile.read(int(length) + 2)[:-2]
+        return key, (int(flags), value)
+
+    def do_set(self, *args):
+        key, item = self._store(*args)
+        self.server.data[key] = item
+        self.reply("STORED")
+
+    def do_add(self, *args):
+        key, item = self._store(*args)
+        if key in self.server.data:
+            self.reply("NOT_STORED")
+        else:
+            self.server.data[key] = item
+            self.reply("STORED")
+
+    def do_delete(self, key, *noreply):
+        self.reply("DELETED" if self.server.data.pop(key, None) else "NOT_FOUND")
+
+    def _step(self, key, delta):
+        if key not in self.server.data:
+            return self.reply("NOT_FOUND")
+        flags, value = self.server.data[key]
+        value = str(max(int(value) + delta, 0)).encode()
+        self.server.data[key] = (flags, value)
+        self.reply(value)
+
+    def do_incr(self, key, delta, *noreply):
+        self._step(key, int(delta))
+
+    def do_decr(self, key, delta, *noreply):
+        self._step(key, -int(delta))
+
+    def do_touch(self, key, exptime, *noreply):
+        self.reply("TOUCHED" if key in self.server.data else "NOT_FOUND")
+
+    def do_flush_all(self, *args):
+        self.server.data.clear()
+        self.reply("OK")
+
+    def do_version(self):
+        self.reply("VERSION 1.0-test")
+
+
+class MemcachedServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    """In-process stand-in for a memcached server, listening on an ephemeral localhost port"""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super(MemcachedServer, self).__init__(("127.0.0.1", 0), MemcachedHandler)
+        self.data = {}
+
+    @property
+    def location(self):
+        host, port = self.server_address
+        return f"{host}:{port}"
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
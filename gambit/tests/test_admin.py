@@ -0,0 +1,48 @@
+import csv
+import io
+
+from django.urls import reverse
+from django.test import TestCase
+
+from . import factories
+
+
+class ExportToCsvTest(TestCase):
+    def setUp(self):
+        self.admin = factories.UserFactory.create(username="admin", is_staff=True, is_superuser=True)
+        self.submitter = factories.UserFactory.create(username="submitter", email="submitter@example.org")
+        self.submitter.profile.name = "Sam Mitter"
+        self.submitter.profile.country = "Wales"
+        self.submitter.profile.save()
+        self.submission = factories.SubmissionFactory.create(
+            user=self.submitter, title="Coroutines", authors="Sam Mitter", contact_email="sam@example.org",
+        )
+        factories.SubmissionReviewFactory.create(submission=self.submission, user=self.admin, submission_score=4)
+        self.client.force_login(self.admin)
+
+    def export(self, changelist, pk):
+        response = self.client.post(reverse(changelist), {"action": "_export_to_csv", "_selected_action": [str(pk)]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/csv")
+        return list(csv.reader(io.StringIO(b"".join(response.streaming_content).decode())))
+
+    def test_submissions(self):
+        header, *rows = self.export("admin:gambit_submission_changelist", self.submission.pk)
+        self.assertEqual(
+            header, ["Title", "Authors", "Contact", "Submitted On", "Score", "Submitter", "Submitter Email", "Country"],
+        )
+        self.assertEqual(len(rows), 1)
+        title, authors, contact, submitted_on, score, name, email, country = rows[0]
+        self.assertEqual(
+            [title, authors, contact, score, name, email, country],
+            ["Coroutines", "Sam Mitter", "sam@example.org", "4.0", "Sam Mitter", "submitter@example.org", "Wales"],
+        )
+        self.assertTrue(submitted_on.startswith(str(self.submission.submitted_on.date())))
+
+    def test_review_comments(self):
+        review = self.submission.get_reviews().get()
+        review.comments = "Clear, with good examples"
+        review.save()
+        header, *rows = self.export("admin:gambit_submissionreview_changelist", review.pk)
+        self.assertEqual(header, ["Reviewer", "Comments", "Submission Title"])
+        self.assertEqual(rows, [[self.admin.profile.name, "Clear, with good examples", "Coroutines"]])
@@ -0,0 +1,188 @@
+import io
+import random
+import itertools
+from collections import Counter
+from datetime import timedelta
+
+from django.urls import reverse
+from django.test import TestCase
+from django.utils import timezone
+from django.contrib.auth.models import Group
+from django.core.management import call_command
+
+from . import factories
+from gambit import assignment
+from gambit.models import Submission, SubmissionReview, ReviewAssignment
+
+
+def brute_force(benefits, demands, capacities):
+    """Return the most places that can be filled, and the best total benefit of filling that many"""
+    choices = [
+        [
+            combination
+            for size in range(demand + 1)
+            for combination in itertools.combinations(sorted(reviewers), size)
+        ]
+        for reviewers, demand in zip(benefits, demands)
+    ]
+    best = (0, 0)
+    for assignment_ in itertools.product(*choices):
+        load = [0] * len(capacities)
+        for assigned in assignment_:
+            for j in assigned:
+                load[j] += 1
+        if all(load[j] <= capacity for j, capacity in enumerate(capacities)):
+            filled = sum(len(assigned) for assigned in assignment_)
+            total = sum(benefits[i][j] for i, assigned in enumerate(assignment_) for j in assigned)
+            best = max(best, (filled, total))
+    return best
+
+
+def check(test, benefits, demands, capacities, assigned):
+    for i, reviewers in enumerate(assigned):
+        test.assertEqual(len(reviewers), len(set(reviewers)))
+        test.assertLessEqual(len(reviewers), demands[i])
+        test.assertTrue(all(j in benefits[i] for j in reviewers))
+    for j, capacity in enumerate(capacities):
+        test.assertLessEqual(sum(reviewers.count(j) for reviewers in assigned), capacity)
+
+
+class SolveTest(TestCase):
+    def test_optimal_on_small_problems(self):
+        rng = random.Random(1)
+        for _ in range(20):
+            demands = [rng.randint(0, 2) for _ in range(4)]
+            capacities = [rng.randint(0, 3) for _ in range(4)]
+            # Benefits in multiples of the number of places, which makes the result within one per place exact
+            benefits = [
+                {j: rng.randint(0, 5) * 9 for j in range(4) if rng.random() < 0.8}
+                for _ in demands
+            ]
+            assigned = assignment.solve(benefits, demands, capacities)
+            check(self, benefits, demands, capacities, assigned)
+            filled = sum(len(reviewers) for reviewers in assigned)
+            total = sum(benefits[i][j] for i, reviewers in enumerate(assigned) for j in reviewers)
+            self.assertEqual((filled, total), brute_force(benefits, demands, capacities))
+
+    def test_fills_every_place_that_can_be_filled(self):
+        rng = random.Random(2)
+        demands = [3] * 300
+        capacities = [90] * 10
+        benefits = [{j: rng.randint(0, 1000) for j in range(10) if rng.random() < 0.7} for _ in demands]
+        assigned = assignment.solve(benefits, demands, capacities)
+        check(self, benefits, demands, capacities, assigned)
+        self.assertEqual(
+            sum(len(reviewers) for reviewers in assigned),
+            sum(min(len(reviewers), 3) for reviewers in benefits),
+        )
+
+    def test_not_enough_reviewers(self):
+        assigned = assignment.solve([{0: 5, 1: 1}, {0: 1}], [2, 1], [1, 1])
+        self.assertEqual([sorted(reviewers) for reviewers in assigned], [[0, 1], []])
+        self.assertEqual(assignment.solve([{0: 5, 1: 1}, {0: 1}], [1, 1], [1, 0]), [[0], []])
+        self.assertEqual(assignment.solve([{0: 5}], [2], [0]), [[]])
+        self.assertEqual(assignment.solve([], [], [3]), [])
+
+
+class ConflictsTest(TestCase):
+    def setUp(self):
+        self.reviewer = factories.UserFactory.create(
+            username="zoe", first_name="Zoë", last_name="Smith", email="zoe@example.com",
+        )
+        self.reviewer.profile.name = "Zoe  Smith-Jones"
+        self.reviewer.profile.save()
+        self.other = factories.UserFactory.create(
+            username="other", first_name="Al", last_name="", email="al@example.org",
+        )
+        self.submitter = factories.UserFactory.create(username="submitter")
+
+    def get_conflicts(self, **fields):
+        submission = factories.SubmissionFactory.create(user=self.submitter, **fields)
+        conflicts = assignment.get_conflicts([submission], [self.reviewer, self.other])
+        return {reviewer_pk for _, reviewer_pk in conflicts}
+
+    def test_names_and_emails_match_however_written(self):
+        self.assertEqual(self.get_conflicts(conflicts="My advisor, ZOE\nSMITH"), {self.reviewer.pk})
+        self.assertEqual(self.get_conflicts(authors="Ann Other, Zoe Smith-Jones"), {self.reviewer.pk})
+        self.assertEqual(self.get_conflicts(contact_email="Zoe@Example.com"), {self.reviewer.pk})
+        self.assertEqual(self.get_conflicts(conflicts="al@example.org"), {self.other.pk})
+
+    def test_partial_names_do_not_match(self):
+        self.assertFalse(self.get_conflicts(conflicts="Zoe Smithson, Al Jones"))
+
+    def test_own_submissions(self):
+        submission = factories.SubmissionFactory.create(user=self.reviewer)
+        self.assertEqual(assignment.get_conflicts([submission], [self.reviewer]), {(submission.pk, self.reviewer.pk)})
+
+
+class AssignReviewersTest(TestCase):
+    def setUp(self):
+        programme_committee, created = Group.objects.get_or_create(name="Programme Committee")
+        self.submitter = factories.UserFactory.create(username="submitter", first_name="Sam", last_name="Mitter")
+        self.reviewers = {}
+        for name, topic in [("async", "asyncio event loops and coroutines"), ("packaging", "wheels and packaging")]:
+            reviewer = factories.UserFactory.create(username=name, first_name=name.title(), last_name="Reviewer")
+            reviewer.groups.add(programme_committee)
+            self.reviewers[name] = reviewer
+            past = factories.SubmissionFactory.create(user=self.submitter, title=topic, abstract=topic)
+            factories.SubmissionReviewFactory.create(submission=past, user=reviewer, expertise_score=5)
+        self.conflicted = factories.UserFactory.create(username="conflicted", first_name="Con", last_name="Flicted")
+        self.conflicted.groups.add(programme_committee)
+        factories.UserFactory.create(username="bystander")
+        last_year = timezone.now() - timedelta(days=366)
+        Submission.objects.update(submitted_on=last_year)
+
+        self.async_talk = factories.SubmissionFactory.create(
+            user=self.submitter, title="Coroutines", abstract="Writing asyncio event loops", conflicts="Con Flicted",
+        )
+        self.packaging_talk = factories.SubmissionFactory.create(
+            user=self.submitter, title="Wheels", abstract="Building wheels for packaging", conflicts="Con Flicted",
+        )
+
+    def get_assignments(self):
+        return set(ReviewAssignment.objects.values_list("submission__title", "user__username"))
+
+    def test_command_assigns_by_affinity_and_avoids_conflicts(self):
+        out, err = io.StringIO(), io.StringIO()
+        call_command(
+            "assign_reviewers", year=timezone.now().year, reviews_per_submission=2, max_load=1, stdout=out, stderr=err,
+        )
+        self.assertEqual(self.get_assignments(), {("Coroutines", "async"), ("Wheels", "packaging")})
+        self.assertIn("Made 2 review assignments", out.getvalue())
+        self.assertIn("2 reviews could not be assigned", err.getvalue())
+        self.assertGreater(ReviewAssignment.objects.get(user=self.reviewers["async"]).affinity, 0)
+
+    def test_existing_reviews_and_assignments_count(self):
+        factories.SubmissionReviewFactory.create(submission=self.async_talk, user=self.reviewers["packaging"])
+        ReviewAssignment.objects.create(submission=self.packaging_talk, user=self.reviewers["async"])
+        submissions = Submission.objects.filter(pk__in=[self.async_talk.pk, self.packaging_talk.pk])
+        self.assertEqual(assignment.assign_reviewers(submissions, 2, 2), (2, 0))
+        self.assertEqual(
+            self.get_assignments(),
+            {("Coroutines", "async"), ("Wheels", "async"), ("Wheels", "packaging")},
+        )
+        self.assertEqual(SubmissionReview.objects.filter(submission=self.async_talk).count(), 1)
+        self.assertEqual(assignment.assign_reviewers(submissions, 2, 2), (0, 0))
+
+    def test_even_share_includes_earlier_assignments(self):
+        this_year = Submission.objects.filter(submitted_on__year=timezone.now().year)
+        factories.SubmissionFactory.create(user=self.submitter, title="Typing", abstract="Type hints")
+        self.assertEqual(assignment.assign_reviewers(this_year, 1), (3, 0))
+        # Another submission arrives after the first ones were assigned
+        factories.SubmissionFactory.create(user=self.submitter, title="Testing", abstract="Property based testing")
+        self.assertEqual(assignment.assign_reviewers(this_year, 1), (1, 0))
+        loads = Counter(ReviewAssignment.objects.values_list("user_id", flat=True))
+        self.assertEqual(sorted(loads.values()), [1, 1, 2])
+
+    def test_admin_action(self):
+        admin = factories.UserFactory.create(username="admin", is_staff=True, is_superuser=True)
+        self.client.force_login(admin)
+        response = self.client.post(
+            reverse("admin:gambit_submission_changelist"),
+            {"action": "_assign_reviewers", "_selected_action": [str(self.async_talk.pk)]},
+            follow=True,
+        )
+        # An even share of three reviews between three reviewers, one of whom is conflicted
+        self.assertContains(response, "Made 2 review assignments.")
+        self.assertContains(response, "1 reviews could not be assigned")
+        self.assertEqual(self.get_assignments(), {("Coroutines", "async"), ("Coroutines", "packaging")})
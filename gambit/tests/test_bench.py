@@ -0,0 +1,51 @@
+import os
+import json
+import tempfile
+from io import StringIO
+
+from django.test import TestCase
+from django.core.management import call_command
+
+from gambit import bench, ranking, singletons
+from gambit.models import Submission, SubmissionReview
+
+
+class BenchTest(TestCase):
+    def setUp(self):
+        singletons.clear()
+
+    def test_seed_volumes(self):
+        fixtures = bench.seed(users=20, submissions=10, reviews=30, reviewers=5)
+        self.assertEqual(Submission.objects.count(), 10)
+        self.assertEqual(SubmissionReview.objects.count(), 30)
+        self.assertEqual(fixtures.submission.user, fixtures.submitter)
+        # Statistics are rebuilt after the bulk inserts
+        self.assertEqual(sum(Submission.objects.values_list("review_count", flat=True)), 30)
+
+    def test_command_writes_report_and_rolls_back(self):
+        output = os.path.join(tempfile.mkdtemp(), "bench.json")
+        self.addCleanup(os.unlink, output)
+        stdout = StringIO()
+        call_command(
+            "bench", "home", "submission", "list_submissions_data", "submission_list",
+            users=20, submissions=10, reviews=30, reviewers=5, repeat=2, output=output,
+            stdout=stdout, stderr=StringIO(),
+        )
+        with open(output) as f:
+            report = json.load(f)
+        names = [result["name"] for result in report["results"]]
+        self.assertIn("GET submission as submitter", names)
+        self.assertIn("GET list_submissions_data as programme_committee", names)
+        self.assertIn("submission_list", names)
+        self.assertEqual(len(names), 3 * len(bench.ROLES) + 1)
+        for result in report["results"]:
+            self.assertNotIn("error", result)
+        self.assertEqual(Submission.objects.count(), 0)
+        # Nor are calibrated scores of the rolled back reviews left cached
+        self.assertEqual(len(ranking.get_ranking()), 0)
+
+        call_command(
+            "bench", "home", users=5, submissions=2, reviews=2, reviewers=1, repeat=1, output=output, compare=output,
+            stdout=stdout, stderr=StringIO(),
+        )
+        self.assertIn("GET home as anonymous", stdout.getvalue().rsplit("Compared with", 1)[1])
@@ -0,0 +1,33 @@
+import os
+import tempfile
+
+from django.test import SimpleTestCase
+
+from gambit.blacklist import ReservedUsernames, reserved, skeleton
+
+
+class ReservedUsernamesTest(SimpleTestCase):
+    def test_case_and_confusables(self):
+        for username in ["admin", "Admin", "ROOT", "Adm1n", "аdmin", "ｒｏｏｔ", "r00t", "pośtmaster"]:
+            with self.subTest(username=username):
+                self.assertIn(username, reserved)
+        self.assertEqual(skeleton("ADM1N"), skeleton("admin"))
+
+    def test_patterns(self):
+        for username in ["administrator2", "AdminBot", "billing-support", "team_admin", "noreply42"]:
+            with self.subTest(username=username):
+                self.assertIn(username, reserved)
+        for username in ["Test.User", "badminton", "support-team", "jane.doe", "steve"]:
+            with self.subTest(username=username):
+                self.assertNotIn(username, reserved)
+
+    def test_infix_pattern_and_external_list(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as f:
+            f.write("# Staff accounts\nalice\n*official*\n\n")
+        self.addCleanup(os.unlink, f.name)
+        with open(f.name) as entries:
+            compiled = ReservedUsernames(entries)
+        self.assertIn("Alice", compiled)
+        self.assertNotIn("alice2", compiled)
+        self.assertIn("the-official-account", compiled)
+        self.assertNotIn("offical", compiled)
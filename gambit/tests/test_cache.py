@@ -0,0 +1,68 @@
+from io import StringIO
+
+from django.test import TestCase
+from django.core.management import call_command
+from django.test.utils import override_settings
+from django.core.cache import cache as django_cache
+
+from gambit import cache, singletons
+from gambit.models import FrontPage
+from .memcached import MemcachedServer
+
+
+class CacheAPITest(TestCase):
+    def setUp(self):
+        django_cache.clear()
+
+    def test_get_set_delete(self):
+        self.assertEqual(cache.get("test", "key", "default"), "default")
+        cache.set("test", "key", None)
+        self.assertIsNone(cache.get("test", "key", "default"))
+        cache.delete("test", "key")
+        self.assertEqual(cache.get("test", "key", "default"), "default")
+
+    def test_get_or_set_only_computes_once(self):
+        calls = []
+        for i in range(3):
+            self.assertEqual(cache.get_or_set("test", "key", lambda: calls.append(i) or "value"), "value")
+        self.assertEqual(calls, [0])
+
+    def test_bump_invalidates_namespace(self):
+        cache.set("test", "key", "value")
+        cache.set("other", "key", "value")
+        generation = cache.generation("test")
+        self.assertGreater(cache.bump("test"), generation)
+        self.assertIsNone(cache.get("test", "key"))
+        self.assertEqual(cache.get("other", "key"), "value")
+
+    def test_bump_recovers_from_evicted_generation(self):
+        cache.set("test", "key", "value")
+        django_cache.delete(cache._generation_key("test"))
+        cache.bump("test")
+        self.assertIsNone(cache.get("test", "key"))
+
+
+class MemcachedBackendTest(TestCase):
+    def test_cache_api_over_memcached_protocol(self):
+        with MemcachedServer() as server:
+            backend = {'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache', 'LOCATION': server.location}
+            with override_settings(CACHES={'default': backend}):
+                cache.set("test", "key", {"a": 1})
+                self.assertEqual(cache.get("test", "key"), {"a": 1})
+                cache.bump("test")
+                self.assertIsNone(cache.get("test", "key"))
+                self.assertEqual(cache.get_or_set("test", "key", lambda: "fresh"), "fresh")
+                self.assertEqual(cache.get("test", "key"), "fresh")
+
+
+class WarmCacheCommandTest(TestCase):
+    def setUp(self):
+        django_cache.clear()
+        singletons.clear()
+
+    def test_warm_cache_populates_managed_content(self):
+        FrontPage.objects.create(name="Front Page")
+        call_command("warm_cache", stdout=StringIO())
+        singletons.clear()
+        with self.assertNumQueries(0):
+            self.assertEqual(singletons.get_front_page().name, "Front Page")
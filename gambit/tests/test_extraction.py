@@ -0,0 +1,154 @@
+import os
+import io
+import time
+import shutil
+import zipfile
+import tempfile
+import multiprocessing
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
+
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from . import factories
+from gambit import extraction
+from gambit.search import search
+from gambit.models import Submission, ExtractedText
+
+
+SAMPLE_PDF = os.path.join(os.path.dirname(__file__), "sample_correct_file.pdf")
+
+
+def make_zip(members):
+    content = io.BytesIO()
+    with zipfile.ZipFile(content, "w") as archive:
+        for name, data in members.items():
+            # A fixed timestamp makes identical members give identical files
+            archive.writestr(zipfile.ZipInfo(name, date_time=(2019, 1, 1, 0, 0, 0)), data)
+    return content.getvalue()
+
+
+def make_docx(*paragraphs):
+    body = "".join(f"<w:p><w:r><w:t>{paragraph}</w:t></w:r></w:p>" for paragraph in paragraphs)
+    return make_zip({
+        "word/document.xml":
+            f'<w:document xmlns:w="{extraction.WORD_NAMESPACE[1:-1]}"><w:body>{body}</w:body></w:document>',
+    })
+
+
+def make_pptx(*slides):
+    return make_zip({
+        f"ppt/slides/slide{number}.xml":
+            f'<p:sld xmlns:p="urn:p" xmlns:a="{extraction.DRAWING_NAMESPACE[1:-1]}">'
+            f'<a:p><a:r><a:t>{text}</a:t></a:r></a:p></p:sld>'
+        for number, text in enumerate(slides, 1)
+    })
+
+
+class ExtractTextTest(TestCase):
+    def test_docx(self):
+        self.assertEqual(extraction.extract_text(make_docx("Hello", "world"), "paper.docx"), "Hello\nworld")
+
+    def test_pptx_slides_are_in_order(self):
+        slides = [f"Slide {number}" for number in range(1, 12)]
+        self.assertEqual(extraction.extract_text(make_pptx(*slides), "talk.PPTX"), "\n".join(slides))
+
+    def test_pdf(self):
+        with open(SAMPLE_PDF, "rb") as f:
+            self.assertIn("a CFP with PoC", extraction.extract_text(f.read(), "paper.pdf"))
+
+    def test_zip_members(self):
+        content = make_zip({
+            "slides.pptx": make_pptx("Slides"),
+            "paper/paper.docx": make_docx("Paper"),
+            "notes.txt": "Not extracted",
+            "broken.pdf": b"Not a PDF",
+        })
+        with self.assertLogs("gambit.extraction", "WARNING"):
+            self.assertEqual(extraction.extract_text(content, "talk.zip"), "Slides\nPaper")
+
+    def test_unsupported_and_broken_files(self):
+        self.assertEqual(extraction.extract_text(b"Text", "talk.ppt"), "")
+        path = os.path.join(tempfile.mkdtemp(), "broken.docx")
+        with open(path, "wb") as f:
+            f.write(b"Not a zip")
+        text, error = extraction.extract_file(path)
+        self.assertEqual(text, "")
+        self.assertIn("BadZipFile", error)
+        shutil.rmtree(os.path.dirname(path))
+
+    def test_clean_text(self):
+        self.assertEqual(extraction.clean_text(" A\x00  b \n\n\t c "), "A b\nc")
+
+
+class ExtractPendingTest(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.submitter = factories.UserFactory.create(username="submitter")
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root)
+
+    def submit(self, name, content):
+        upload = SimpleUploadedFile(name, content, content_type="application/octet-stream")
+        return factories.SubmissionFactory.create(user=self.submitter, title="Talk", file=upload)
+
+    def test_identical_files_are_extracted_once(self):
+        first = self.submit("talk.docx", make_docx("Coroutines"))
+        self.submit("copy.docx", make_docx("Coroutines"))
+        self.assertEqual(extraction.get_pending(10), [(first.file_hash, first.file.name)])
+        with ThreadPoolExecutor(1) as executor:
+            self.assertEqual(extraction.extract_pending(executor), (1, 0))
+            self.assertEqual(extraction.extract_pending(executor), (0, 0))
+        self.assertEqual(ExtractedText.objects.get().text, "Coroutines")
+
+    def test_failures_are_only_retried_on_request(self):
+        broken = self.submit("talk.pdf", b"Not a PDF")
+        with ThreadPoolExecutor(1) as executor, self.assertLogs("gambit.extraction", "WARNING"):
+            self.assertEqual(extraction.extract_pending(executor), (0, 1))
+        self.assertEqual(extraction.get_pending(10), [])
+        retry_before = ExtractedText.objects.get().extracted_on
+        self.assertEqual(extraction.get_pending(10, retry_before=retry_before), [])
+        ExtractedText.objects.update(extracted_on=retry_before.replace(year=retry_before.year - 1))
+        self.assertEqual(extraction.get_pending(10, retry_before=retry_before), [(broken.file_hash, broken.file.name)])
+
+    @override_settings(EXTRACTION_TIMEOUT=0.5)
+    def test_hung_extraction_is_killed(self):
+        self.submit("talk.docx", make_docx("Coroutines"))
+
+        def extract_forever(path):
+            while True:
+                time.sleep(1)
+
+        started = time.monotonic()
+        with mock.patch("gambit.extraction.extract_file", extract_forever), ThreadPoolExecutor(1) as executor, \
+                self.assertLogs("gambit.extraction", "WARNING"):
+            self.assertEqual(extraction.extract_pending(executor), (0, 1))
+        # The executor shut down without waiting on the extraction, whose process is gone
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertEqual(multiprocessing.active_children(), [])
+        self.assertEqual(ExtractedText.objects.get().error, "Timed out after 0.5 seconds")
+        self.assertEqual(ExtractedText.objects.get().text, "")
+
+    def test_command_extracts_in_worker_processes_and_feeds_search(self):
+        submission = self.submit("talk.pptx", make_pptx("Asynchronous generators"))
+        other = self.submit("other.docx", make_docx("Packaging"))
+        ExtractedText.objects.create(file_hash="0" * 128, text="No longer submitted")
+        self.assertEqual(list(search(Submission.objects.all(), "generators")), [])
+        call_command("extract_submission_text", workers=2, stdout=io.StringIO())
+        self.assertEqual(
+            sorted(ExtractedText.objects.values_list("file_hash", flat=True)),
+            sorted([submission.file_hash, other.file_hash]),
+        )
+        self.assertEqual(list(search(Submission.objects.all(), "generators")), [submission])
+        # Replacing the file replaces the text that is searched
+        submission.file = SimpleUploadedFile("talk.docx", make_docx("Packaging"), content_type="application/zip")
+        submission.save()
+        self.assertEqual(list(search(Submission.objects.all(), "generators")), [])
+        self.assertEqual(len(search(Submission.objects.all(), "packaging")), 2)
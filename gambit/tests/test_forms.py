@@ -75,6 +75,40 @@ class SignupFormIncorrect(SignupFormBase):
         self.assertFalse(form.is_valid())
         self.assertEqual(form.non_field_errors()[0], "Email address has already been used.")
 
+    def test_signup_form_conflicts_ignore_case_in_one_query(self):
+        factories.UserFactory.create(username="Taken", email="Null@Example.org")
+        data = {
+            'username': 'TAKEN',
+            'email': self.email,
+            'password1': factories.USER_PASSWORD,
+            'password2': factories.USER_PASSWORD,
+            'name': self.name,
+            'country': self.country,
+            'affiliation': self.affiliation,
+        }
+        form = SignUpForm(data=data)
+        with self.assertNumQueries(1):
+            self.assertFalse(form.is_valid())
+        self.assertEqual(form.non_field_errors()[0], "Username already exists.")
+        form = SignUpForm(data={**data, 'username': self.username, 'email': 'null@EXAMPLE.org'})
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.non_field_errors()[0], "Email address has already been used.")
+
+    def test_signup_form_existing_username_with_invalid_email_address(self):
+        factories.UserFactory.create(username="taken", email="")
+        form = SignUpForm(data={
+            'username': 'taken',
+            'email': "not an email address",
+            'password1': factories.USER_PASSWORD,
+            'password2': factories.USER_PASSWORD,
+            'name': self.name,
+            'country': self.country,
+            'affiliation': self.affiliation,
+        })
+        self.assertFalse(form.is_valid())
+        self.assertIn("email", form.errors)
+        self.assertEqual(form.non_field_errors()[0], "Username already exists.")
+
     def test_signup_form_password1_mismatch(self):
         form = SignUpForm(data={
             'username': self.username,
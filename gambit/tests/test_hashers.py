@@ -0,0 +1,41 @@
+from io import StringIO
+
+from django.test import TestCase
+from django.core.management import call_command
+from django.test.utils import override_settings
+from django.contrib.auth.hashers import make_password, identify_hasher
+
+from . import factories
+from gambit.hashers import calibrate, MIN_ROUNDS, MAX_ROUNDS
+
+
+def get_rounds(encoded):
+    return int(identify_hasher(encoded).safe_summary(encoded)["work factor"])
+
+
+class CalibratedHasherTest(TestCase):
+    @override_settings(PASSWORD_HASHER_ROUNDS=5)
+    def test_uses_configured_rounds(self):
+        self.assertEqual(get_rounds(make_password("correct horse battery")), 5)
+
+    def test_rehashes_on_login_when_rounds_change(self):
+        with override_settings(PASSWORD_HASHER_ROUNDS=4):
+            user = factories.UserFactory.create(password=make_password(factories.USER_PASSWORD))
+        self.assertEqual(get_rounds(user.password), 4)
+        with override_settings(PASSWORD_HASHER_ROUNDS=5):
+            self.assertTrue(self.client.login(username=user.username, password=factories.USER_PASSWORD))
+        user.refresh_from_db()
+        self.assertEqual(get_rounds(user.password), 5)
+
+    def test_calibrate_picks_highest_rounds_within_target(self):
+        timer = lambda rounds: 0.001 * 2 ** (rounds - MIN_ROUNDS)
+        rounds, timings = calibrate(0.25, timer)
+        self.assertEqual(rounds, 11)
+        self.assertEqual(max(timings), 12)
+        self.assertEqual(calibrate(0.0001, timer)[0], MIN_ROUNDS)
+        self.assertEqual(calibrate(float("inf"), timer)[0], MAX_ROUNDS)
+
+    def test_command_recommends_rounds(self):
+        output = StringIO()
+        call_command("calibrate_hasher", target_ms=5, stdout=output, stderr=StringIO())
+        self.assertIn("Recommended: PASSWORD_HASHER_ROUNDS=", output.getvalue())
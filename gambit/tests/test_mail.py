@@ -0,0 +1,113 @@
+from io import StringIO
+from email.mime.text import MIMEText
+
+from django.core import mail
+from django.urls import reverse
+from django.test import TestCase
+from django.utils import timezone
+from django.core.management import call_command
+from django.test.utils import override_settings
+from django.core.mail.backends.base import BaseEmailBackend
+
+from . import factories
+from gambit.models import QueuedEmail
+from gambit.mail import send_queued_mail, serialise_message, deserialise_message
+
+
+class FailingEmailBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        raise ConnectionError("Provider unavailable")
+
+
+class UnreachableEmailBackend(BaseEmailBackend):
+    def open(self):
+        raise ConnectionRefusedError("Connection refused")
+
+    def send_messages(self, email_messages):
+        raise AssertionError("Never connected")
+
+
+@override_settings(
+    EMAIL_BACKEND='gambit.mail.QueuedEmailBackend',
+    QUEUED_EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+)
+class QueuedEmailTest(TestCase):
+    def test_mail_is_queued_until_worker_runs(self):
+        mail.send_mail("Subject", "Body", "cfp@example.org", ["speaker@example.org"])
+        self.assertEqual(len(mail.outbox), 0)
+        queued = QueuedEmail.objects.get()
+        self.assertEqual(queued.recipients, "speaker@example.org")
+
+        output = StringIO()
+        call_command("send_queued_mail", stdout=output)
+        self.assertIn("Sent 1, failed 0", output.getvalue())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].subject, "Subject")
+        self.assertEqual(mail.outbox[0].to, ["speaker@example.org"])
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, QueuedEmail.SENT)
+        self.assertIsNotNone(queued.sent_on)
+
+    def test_html_body_and_attachments_round_trip(self):
+        message = mail.EmailMessage("Subject", "<p>Body</p>", "cfp@example.org", ["speaker@example.org"])
+        message.content_subtype = "html"
+        message.mixed_subtype = "related"
+        message.attach("notes.txt", "Speaker notes", "text/plain")
+        message.attach("slides.pdf", b"%PDF-1.4\x00\xff", "application/pdf")
+        rebuilt = deserialise_message(serialise_message(message))
+        self.assertEqual(rebuilt.content_subtype, "html")
+        self.assertEqual(rebuilt.mixed_subtype, "related")
+        self.assertEqual(rebuilt.attachments, message.attachments)
+        self.assertEqual(rebuilt.message().get_content_type(), "multipart/related")
+        body, notes, slides = rebuilt.message().get_payload()
+        self.assertEqual(body.get_content_type(), "text/html")
+        self.assertEqual(notes.get_filename(), "notes.txt")
+        self.assertEqual(slides.get_payload(decode=True), b"%PDF-1.4\x00\xff")
+
+    def test_mime_attachments_are_refused(self):
+        message = mail.EmailMessage("Subject", "Body", "cfp@example.org", ["speaker@example.org"])
+        message.attach(MIMEText("Speaker notes"))
+        with self.assertRaises(ValueError):
+            message.send()
+        self.assertFalse(QueuedEmail.objects.exists())
+
+    def test_batches_share_a_connection(self):
+        for i in range(5):
+            mail.send_mail(f"Subject {i}", "Body", "cfp@example.org", [f"speaker{i}@example.org"])
+        self.assertEqual(send_queued_mail(batch_size=3), (3, 0))
+        self.assertEqual(send_queued_mail(batch_size=3), (2, 0))
+        self.assertEqual(send_queued_mail(batch_size=3), (0, 0))
+        self.assertEqual(len(mail.outbox), 5)
+
+    @override_settings(QUEUED_EMAIL_BACKEND='gambit.tests.test_mail.UnreachableEmailBackend')
+    def test_connection_failures_back_off(self):
+        for i in range(2):
+            mail.send_mail(f"Subject {i}", "Body", "cfp@example.org", [f"speaker{i}@example.org"])
+        self.assertEqual(send_queued_mail(), (0, 2))
+        for queued in QueuedEmail.objects.all():
+            self.assertEqual(queued.status, QueuedEmail.QUEUED)
+            self.assertEqual(queued.attempts, 1)
+            self.assertGreater(queued.next_attempt_on, timezone.now())
+            self.assertIn("Connection refused", queued.last_error)
+        self.assertEqual(send_queued_mail(), (0, 0))
+
+    @override_settings(QUEUED_EMAIL_BACKEND='gambit.tests.test_mail.FailingEmailBackend', QUEUED_EMAIL_MAX_ATTEMPTS=2)
+    def test_failures_back_off_then_give_up(self):
+        mail.send_mail("Subject", "Body", "cfp@example.org", ["speaker@example.org"])
+        self.assertEqual(send_queued_mail(), (0, 1))
+        queued = QueuedEmail.objects.get()
+        self.assertEqual(queued.status, QueuedEmail.QUEUED)
+        self.assertGreater(queued.next_attempt_on, timezone.now())
+        self.assertIn("Provider unavailable", queued.last_error)
+        # Not due again until the backoff has passed
+        self.assertEqual(send_queued_mail(), (0, 0))
+        QueuedEmail.objects.update(next_attempt_on=timezone.now())
+        self.assertEqual(send_queued_mail(), (0, 1))
+        self.assertEqual(QueuedEmail.objects.get().status, QueuedEmail.FAILED)
+
+    def test_password_reset_is_queued(self):
+        user = factories.UserFactory.create(email="speaker@example.org")
+        response = self.client.post(reverse("password_reset"), {"email": user.email})
+        self.assertRedirects(response, reverse("password_reset_done"), fetch_redirect_response=False)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(QueuedEmail.objects.get().recipients, user.email)
@@ -0,0 +1,108 @@
+import os
+import sys
+import base64
+import subprocess
+from unittest import mock
+
+from django.conf import settings
+from django.urls import reverse
+from django.test import TestCase
+from django.core.cache import cache
+from django.test.utils import override_settings
+from django.contrib.auth.hashers import make_password, identify_hasher
+from prometheus_client import REGISTRY
+
+from . import factories
+from gambit import metrics, singletons
+from gambit.models import QueuedEmail
+from gambit.hashers import CalibratedBCryptSHA256PasswordHasher
+
+
+class MetricsTest(TestCase):
+    def setUp(self):
+        singletons.clear()
+        cache.clear()
+        self.staff = factories.UserFactory.create(username="staff", is_staff=True)
+
+    def basic_auth(self, username, password):
+        return "Basic " + base64.b64encode(f"{username}:{password}".encode()).decode()
+
+    def test_requires_staff(self):
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, 401)
+        self.assertIn("Basic", response["WWW-Authenticate"])
+        self.client.force_login(factories.UserFactory.create(username="speaker"))
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 401)
+        response = self.client.get(
+            reverse("metrics"), HTTP_AUTHORIZATION=self.basic_auth("staff", "not the password"),
+        )
+        self.assertEqual(response.status_code, 401)
+
+    def test_staff_basic_auth(self):
+        response = self.client.get(
+            reverse("metrics"), HTTP_AUTHORIZATION=self.basic_auth("staff", factories.USER_PASSWORD),
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_successful_basic_auth_is_remembered(self):
+        authorization = self.basic_auth("staff", factories.USER_PASSWORD)
+        with mock.patch("gambit.metrics.authenticate", wraps=metrics.authenticate) as authenticate:
+            for _ in range(3):
+                response = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION=authorization)
+                self.assertEqual(response.status_code, 200)
+        self.assertEqual(authenticate.call_count, 1)
+        # Losing staff status takes effect straight away
+        self.staff.is_staff = False
+        self.staff.save()
+        self.assertEqual(self.client.get(reverse("metrics"), HTTP_AUTHORIZATION=authorization).status_code, 401)
+
+    @override_settings(METRICS_TOKEN="scraper-token")
+    def test_bearer_token(self):
+        response = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer scraper-token")
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer wrong-token")
+        self.assertEqual(response.status_code, 401)
+
+    def test_request_and_outbox_metrics(self):
+        labels = {"view": "home", "method": "GET", "status": "200"}
+        before = REGISTRY.get_sample_value("gambit_requests_total", labels) or 0
+        self.client.get(reverse("home"))
+        self.assertEqual(REGISTRY.get_sample_value("gambit_requests_total", labels), before + 1)
+
+        QueuedEmail.objects.create(subject="Hello", recipients="a@example.org", message="{}")
+        self.client.force_login(self.staff)
+        content = self.client.get(reverse("metrics")).content.decode()
+        self.assertIn('gambit_outbox_messages{status="queued"} 1.0', content)
+        self.assertIn('gambit_request_queries_bucket{le="5.0",view="home"}', content)
+
+    @override_settings(PASSWORD_HASHER_ROUNDS=4)
+    def test_password_hashing_is_observed(self):
+        before = REGISTRY.get_sample_value("gambit_password_hash_duration_seconds_count")
+        make_password("correct horse battery")
+        self.assertEqual(REGISTRY.get_sample_value("gambit_password_hash_duration_seconds_count"), before + 1)
+
+    @override_settings(PASSWORD_HASHER_ROUNDS=4)
+    def test_login_is_observed(self):
+        user = factories.UserFactory.create(username="speaker", password=make_password("correct horse battery"))
+        self.assertIsInstance(identify_hasher(user.password), CalibratedBCryptSHA256PasswordHasher)
+        before = REGISTRY.get_sample_value("gambit_password_hash_duration_seconds_count")
+        self.assertTrue(self.client.login(username="speaker", password="correct horse battery"))
+        self.assertEqual(REGISTRY.get_sample_value("gambit_password_hash_duration_seconds_count"), before + 1)
+
+
+class GunicornConfigTest(TestCase):
+    def test_multiprocess_mode_is_set_before_prometheus_client_is_imported(self):
+        # A fresh interpreter, as gunicorn's master is, loads the config and then the app's metrics
+        script = (
+            "import importlib.util, sys\n"
+            "spec = importlib.util.spec_from_file_location('gunicorn_conf', sys.argv[1])\n"
+            "spec.loader.exec_module(importlib.util.module_from_spec(spec))\n"
+            "from prometheus_client import values\n"
+            "print(values.ValueClass is values.MutexValue)\n"
+        )
+        env = {key: value for key, value in os.environ.items() if key.upper() != "PROMETHEUS_MULTIPROC_DIR"}
+        output = subprocess.run(
+            [sys.executable, "-c", script, os.path.join(os.path.dirname(settings.BASE_DIR), "gunicorn.conf.py")],
+            env=env, stdout=subprocess.PIPE, check=True,
+        ).stdout
+        self.assertEqual(output.strip(), b"False")
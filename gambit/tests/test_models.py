@@ -1,10 +1,13 @@
 import random
+from io import StringIO
+
 from django.db import models
 from django.test import TestCase
+from django.core.management import call_command
 from django.contrib.auth.models import User
 
 from . import factories
-from gambit.models import SubmissionReview
+from gambit.models import Submission, SubmissionReview
 
 
 class ProfileModel(TestCase):
@@ -57,6 +60,47 @@ class SubmissionModel(TestCase):
         )["submission_score__sum"]
         self.assertEqual(self.submission.get_total_score(), total_score)
 
+    def test_submission_review_stats_follow_review_writes(self):
+        review = self.submission.get_reviews().first()
+        review.submission_score += 1
+        review.save()
+        review.delete()
+        stats = SubmissionReview.objects.filter(submission=self.submission).aggregate(
+            count=models.Count("pk"),
+            total=models.Sum("submission_score"),
+            expertise=models.Sum("expertise_score"),
+        )
+        submission = Submission.objects.get(pk=self.submission.pk)
+        self.assertEqual(submission.review_count, stats["count"])
+        self.assertEqual(submission.score_sum, stats["total"])
+        self.assertEqual(submission.expertise_sum, stats["expertise"])
+
+    def test_saving_a_stale_submission_keeps_review_stats(self):
+        stale = Submission.objects.get(pk=self.submission.pk)
+        factories.SubmissionReviewFactory.create(
+            submission=self.submission, user=factories.UserFactory.create(username="late.reviewer"),
+        )
+        stale.title = "Retitled"
+        stale.save()
+        submission = Submission.objects.get(pk=self.submission.pk)
+        self.assertEqual(submission.title, "Retitled")
+        self.assertEqual(submission.review_count, stale.review_count + 1)
+        self.assertEqual(submission.review_count, SubmissionReview.objects.filter(submission=submission).count())
+
+    def test_submission_with_review_stats_query_count(self):
+        for i in range(3):
+            factories.SubmissionFactory.create(user=factories.UserFactory.create(username=f"submitter.{i}"))
+        with self.assertNumQueries(1):
+            for submission in Submission.objects.with_review_stats():
+                (submission.review_count, submission.average_score, submission.user.profile.name)
+
+    def test_rebuild_review_stats_command(self):
+        expected = list(Submission.objects.values_list("review_count", "score_sum", "expertise_sum", "average_score"))
+        Submission.objects.update(review_count=0, score_sum=0, expertise_sum=0, average_score=0)
+        call_command("rebuild_review_stats", stdout=StringIO())
+        rebuilt = Submission.objects.values_list("review_count", "score_sum", "expertise_sum", "average_score")
+        self.assertEqual(list(rebuilt), expected)
+
 
 class SubmissionReviewModel(TestCase):
     def setUp(self):
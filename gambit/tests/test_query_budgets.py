@@ -0,0 +1,171 @@
+import shutil
+import tempfile
+
+from django.urls import reverse
+from django.db import connection, transaction
+from django.test import TestCase
+from django.core.cache import cache
+from django.contrib.auth.models import User, Group
+from django.contrib.auth.hashers import make_password
+from django.test.utils import override_settings, CaptureQueriesContext
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from gambit import bench, singletons
+from gambit.permissions import PROGRAMME_COMMITTEE
+from gambit.models import Profile, Submission, SubmissionReview, refresh_review_stats
+
+
+# Most queries any role may make to render each view, at every scale. Each view is also required to make the same
+# number of queries however many rows it shows, so per-row queries fail even when they fit within the budget.
+# Every view in gambit.urls needs a budget here.
+QUERY_BUDGETS = {
+    "home": 6,
+    "profile": 6,
+    "update_profile": 4,
+    "signup": 3,
+    "help": 3,
+    "metrics": 2,
+    "account_activation_sent": 3,
+    "submit": 3,
+    "list_submissions": 3,
+    "list_submissions_data": 5,
+    "search_submissions": 3,
+    "download_submission": 4,
+    "password_change": 3,
+    "password_change_done": 3,
+    "submission": 5,
+    "update_submission": 6,
+    "new_review": 6,
+    "update_review": 8,
+    "login": 2,
+    "password_reset": 3,
+    "password_reset_done": 3,
+    "password_reset_confirm": 5,
+    "password_reset_complete": 3,
+}
+
+
+# Views that anonymous users may see, and views only the Programme Committee may see. Anonymous users are sent to log
+# in for the rest.
+PUBLIC_VIEWS = {
+    "home", "signup", "account_activation_sent", "login", "password_reset", "password_reset_done",
+    "password_reset_confirm", "password_reset_complete", "metrics",
+}
+PROGRAMME_COMMITTEE_VIEWS = {
+    "list_submissions", "list_submissions_data", "search_submissions", "new_review", "update_review",
+}
+
+
+def get_expected_status(name, role):
+    """Return the status code of a GET of the view by the role"""
+    if name == "metrics":
+        # Staff only, and none of the roles are staff
+        return 401
+    if name == "password_reset_confirm" or (name == "login" and role != "anonymous"):
+        # The reset token is moved out of the URL, and logged in users are sent home
+        return 302
+    if role == "anonymous":
+        return 200 if name in PUBLIC_VIEWS else 302
+    if role == "submitter" and name in PROGRAMME_COMMITTEE_VIEWS:
+        return 403
+    if role == "programme_committee" and name == "update_submission":
+        return 403
+    return 200
+
+
+class QueryBudgetTest(TestCase):
+    scales = (10, 100, 1000)
+
+    def setUp(self):
+        singletons.clear()
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root)
+
+    def seed(self, rows):
+        """Create data that gives every view `rows` rows to show
+
+        The submitter has `rows` submissions, the first of which has `rows` reviews, and the reviewer has reviewed
+        `rows` submissions.
+        """
+        password = make_password(bench.PASSWORD)
+        User.objects.bulk_create(
+            User(username=f"budget.{rows}.{i}", email=f"budget.{rows}.{i}@example.org", password=password)
+            for i in range(rows + 1)
+        )
+        users = list(User.objects.filter(username__startswith=f"budget.{rows}.").order_by("pk"))
+        Profile.objects.bulk_create(Profile(user_id=user.pk, name=user.username, country="Wales") for user in users)
+        submitter, reviewers = users[0], users[1:]
+        committee, _ = Group.objects.get_or_create(name=PROGRAMME_COMMITTEE)
+        Group.user_set.through.objects.bulk_create(
+            Group.user_set.through(user_id=user.pk, group=committee) for user in reviewers
+        )
+        Submission.objects.bulk_create(
+            Submission(user_id=submitter.pk, title=f"Submission {i}", contact_email="speaker@example.org")
+            for i in range(rows)
+        )
+        submissions = list(Submission.objects.filter(user_id=submitter.pk).order_by("title"))
+        reviewer = reviewers[0]
+        SubmissionReview.objects.bulk_create(
+            [SubmissionReview(user_id=reviewer.pk, submission_id=submission.pk) for submission in submissions] +
+            [SubmissionReview(user_id=user.pk, submission_id=submissions[0].pk) for user in reviewers[1:]]
+        )
+        refresh_review_stats(submissions[0].pk)
+        # Something for download_submission to send
+        submissions[0].file = SimpleUploadedFile("talk.pdf", b"slides", content_type="application/pdf")
+        submissions[0].save()
+        bench.seed_managed_content()
+        return bench.Fixtures(
+            submitter=submitter,
+            reviewer=User.objects.get(pk=reviewer.pk),
+            submission=submissions[0],
+            review=SubmissionReview.objects.filter(user_id=reviewer.pk).first(),
+            unreviewed=Submission.objects.create(user=submitter, title="Unreviewed", contact_email="a@example.org"),
+        )
+
+    def count_queries(self, rows):
+        """Return (view name, role) -> number of queries for every view at the given scale"""
+        counts = {}
+        sid = transaction.savepoint()
+        try:
+            fixtures = self.seed(rows)
+            for role in bench.ROLES:
+                client = bench.get_client(role, fixtures)
+                for name, path in bench.get_urls(fixtures):
+                    # Warm up per-process caches first, since only the steady state matters
+                    client.get(path, {"length": rows})
+                    with CaptureQueriesContext(connection) as queries:
+                        response = client.get(path, {"length": rows})
+                    counts[name, role] = len(queries)
+                    # A budget only means something for the response the role is meant to get
+                    with self.subTest(view=name, role=role, rows=rows):
+                        self.assertEqual(response.status_code, get_expected_status(name, role))
+                        if role == "anonymous" and response.status_code == 302 and name != "password_reset_confirm":
+                            self.assertTrue(response["Location"].startswith(reverse("login")))
+        finally:
+            transaction.savepoint_rollback(sid)
+            singletons.clear()
+            cache.clear()
+        return counts
+
+    def test_every_view_has_a_budget(self):
+        fixtures = self.seed(1)
+        names = {name for name, path in bench.get_urls(fixtures)}
+        self.assertEqual(names - set(QUERY_BUDGETS), set(), "Add a query budget for these views")
+
+    def test_query_counts_are_within_budget_and_constant(self):
+        counts = {rows: self.count_queries(rows) for rows in self.scales}
+        smallest = counts[self.scales[0]]
+        for (name, role), queries in sorted(smallest.items()):
+            with self.subTest(view=name, role=role):
+                self.assertLessEqual(queries, QUERY_BUDGETS[name], f"{name} as {role} is over its query budget")
+                self.assertEqual(
+                    [counts[rows][name, role] for rows in self.scales],
+                    [queries] * len(self.scales),
+                    f"{name} as {role} makes more queries as rows are added",
+                )
@@ -0,0 +1,122 @@
+import numpy as np
+from django.urls import reverse
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import override_settings
+from django.core.cache import cache
+from django.contrib.auth.models import Group
+
+from . import factories
+from gambit import ranking
+
+
+def calibrate(reviews):
+    """Calibrate (submission, reviewer, score, expertise) tuples"""
+    return ranking.calibrate(*(np.array(column) for column in zip(*reviews)))
+
+
+class CalibrateTest(TestCase):
+    def test_corrects_for_harsh_reviewers(self):
+        # The harsh reviewer scores 1 or 2 where the generous one scores 4 or 5
+        harsh = [(submission, 0, 1 + submission % 2, 3) for submission in range(10)]
+        generous = [(submission, 1, 4 + submission % 2, 3) for submission in range(10, 20)]
+        scores = calibrate(harsh + generous)[:, 0]
+        self.assertGreater(scores[1], scores[10])
+        self.assertLess(scores[10] - scores[0], 1)
+
+    def test_weights_by_expertise(self):
+        # Both reviewers score the same on average, but the expert likes the first submission
+        rows = calibrate([(0, 0, 5, 5), (0, 1, 1, 1), (1, 0, 1, 5), (1, 1, 5, 1)])
+        self.assertGreater(rows[0, 0], rows[1, 0])
+
+    def test_confidence_and_controversy(self):
+        agreed = [(0, reviewer, 4, 3) for reviewer in range(4)]
+        disputed = [(1, 4, 5, 3), (1, 5, 1, 3), (1, 6, 5, 3), (1, 7, 1, 3)]
+        single = [(2, 8, 4, 3)]
+        score, low, high, controversy, review_count = calibrate(agreed + disputed + single).T
+        self.assertTrue(np.all(low < score) and np.all(score < high))
+        self.assertAlmostEqual(controversy[0], 0)
+        self.assertGreater(controversy[1], 1)
+        self.assertLess(high[0] - low[0], high[2] - low[2])
+        self.assertEqual(review_count.tolist(), [4, 4, 1])
+
+    def test_identical_scores(self):
+        rows = calibrate([(0, 0, 3, 1), (1, 0, 3, 5), (1, 1, 3, 2)])
+        self.assertEqual(rows[:, :4].tolist(), [[3, 3, 3, 0], [3, 3, 3, 0]])
+
+
+# The cache is invalidated once a review is committed, which TestCase never does
+class RankingTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        ranking.clear()
+        programme_committee, created = Group.objects.get_or_create(name="Programme Committee")
+        self.reviewers = []
+        for name in ["harsh", "generous"]:
+            reviewer = factories.UserFactory.create(username=name)
+            reviewer.groups.add(programme_committee)
+            self.reviewers.append(reviewer)
+        self.submitter = factories.UserFactory.create(username="submitter")
+        self.submissions = [
+            factories.SubmissionFactory.create(user=self.submitter, title=title)
+            for title in ["Alpha", "Bravo", "Charlie", "Delta"]
+        ]
+        # Alpha and Bravo average 3, but Alpha got the harsh reviewer's best score. Delta isn't reviewed.
+        for submission, reviewer, score in [(0, 0, 3), (1, 0, 1), (2, 1, 4), (1, 1, 5), (2, 0, 1)]:
+            factories.SubmissionReviewFactory.create(
+                submission=self.submissions[submission], user=self.reviewers[reviewer], submission_score=score,
+            )
+
+    def test_cached_until_the_next_review(self):
+        with self.assertNumQueries(1):
+            first = ranking.get_ranking()
+        self.assertEqual(len(first), 3)
+        self.assertIsNone(first.get(self.submissions[3].pk))
+        self.assertEqual(first.get(self.submissions[1].pk).review_count, 2)
+        with self.assertNumQueries(0):
+            self.assertIs(ranking.get_ranking(), first)
+        # Another worker finds it in the shared cache
+        ranking.clear()
+        with self.assertNumQueries(0):
+            ranking.get_ranking()
+        review = factories.SubmissionReviewFactory.create(submission=self.submissions[3], user=self.reviewers[0])
+        self.assertEqual(len(ranking.get_ranking()), 4)
+        review.delete()
+        self.assertIsNone(ranking.get_ranking().get(self.submissions[3].pk))
+
+    @override_settings(RANKING_CACHE_TIMEOUT=0)
+    def test_cached_copies_expire(self):
+        # Bounds how long workers that don't share a cache with the writer serve stale scores
+        with self.assertNumQueries(1):
+            ranking.get_ranking()
+        with self.assertNumQueries(1):
+            ranking.get_ranking()
+
+    def test_invalidated_when_the_review_is_committed(self):
+        ranking.get_ranking()
+        with transaction.atomic():
+            factories.SubmissionReviewFactory.create(submission=self.submissions[3], user=self.reviewers[0])
+            # Until the review commits, other workers keep the cached ranking without it
+            ranking.clear()
+            self.assertEqual(len(ranking.get_ranking()), 3)
+        self.assertEqual(len(ranking.get_ranking()), 4)
+
+    def test_list_view_orders_by_calibrated_score(self):
+        self.client.force_login(self.reviewers[0])
+        params = {"draw": 1, "length": 2, "order[0][column]": 3, "order[0][dir]": "desc"}
+        data = self.client.get(reverse("list_submissions_data"), params).json()
+        self.assertEqual(data["recordsFiltered"], 4)
+        self.assertEqual([row["title"] for row in data["data"]], ["Alpha", "Bravo"])
+        self.assertLess(data["data"][0]["score_interval"][0], data["data"][0]["calibrated_score"])
+        data = self.client.get(reverse("list_submissions_data"), {**params, "start": 2}).json()
+        self.assertEqual([row["title"] for row in data["data"]], ["Charlie", "Delta"])
+        self.assertIsNone(data["data"][1]["calibrated_score"])
+
+    def test_list_view_orders_by_calibrated_score_as_a_secondary_column(self):
+        self.client.force_login(self.reviewers[0])
+        params = {
+            "draw": 1, "length": 10,
+            "order[0][column]": 1, "order[0][dir]": "desc", "order[1][column]": 3, "order[1][dir]": "asc",
+        }
+        data = self.client.get(reverse("list_submissions_data"), params).json()
+        self.assertEqual([row["title"] for row in data["data"]], ["Charlie", "Bravo", "Alpha", "Delta"])
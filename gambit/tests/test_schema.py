@@ -0,0 +1,40 @@
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase
+from django.contrib.auth.models import User
+from django.core.management.base import CommandError
+
+from gambit.schema import create_indexes
+from gambit.forms import ResetUserPasswordForm
+from . import factories
+
+
+class UserIndexesTest(TestCase):
+    def test_email_and_username_are_unique_ignoring_case(self):
+        factories.UserFactory.create(username="speaker", email="speaker@example.org")
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            User.objects.create(username="other", email="Speaker@Example.org")
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            User.objects.create(username="SPEAKER", email="other@example.org")
+
+    def test_blank_emails_are_allowed(self):
+        User.objects.create(username="first", email="")
+        User.objects.create(username="second", email="")
+        self.assertEqual(User.objects.filter(email="").count(), 2)
+
+    def test_create_indexes_is_idempotent(self):
+        create_indexes(verbosity=0)
+
+    def test_duplicates_that_break_a_unique_index_are_reported(self):
+        with connection.cursor() as cursor:
+            cursor.execute("DROP INDEX gambit_user_email_lower_uniq")
+        User.objects.create(username="first", email="speaker@example.org")
+        User.objects.create(username="second", email="Speaker@Example.org")
+        with self.assertRaisesMessage(CommandError, "gambit_user_email_lower_uniq") as raised:
+            create_indexes(verbosity=0)
+        self.assertIn("speaker@example.org", str(raised.exception))
+        self.assertNotIn("gambit_user_username_lower_uniq", str(raised.exception))
+
+    def test_password_reset_matches_email_ignoring_case(self):
+        user = factories.UserFactory.create(email="speaker@example.org")
+        form = ResetUserPasswordForm()
+        self.assertEqual(list(form.get_users("SPEAKER@example.org")), [user])
@@ -0,0 +1,87 @@
+from django.urls import reverse
+from django.test import TestCase
+from django.utils import timezone
+from django.contrib.auth.models import Group
+
+from . import factories
+from gambit.models import Submission
+from gambit.search import search, get_terms
+
+
+class SearchTest(TestCase):
+    def setUp(self):
+        self.submitter = factories.UserFactory.create(username="submitter")
+        self.title_match = factories.SubmissionFactory.create(
+            user=self.submitter, title="Securing Django", abstract="A talk about web frameworks",
+        )
+        self.abstract_match = factories.SubmissionFactory.create(
+            user=self.submitter, title="Web frameworks", abstract="Comparing Django with Flask",
+        )
+        self.author_match = factories.SubmissionFactory.create(
+            user=self.submitter, title="Packaging", authors="Ada Lovelace",
+        )
+
+    def search(self, query):
+        return list(search(Submission.objects.all(), query))
+
+    def test_title_matches_rank_above_abstract_matches(self):
+        self.assertEqual(self.search("django"), [self.title_match, self.abstract_match])
+
+    def test_searches_authors(self):
+        self.assertEqual(self.search("lovelace"), [self.author_match])
+
+    def test_every_term_must_match(self):
+        self.assertEqual(self.search("django flask"), [self.abstract_match])
+
+    def test_last_term_matches_as_a_prefix(self):
+        self.assertEqual(self.search("packag"), [self.author_match])
+        self.assertEqual(self.search("packag django"), [])
+
+    def test_words_are_stemmed(self):
+        self.assertEqual(self.search("secure"), [self.title_match])
+
+    def test_punctuation_is_ignored(self):
+        self.assertEqual(get_terms('"django" AND (flask*)'), ["django", "AND", "flask"])
+        self.assertEqual(self.search("*:&|"), [])
+
+    def test_index_follows_changes(self):
+        self.title_match.title = "Hardening Pyramid"
+        self.title_match.save()
+        self.assertEqual(self.search("django"), [self.abstract_match])
+        self.assertEqual(self.search("pyramid"), [self.title_match])
+        self.abstract_match.delete()
+        self.assertEqual(self.search("django"), [])
+
+
+class SearchSubmissionsTest(TestCase):
+    def setUp(self):
+        programme_committee, created = Group.objects.get_or_create(name="Programme Committee")
+        self.reviewer = factories.UserFactory.create(username="reviewer")
+        self.reviewer.groups.add(programme_committee)
+        self.submitter = factories.UserFactory.create(username="submitter")
+        for title in ["Async Python", "Async Rust", "Typing"]:
+            factories.SubmissionFactory.create(user=self.submitter, title=title)
+        last_year = timezone.now().replace(year=timezone.now().year - 1)
+        Submission.objects.filter(title="Async Rust").update(submitted_on=last_year)
+
+    def get_results(self, **params):
+        return self.client.get(reverse("search_submissions"), params).json()["results"]
+
+    def test_requires_programme_committee(self):
+        self.client.force_login(self.submitter)
+        response = self.client.get(reverse("search_submissions"), {"q": "async"})
+        self.assertEqual(response.status_code, 403)
+
+    def test_search_and_year_filter(self):
+        self.client.force_login(self.reviewer)
+        self.assertEqual(
+            sorted(result["title"] for result in self.get_results(q="async")), ["Async Python", "Async Rust"],
+        )
+        results = self.get_results(q="async", year=timezone.localtime(timezone.now()).year)
+        self.assertEqual([result["title"] for result in results], ["Async Python"])
+        self.assertEqual(self.get_results(q=""), [])
+
+    def test_submission_list_searches_full_text(self):
+        self.client.force_login(self.reviewer)
+        data = self.client.get(reverse("list_submissions_data"), {"draw": 1, "search[value]": "typ"}).json()
+        self.assertEqual([row["title"] for row in data["data"]], ["Typing"])
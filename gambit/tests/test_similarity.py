@@ -0,0 +1,90 @@
+import io
+
+from django.urls import reverse
+from django.test import TestCase
+from django.contrib.auth.models import Group
+from django.core.management import call_command
+
+from . import factories
+from gambit import similarity
+from gambit.models import Submission, SimilarityBucket
+
+
+ABSTRACT = (
+    "Type hints have gone from a curiosity to something most large Python codebases rely on. This talk walks through "
+    "adopting a type checker in a ten year old application, the bugs it found on the first day, the annotations that "
+    "paid for themselves and the ones we regret, and how to keep a gradual migration moving without stopping feature "
+    "work."
+)
+UNRELATED = (
+    "Most teams only find out that their backups are broken when they need them. We describe how we restore every "
+    "database into a scratch environment each night, check the result against production and page someone when the "
+    "numbers drift, using nothing more exotic than cron and a few shell scripts."
+)
+
+
+class SignatureTest(TestCase):
+    def test_identical_text_is_identical(self):
+        signature = similarity.get_signature(ABSTRACT)
+        self.assertEqual(len(signature), similarity.NUM_PERMUTATIONS * 4)
+        self.assertEqual(similarity.estimate_similarity(signature, similarity.get_signature(ABSTRACT.upper())), 1)
+
+    def test_estimates_similarity(self):
+        signature = similarity.get_signature(ABSTRACT)
+        edited = ABSTRACT.replace("ten year old", "fifteen year old")
+        self.assertGreater(similarity.estimate_similarity(signature, similarity.get_signature(edited)), 0.7)
+        self.assertLess(similarity.estimate_similarity(signature, similarity.get_signature(UNRELATED)), 0.2)
+
+    def test_short_text_has_no_signature(self):
+        self.assertIsNone(similarity.get_signature("To be confirmed"))
+
+    def test_band_keys(self):
+        keys = similarity.get_band_keys(similarity.get_signature(ABSTRACT))
+        self.assertEqual(len(set(keys)), similarity.BANDS)
+        self.assertTrue(all(-2 ** 63 <= key < 2 ** 63 for key in keys))
+
+
+class SimilarSubmissionsTest(TestCase):
+    def setUp(self):
+        self.submitter = factories.UserFactory.create(username="submitter")
+        self.original = factories.SubmissionFactory.create(user=self.submitter, title="Typing", abstract=ABSTRACT)
+        self.resubmission = factories.SubmissionFactory.create(
+            user=self.submitter, title="Gradual typing in anger", abstract=ABSTRACT.replace("ten", "twelve"),
+        )
+        self.unrelated = factories.SubmissionFactory.create(user=self.submitter, title="Backups", abstract=UNRELATED)
+
+    def test_finds_resubmissions_in_one_query(self):
+        with self.assertNumQueries(1):
+            similar = self.original.get_similar()
+        self.assertEqual(similar, [self.resubmission])
+        self.assertGreater(similar[0].similarity, 0.7)
+        self.assertEqual(self.unrelated.get_similar(), [])
+
+    def test_buckets_follow_changes(self):
+        self.resubmission.abstract = UNRELATED
+        self.resubmission.save()
+        self.assertEqual(self.original.get_similar(), [])
+        self.assertEqual(self.unrelated.get_similar(), [self.resubmission])
+        self.resubmission.abstract = ""
+        self.resubmission.save()
+        self.assertFalse(SimilarityBucket.objects.filter(submission=self.resubmission).exists())
+
+    def test_rebuild_command(self):
+        SimilarityBucket.objects.all().delete()
+        Submission.objects.update(minhash=None)
+        call_command("rebuild_similarity", workers=1, batch_size=2, stdout=io.StringIO())
+        original = Submission.objects.get(pk=self.original.pk)
+        self.assertEqual(original.get_similar(), [self.resubmission])
+        self.assertEqual(SimilarityBucket.objects.count(), 3 * similarity.BANDS)
+
+    def test_shown_to_programme_committee(self):
+        programme_committee, created = Group.objects.get_or_create(name="Programme Committee")
+        reviewer = factories.UserFactory.create(username="reviewer")
+        reviewer.groups.add(programme_committee)
+        url = reverse("submission", args=[self.original.uuid])
+        self.client.force_login(reviewer)
+        response = self.client.get(url)
+        self.assertEqual(response.context["similar_submissions"], [self.resubmission])
+        self.assertContains(response, "Gradual typing in anger")
+        self.client.force_login(self.submitter)
+        self.assertNotContains(self.client.get(url), "Gradual typing in anger")
@@ -0,0 +1,73 @@
+from datetime import timedelta
+
+from django.urls import reverse
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from django.core.cache import cache
+
+from . import factories
+from gambit import singletons
+from gambit.models import SubmissionDeadline, FrontPage
+
+
+class SingletonCacheTest(TestCase):
+    def setUp(self):
+        # Test transactions are rolled back without sending post_delete, so start every test from a cold cache
+        singletons.clear()
+        cache.clear()
+
+    def tearDown(self):
+        singletons.clear()
+        cache.clear()
+
+    def test_singleton_is_served_from_cache(self):
+        deadline = SubmissionDeadline.objects.create(name="Deadline")
+        with self.assertNumQueries(1):
+            self.assertEqual(singletons.get_submission_deadline(), deadline)
+            self.assertEqual(singletons.get_submission_deadline(), deadline)
+
+    def test_missing_deadline_closes_submissions(self):
+        user = factories.UserFactory.create()
+        self.client.force_login(user)
+        response = self.client.get(reverse("submit"))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context["deadline_missing"])
+
+    def test_open_deadline_accepts_submissions(self):
+        SubmissionDeadline.objects.create(name="Deadline", date=timezone.now() + timedelta(days=1))
+        user = factories.UserFactory.create()
+        self.client.force_login(user)
+        response = self.client.get(reverse("submit"))
+        self.assertIn("form", response.context)
+
+
+# Caches are invalidated once a change is committed, which TestCase never does
+class SingletonInvalidationTest(TransactionTestCase):
+    def setUp(self):
+        singletons.clear()
+        cache.clear()
+
+    def tearDown(self):
+        singletons.clear()
+        cache.clear()
+
+    def test_save_and_delete_invalidate_cache(self):
+        front_page = FrontPage.objects.create(name="Front Page", leading_paragraph="Before")
+        self.assertEqual(singletons.get_front_page().leading_paragraph, "Before")
+        front_page.leading_paragraph = "After"
+        front_page.save()
+        self.assertEqual(singletons.get_front_page().leading_paragraph, "After")
+        front_page.delete()
+        self.assertIsNone(singletons.get_front_page())
+
+    def test_invalidated_when_the_change_is_committed(self):
+        front_page = FrontPage.objects.create(name="Front Page", leading_paragraph="Before")
+        self.assertEqual(singletons.get_front_page().leading_paragraph, "Before")
+        with transaction.atomic():
+            front_page.leading_paragraph = "After"
+            front_page.save()
+            # Another worker still reads the committed value until then
+            singletons.clear()
+            self.assertEqual(singletons.get_front_page().leading_paragraph, "Before")
+        self.assertEqual(singletons.get_front_page().leading_paragraph, "After")
@@ -0,0 +1,77 @@
+import os
+import shutil
+import tempfile
+
+from django.db import transaction
+from django.test import TransactionTestCase
+from django.test.utils import override_settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from . import factories
+from gambit.models import Submission
+
+
+# Files are released once the transaction commits, which TestCase never does
+class ContentAddressedStorageTest(TransactionTestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.user = factories.UserFactory.create()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root)
+
+    def create_submission(self, content, filename="talk.pdf"):
+        upload = SimpleUploadedFile(filename, content, content_type="application/pdf")
+        return factories.SubmissionFactory.create(user=self.user, file=upload)
+
+    def stored_files(self):
+        return sorted(
+            os.path.relpath(os.path.join(directory, name), self.media_root)
+            for directory, _, names in os.walk(self.media_root) for name in names
+        )
+
+    def test_file_is_stored_under_its_hash(self):
+        submission = self.create_submission(b"slides")
+        digest = submission.file_hash
+        self.assertEqual(submission.file.name, f"uploads/blobs/{digest[:2]}/{digest[2:4]}/{digest}.pdf")
+        self.assertEqual(submission.get_file_name(), "talk.pdf")
+        self.assertEqual(self.stored_files(), [submission.file.name])
+
+    def test_identical_uploads_share_one_file(self):
+        first = self.create_submission(b"slides", "talk.pdf")
+        second = self.create_submission(b"slides", "same-talk.pdf")
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertEqual(second.get_file_name(), "same-talk.pdf")
+        self.assertEqual(len(self.stored_files()), 1)
+
+    def test_file_is_deleted_with_its_last_reference(self):
+        first = self.create_submission(b"slides")
+        second = self.create_submission(b"slides")
+        first.delete()
+        self.assertEqual(self.stored_files(), [second.file.name])
+        second.delete()
+        self.assertEqual(self.stored_files(), [])
+
+    def test_replaced_file_is_released(self):
+        submission = self.create_submission(b"first draft")
+        submission.file = SimpleUploadedFile("talk.pdf", b"second draft", content_type="application/pdf")
+        submission.save()
+        self.assertEqual(self.stored_files(), [Submission.objects.get(pk=submission.pk).file.name])
+
+    def test_rolled_back_changes_keep_the_file(self):
+        submission = self.create_submission(b"slides")
+        name = submission.file.name
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                Submission.objects.get(pk=submission.pk).delete()
+                raise RuntimeError("rolled back")
+        self.assertEqual(self.stored_files(), [name])
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                submission.file = SimpleUploadedFile("talk.pdf", b"second draft", content_type="application/pdf")
+                submission.save()
+                raise RuntimeError("rolled back")
+        self.assertIn(name, self.stored_files())
@@ -19,3 +19,17 @@ class HasGroup(TestCase):
     def test_has_group_permission(self):
         rendered = self.TEMPLATE.render(Context({'user': self.user}))
         self.assertIn(rendered, "Success")
+
+    def test_has_group_queries_once_per_user(self):
+        template = Template(
+            "{% load has_group %}{% if user|has_group:'test_group' %}A{% endif %}"
+            "{% if user|has_group:'other_group' %}B{% endif %}{% if user|has_group:'test_group' %}C{% endif %}"
+        )
+        with self.assertNumQueries(1):
+            rendered = template.render(Context({'user': self.user}))
+        self.assertEqual(rendered, "AC")
+
+    def test_has_group_sees_membership_changes(self):
+        self.assertEqual(self.TEMPLATE.render(Context({'user': self.user})), "Success")
+        self.user.groups.clear()
+        self.assertEqual(self.TEMPLATE.render(Context({'user': self.user})), "")
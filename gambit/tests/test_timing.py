@@ -0,0 +1,51 @@
+import shutil
+import tempfile
+
+from django.urls import reverse
+from django.test import TestCase
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.test.utils import override_settings
+
+from . import factories
+from gambit import timing, singletons
+
+
+class ServerTimingMiddlewareTest(TestCase):
+    def setUp(self):
+        singletons.clear()
+        cache.clear()
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=1, SERVER_TIMING_LOG=True)
+    def test_sampled_request_reports_timings(self):
+        with self.assertLogs("gambit.timing", "INFO") as logs:
+            response = self.client.get(reverse("home"))
+        metrics = {metric.split(";")[0] for metric in response["Server-Timing"].split(", ")}
+        self.assertEqual(metrics, {"db", "template", "total"})
+        self.assertIn("view=home method=GET path=/ status=200", logs.output[0])
+        self.assertIn("db_count=", logs.output[0])
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=0)
+    def test_disabled(self):
+        response = self.client.get(reverse("home"))
+        self.assertNotIn("Server-Timing", response)
+
+
+class TimedTest(TestCase):
+    def test_submission_save_records_hashing_and_storage(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.assertIsNone(timing.stop())
+        with override_settings(MEDIA_ROOT=media_root):
+            timings = timing.start()
+            try:
+                factories.SubmissionFactory.create(file=ContentFile(b"slides", name="talk.pdf"))
+            finally:
+                timing.stop()
+        self.assertEqual(timings.counts["hash"], 1)
+        self.assertEqual(timings.counts["storage"], 1)
+
+    def test_nothing_recorded_outside_a_sample(self):
+        with timing.timed("db"):
+            pass
+        self.assertIsNone(timing.stop())
@@ -0,0 +1,69 @@
+import shutil
+import hashlib
+import tempfile
+from datetime import timedelta
+
+from django.urls import reverse
+from django.test import TestCase
+from django.utils import timezone
+from django.core.cache import cache
+from django.test.utils import override_settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from prometheus_client import REGISTRY
+
+from . import factories
+from gambit import singletons
+from gambit.models import Submission, SubmissionDeadline
+
+
+class HashingUploadHandlerTest(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        singletons.clear()
+        cache.clear()
+        SubmissionDeadline.objects.create(name="Deadline", date=timezone.now() + timedelta(days=1))
+        self.user = factories.UserFactory.create()
+        self.client.force_login(self.user)
+        with open("gambit/tests/sample_correct_file.pdf", "rb") as f:
+            self.content = f.read()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root)
+        singletons.clear()
+
+    def submit(self):
+        upload = SimpleUploadedFile("talk.pdf", self.content, content_type="application/pdf")
+        self.client.post(reverse("submit"), {
+            'title': "Hashed upload",
+            'contact_email': "speaker@example.org",
+            'file': upload,
+        })
+        return Submission.objects.get(title="Hashed upload")
+
+    def test_hashing_is_observed_once_per_file(self):
+        # The sample file arrives in several 64 KB chunks
+        before = REGISTRY.get_sample_value("gambit_file_hash_duration_seconds_count")
+        self.submit()
+        self.assertEqual(REGISTRY.get_sample_value("gambit_file_hash_duration_seconds_count"), before + 1)
+
+    def test_upload_is_hashed_in_memory(self):
+        submission = self.submit()
+        self.assertEqual(submission.file_hash, hashlib.sha512(self.content).hexdigest())
+
+    @override_settings(FILE_UPLOAD_MAX_MEMORY_SIZE=0)
+    def test_upload_is_hashed_on_disk(self):
+        submission = self.submit()
+        self.assertEqual(submission.file_hash, hashlib.sha512(self.content).hexdigest())
+
+    def test_save_uses_digest_from_upload_handler(self):
+        upload = SimpleUploadedFile("talk.pdf", self.content, content_type="application/pdf")
+        upload.sha512 = "precomputed"
+        submission = factories.SubmissionFactory.create(user=self.user, file=upload)
+        self.assertEqual(submission.file_hash, "precomputed")
+        # Saving again without a new file keeps the stored hash without reading the file back
+        submission.title = "Renamed"
+        submission.save()
+        self.assertEqual(Submission.objects.get(pk=submission.pk).file_hash, "precomputed")
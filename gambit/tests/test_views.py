@@ -0,0 +1,220 @@
+import base64
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.urls import reverse
+from django.test import TestCase
+from django.utils import timezone
+from django.test.utils import override_settings
+from django.contrib.auth.models import Group
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from . import factories
+from gambit.pagination import decode_cursor
+from gambit.models import Submission, SubmissionReview
+
+
+class ListSubmissionDataTest(TestCase):
+    def setUp(self):
+        programme_committee, created = Group.objects.get_or_create(name="Programme Committee")
+        self.reviewer = factories.UserFactory.create(username="reviewer")
+        self.reviewer.groups.add(programme_committee)
+        self.submitter = factories.UserFactory.create(username="submitter")
+        for index, title in enumerate(["Alpha", "Bravo", "Charlie"]):
+            submission = factories.SubmissionFactory.create(user=self.submitter, title=title)
+            for score in range(1, index + 2):
+                factories.SubmissionReviewFactory.create(
+                    submission=submission,
+                    user=self.reviewer,
+                    submission_score=score,
+                )
+        # Push one submission into last year so that the year filter has something to exclude
+        last_year = timezone.now().replace(year=timezone.now().year - 1)
+        Submission.objects.filter(title="Alpha").update(submitted_on=last_year)
+
+    def get_data(self, **params):
+        return self.client.get(reverse("list_submissions_data"), {"draw": 1, **params}).json()
+
+    def test_requires_programme_committee(self):
+        self.client.force_login(self.submitter)
+        response = self.client.get(reverse("list_submissions_data"))
+        self.assertEqual(response.status_code, 403)
+
+    def test_paging_and_ordering_by_score(self):
+        self.client.force_login(self.reviewer)
+        data = self.get_data(**{"start": 0, "length": 2, "order[0][column]": 2, "order[0][dir]": "desc"})
+        self.assertEqual(data["draw"], 1)
+        self.assertEqual(data["recordsTotal"], 3)
+        self.assertEqual(data["recordsFiltered"], 3)
+        self.assertEqual([row["title"] for row in data["data"]], ["Charlie", "Bravo"])
+        self.assertEqual(data["data"][0]["review_count"], 3)
+
+    def test_search_and_year_filter(self):
+        self.client.force_login(self.reviewer)
+        data = self.get_data(**{"search[value]": "bravo"})
+        self.assertEqual(data["recordsFiltered"], 1)
+        self.assertEqual(data["data"][0]["title"], "Bravo")
+        data = self.get_data(year=timezone.localtime(timezone.now()).year)
+        self.assertEqual(data["recordsFiltered"], 2)
+        self.assertNotIn("Alpha", [row["title"] for row in data["data"]])
+
+    def test_search_matches_text_or_submitter(self):
+        self.submitter.profile.name = "Charlie Brown"
+        self.submitter.profile.country = "Wales"
+        self.submitter.profile.save()
+        other = factories.UserFactory.create(username="other")
+        factories.SubmissionFactory.create(user=other, title="Delta", abstract="Told by Charlie Brown")
+        self.client.force_login(self.reviewer)
+        data = self.get_data(**{"search[value]": "wales"})
+        self.assertEqual(sorted(row["title"] for row in data["data"]), ["Alpha", "Bravo", "Charlie"])
+        # Matches in either way are counted once
+        data = self.get_data(**{"search[value]": "charlie", "year": timezone.localtime(timezone.now()).year})
+        self.assertEqual(data["recordsFiltered"], 3)
+        self.assertEqual(sorted(row["title"] for row in data["data"]), ["Bravo", "Charlie", "Delta"])
+
+    def test_query_count_is_constant(self):
+        self.client.force_login(self.reviewer)
+        # The reviews are only loaded when the calibrated scores aren't already cached
+        self.get_data(length=100)
+        # Session, user, group check, total count and the page itself
+        with self.assertNumQueries(5):
+            self.get_data(length=100)
+
+
+class ViewSubmissionTest(TestCase):
+    def setUp(self):
+        programme_committee, created = Group.objects.get_or_create(name="Programme Committee")
+        self.submitter = factories.UserFactory.create(username="submitter")
+        self.submission = factories.SubmissionFactory.create(user=self.submitter, title="Talk")
+        self.reviewers = []
+        for name in ["first", "second"]:
+            reviewer = factories.UserFactory.create(username=name)
+            reviewer.groups.add(programme_committee)
+            reviewer.profile.name = f"{name.title()} Reviewer"
+            reviewer.profile.save()
+            self.reviewers.append(reviewer)
+        self.review = factories.SubmissionReviewFactory.create(submission=self.submission, user=self.reviewers[1])
+        self.url = reverse("submission", args=[self.submission.uuid])
+
+    def test_reviews_and_own_review_for_programme_committee(self):
+        self.client.force_login(self.reviewers[1])
+        # Session, user, groups, the submission with its submitter and the reviews with their reviewers
+        with self.assertNumQueries(5):
+            response = self.client.get(self.url)
+        self.assertTrue(response.context["has_reviewed"])
+        self.assertEqual(response.context["review_uuid"], self.review.uuid)
+        self.assertContains(response, "Second Reviewer")
+        self.client.force_login(self.reviewers[0])
+        self.assertFalse(self.client.get(self.url).context["has_reviewed"])
+
+    def test_submitter_sees_no_reviews(self):
+        self.client.force_login(self.submitter)
+        response = self.client.get(self.url)
+        self.assertEqual(response.context["reviews"], [])
+        self.assertNotContains(response, "Second Reviewer")
+
+    def test_missing_submission(self):
+        self.client.force_login(self.submitter)
+        response = self.client.get(reverse("submission", args=["00000000-0000-0000-0000-000000000000"]))
+        self.assertEqual(response.status_code, 404)
+
+
+class ViewProfileTest(TestCase):
+    def setUp(self):
+        programme_committee, created = Group.objects.get_or_create(name="Programme Committee")
+        self.reviewer = factories.UserFactory.create(username="reviewer")
+        self.reviewer.groups.add(programme_committee)
+        submitter = factories.UserFactory.create(username="submitter")
+        for index in range(5):
+            submission = factories.SubmissionFactory.create(user=submitter, title=f"Talk {index}")
+            factories.SubmissionReviewFactory.create(submission=submission, user=self.reviewer)
+        # Reviews written in the same instant are still paged in a stable order
+        SubmissionReview.objects.update(submitted_on=timezone.now())
+
+    @mock.patch("gambit.views.ViewProfile.paginate_by", 2)
+    def test_reviews_are_paged_by_cursor(self):
+        self.client.force_login(self.reviewer)
+        seen = []
+        cursor = None
+        while True:
+            # Session, user, groups, profile, submissions and reviews, whichever page it is
+            with self.assertNumQueries(6):
+                response = self.client.get(reverse("profile"), {"reviews": cursor} if cursor else {})
+            page = response.context["reviews"]
+            seen += [review.submission.title for review in page.items]
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+            self.assertContains(response, "Older")
+        self.assertEqual(sorted(seen), [f"Talk {index}" for index in range(5)])
+
+    def test_invalid_cursor_shows_first_page(self):
+        self.client.force_login(self.reviewer)
+        response = self.client.get(reverse("profile"), {"reviews": "not a cursor"})
+        self.assertTrue(response.context["reviews"].is_first)
+        self.assertEqual(len(response.context["reviews"].items), 5)
+
+    def test_cursor_with_invalid_uuid_shows_first_page(self):
+        cursor = base64.urlsafe_b64encode(b"2020-01-01T00:00:00+00:00|nope").decode()
+        self.assertIsNone(decode_cursor(cursor))
+        self.client.force_login(self.reviewer)
+        response = self.client.get(reverse("profile"), {"submissions": cursor, "reviews": cursor})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context["submissions"].is_first)
+        self.assertTrue(response.context["reviews"].is_first)
+
+    @mock.patch("gambit.views.ViewProfile.paginate_by", 2)
+    def test_pager_links_keep_the_other_lists_cursor(self):
+        for index in range(3):
+            factories.SubmissionFactory.create(user=self.reviewer, title=f"Own talk {index}")
+        self.client.force_login(self.reviewer)
+        response = self.client.get(reverse("profile"))
+        submissions_cursor = response.context["submissions"].next_cursor
+        reviews_cursor = response.context["reviews"].next_cursor
+        response = self.client.get(reverse("profile"), {"submissions": submissions_cursor, "reviews": reviews_cursor})
+        links = response.context["reviews_links"]
+        self.assertEqual(links["newest"], f"submissions={submissions_cursor}")
+        self.assertIn(f"submissions={submissions_cursor}", links["older"])
+        self.assertIn(f"reviews={response.context['reviews'].next_cursor}", links["older"])
+        links = response.context["submissions_links"]
+        self.assertEqual(links["newest"], f"reviews={reviews_cursor}")
+        self.assertIsNone(links["older"])
+        self.assertContains(response, f'href="{reverse("profile")}?reviews={reviews_cursor}"')
+
+
+class SubmissionFileViewTest(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.submitter = factories.UserFactory.create(username="submitter")
+        self.other_user = factories.UserFactory.create(username="other")
+        upload = SimpleUploadedFile("talk.pdf", b"slides", content_type="application/pdf")
+        self.submission = factories.SubmissionFactory.create(user=self.submitter, file=upload)
+        self.url = reverse("download_submission", args=[self.submission.uuid])
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root)
+
+    def test_streams_file_in_process(self):
+        self.client.force_login(self.submitter)
+        response = self.client.get(self.url)
+        self.assertEqual(b"".join(response.streaming_content), b"slides")
+        self.assertNotIn("X-Accel-Redirect", response)
+
+    @override_settings(
+        MIDDLEWARE=list(settings.MIDDLEWARE) + ['django_downloadview.SmartDownloadMiddleware'],
+        DOWNLOADVIEW_BACKEND='django_downloadview.nginx.XAccelRedirectMiddleware',
+        DOWNLOADVIEW_RULES=[{'source_url': settings.MEDIA_URL, 'destination_url': '/protected-media/'}],
+    )
+    def test_offloads_file_to_nginx(self):
+        self.client.force_login(self.submitter)
+        response = self.client.get(self.url)
+        self.assertEqual(response["X-Accel-Redirect"], f"/protected-media/{self.submission.file.name}")
+        self.client.force_login(self.other_user)
+        response = self.client.get(self.url)
+        self.assertNotIn("X-Accel-Redirect", response)
+        self.assertEqual(response.status_code, 403)
@@ -0,0 +1,159 @@
+import time
+import random
+import logging
+import threading
+from contextlib import contextmanager, ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.core.exceptions import MiddlewareNotUsed
+from django.template import TemplateDoesNotExist
+from django.template.backends import django as django_backend
+
+
+logger = logging.getLogger(__name__)
+
+
+# Per-request timing of the expensive parts of a request: SQL queries, template rendering, hashing of submission files
+# and file storage I/O. ServerTimingMiddleware starts collecting for a sample of requests and reports what was
+# collected as a Server-Timing header and/or a log line. Outside a sampled request, timed() does nothing but a couple
+# of lookups unless an observer wants the timing, so instrumented code costs next to nothing when it isn't measured.
+
+_local = threading.local()
+
+# Name -> callable given the duration, in seconds, of every timed() block with that name, sampled or not. Used by
+# gambit.metrics to feed histograms from the same instrumentation.
+observers = {}
+
+
+class Timings:
+    """Cumulative durations, in seconds, and counts of each kind of timed work"""
+
+    def __init__(self):
+        self.durations = {}
+        self.counts = {}
+
+    def add(self, name, seconds):
+        self.durations[name] = self.durations.get(name, 0) + seconds
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+
+def start():
+    """Start collecting timings in this thread"""
+    _local.timings = Timings()
+    return _local.timings
+
+
+def stop():
+    """Stop collecting timings in this thread, returning what was collected"""
+    timings = getattr(_local, "timings", None)
+    _local.timings = None
+    return timings
+
+
+@contextmanager
+def timed(name):
+    """Add the time spent in the block to the named timing, if timings are being collected, and to its observer"""
+    timings = getattr(_local, "timings", None)
+    observer = observers.get(name)
+    if timings is None and observer is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - started)
+
+
+def record(name, seconds):
+    """Add a duration measured some other way to the named timing, as timed() does, e.g. the total of several parts"""
+    timings = getattr(_local, "timings", None)
+    if timings is not None:
+        timings.add(name, seconds)
+    observer = observers.get(name)
+    if observer is not None:
+        observer(seconds)
+
+
+def _time_query(execute, sql, params, many, context):
+    with timed("db"):
+        return execute(sql, params, many, context)
+
+
+class Template(django_backend.Template):
+    def render(self, context=None, request=None):
+        with timed("template"):
+            return super(Template, self).render(context, request)
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """The Django template backend, with the time spent rendering each template recorded as "template"
+
+    Only templates rendered through the backend (i.e. by views, not {% include %}) are timed, so nested templates
+    aren't counted twice.
+    """
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            django_backend.reraise(exc, self)
+
+
+class ServerTimingMiddleware:
+    """Report where the time went in a sample of requests
+
+    SERVER_TIMING_SAMPLE_RATE is the fraction of requests measured (0 disables the middleware entirely). Measured
+    requests get a Server-Timing header, unless SERVER_TIMING_HEADER is off, and a log line on the gambit.timing
+    logger if SERVER_TIMING_LOG is on.
+    """
+
+    def __init__(self, get_response):
+        if settings.SERVER_TIMING_SAMPLE_RATE <= 0:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.SERVER_TIMING_SAMPLE_RATE:
+            return self.get_response(request)
+        timings = start()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(_time_query))
+                response = self.get_response(request)
+        finally:
+            stop()
+        total = time.perf_counter() - started
+        if settings.SERVER_TIMING_HEADER:
+            response["Server-Timing"] = self.get_header(timings, total)
+        if settings.SERVER_TIMING_LOG:
+            self.log(request, response, timings, total)
+        return response
+
+    def get_header(self, timings, total):
+        metrics = [
+            f'{name};dur={seconds * 1000:.1f};desc="{timings.counts[name]}"'
+            for name, seconds in sorted(timings.durations.items())
+        ]
+        metrics.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(metrics)
+
+    def log(self, request, response, timings, total):
+        match = request.resolver_match
+        fields = {
+            "view": match.view_name if match else None,
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "total_ms": round(total * 1000, 1),
+        }
+        for name, seconds in sorted(timings.durations.items()):
+            fields[f"{name}_ms"] = round(seconds * 1000, 1)
+            fields[f"{name}_count"] = timings.counts[name]
+        logger.info(" ".join(f"{key}={value}" for key, value in fields.items()), extra={"timing": fields})
@@ -0,0 +1,48 @@
+import time
+import hashlib
+
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+
+from . import timing
+from .metrics import observe_upload
+
+
+class HashingUploadMixin:
+    """Computes the SHA-512 digest of an upload as its chunks arrive
+
+    The hex digest is attached to the resulting UploadedFile as ``sha512``, which saves reading the whole file back a
+    second time to hash it when it is saved.
+    """
+
+    def new_file(self, *args, **kwargs):
+        # Set up before calling super(), as MemoryFileUploadHandler raises StopFutureHandlers once it claims the file
+        self.sha512 = hashlib.sha512()
+        self.hash_seconds = 0
+        self.started = time.perf_counter()
+        super(HashingUploadMixin, self).new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        remaining = super(HashingUploadMixin, self).receive_data_chunk(raw_data, start)
+        # Handlers return the chunk when they pass it on to the next handler instead of storing it
+        if remaining is None:
+            # Added up and recorded once the file is complete, so that the timing is per file rather than per chunk
+            started = time.perf_counter()
+            self.sha512.update(raw_data)
+            self.hash_seconds += time.perf_counter() - started
+        return remaining
+
+    def file_complete(self, file_size):
+        file = super(HashingUploadMixin, self).file_complete(file_size)
+        if file is not None:
+            file.sha512 = self.sha512.hexdigest()
+            timing.record("hash", self.hash_seconds)
+            observe_upload(file_size, time.perf_counter() - self.started)
+        return file
+
+
+class HashingMemoryFileUploadHandler(HashingUploadMixin, MemoryFileUploadHandler):
+    pass
+
+
+class HashingTemporaryFileUploadHandler(HashingUploadMixin, TemporaryFileUploadHandler):
+    pass
@@ -6,7 +6,7 @@ from django.urls import reverse_lazy, path, re_path
 from django.contrib.auth import views as auth_views
 
 
-from . import views
+from . import views, metrics
 from .forms import LoginForm, ResetUserPasswordForm, SetUserPasswordForm, ChangeUserPasswordForm
 
 
@@ -22,9 +22,12 @@ urlpatterns = [
     path("update_profile/", views.UpdateProfile.as_view(), name="update_profile",),
     path("signup/", views.signup, name="signup",),
     path("help/", views.Help.as_view(), name="help",),
+    path("metrics/", metrics.metrics, name="metrics",),
     path("account_activation_sent/", views.account_activation_sent, name="account_activation_sent",),
     path("submit/", views.submit_form_upload, name="submit",),
     path("submissions/", views.ListSubmission.as_view(), name="list_submissions",),
+    path("submissions/data/", views.ListSubmissionData.as_view(), name="list_submissions_data",),
+    path("submissions/search/", views.SearchSubmissions.as_view(), name="search_submissions",),
 
     path("download/submission/<uuid:pk>/",
         views.SubmissionFileView.as_view(),
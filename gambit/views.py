@@ -1,5 +1,12 @@
+import logging
+
+from django.conf import settings
+from django.db.models import Q
+from django.db import transaction, IntegrityError
 from django.urls import reverse
 from django.views import generic
+from django.http import JsonResponse
+from django.template import defaultfilters
 from django.utils import timezone
 from django.contrib import messages
 from django.contrib.auth.models import User
@@ -16,8 +23,15 @@ from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 
 from .tokens import account_activation_token
 from .forms import SignUpForm, SubmitForm, SubmissionReviewForm, FrontPageLoginForm, UpdateProfileForm
-from .models import (Submission, SubmissionReview, FrontPage, SubmissionDeadline, RegistrationStatus, HelpPageItem,
-    Profile)
+from .models import Submission, SubmissionReview, Profile
+from .search import InSubquery, search_filter, search as search_submissions
+from .pagination import paginate, page_links
+from .ranking import get_ranking
+from .permissions import is_programme_committee
+from .singletons import get_front_page, get_help_page_items, get_registration_status, get_submission_deadline
+
+
+logger = logging.getLogger(__name__)
 
 
 class Home(generic.edit.FormMixin, generic.TemplateView):
@@ -50,23 +64,26 @@ class Home(generic.edit.FormMixin, generic.TemplateView):
     def get_context_data(self, **kwargs):
         """Return front page content"""
         context = super(Home, self).get_context_data(**kwargs)
-        try:
-            context["front_page"] = FrontPage.objects.first()
-        except FrontPage.DoesNotExist:
-            context["front_page"] = None
+        context["front_page"] = get_front_page()
         return context
 
 
 class ViewProfile(mixins.LoginRequiredMixin, generic.TemplateView):
     template_name = "gambit/profile_view.html"
     login_url = "login"
+    paginate_by = 50
 
     def get_context_data(self, **kwargs):
-        """Return submissions"""
+        """Return a page each of submissions and reviews"""
         context = super(ViewProfile, self).get_context_data(**kwargs)
-        context["submissions"] = self.request.user.profile.get_submissions()
-        if self.request.user.groups.filter(name="Programme Committee").exists():
-            context["reviews"] = self.request.user.profile.get_reviews()
+        profile = self.request.user.profile
+        params = self.request.GET
+        context["submissions"] = paginate(profile.get_submissions(), params.get("submissions"), self.paginate_by)
+        context["submissions_links"] = page_links(params, "submissions", context["submissions"])
+        context["is_programme_committee"] = is_programme_committee(self.request.user)
+        if context["is_programme_committee"]:
+            context["reviews"] = paginate(profile.get_reviews(), params.get("reviews"), self.paginate_by)
+            context["reviews_links"] = page_links(params, "reviews", context["reviews"])
         return context
 
 
@@ -107,24 +124,38 @@ class ViewSubmission(mixins.LoginRequiredMixin, mixins.UserPassesTestMixin, gene
     login_url = "login"
     redirect_field_name = "home"
 
+    # Fetched once, with the submitter's profile, for both the permission check and the page
+    def get_object(self):
+        if not hasattr(self, "_submission"):
+            self._submission = get_object_or_404(
+                Submission.objects.select_related("user__profile"),
+                uuid=self.kwargs.get('uuid'),
+            )
+        return self._submission
+
     def test_func(self):
         return self.request.user.is_superuser or \
-                self.request.user.groups.filter(name="Programme Committee").exists() or \
-                Submission.objects.get(uuid=self.kwargs.get('uuid')).user.id == self.request.user.id
+                is_programme_committee(self.request.user) or \
+                self.get_object().user_id == self.request.user.id
 
     def get_context_data(self, **kwargs):
         """Return submission data"""
         context = super(ViewSubmission, self).get_context_data(**kwargs)
-        context["submission"] = get_object_or_404(Submission, uuid=self.kwargs["uuid"])
+        context["submission"] = self.get_object()
         context["submission_file_name"] = context["submission"].get_file_name()
-        context["reviews"] = context["submission"].get_reviews()
-        context["has_reviewed"] = (
-            True
-            if SubmissionReview.objects.filter(submission=context["submission"], user=self.request.user).exists()
-            else False
-        )
+        # Only the Programme Committee can see or write reviews
+        reviews = []
+        similar_submissions = []
+        if is_programme_committee(self.request.user):
+            reviews = list(
+                SubmissionReview.objects.filter(submission=context["submission"]).select_related("user__profile")
+            )
+            similar_submissions = context["submission"].get_similar()
+        context["reviews"] = reviews
+        context["similar_submissions"] = similar_submissions
+        review = next((review for review in reviews if review.user_id == self.request.user.id), None)
+        context["has_reviewed"] = review is not None
         if context["has_reviewed"]:
-            review = SubmissionReview.objects.filter(submission=context["submission"], user=self.request.user).first()
             context["review_uuid"] = review.uuid
         return context
 
@@ -153,10 +184,20 @@ class SubmissionFileView(mixins.LoginRequiredMixin, mixins.UserPassesTestMixin,
     def __init__(self):
         self.model = Submission
 
+    # Stored file names are content hashes, so serve the file under the name it was uploaded with
+    def get_basename(self):
+        return self.object.get_file_name()
+
+    # The submission fetched for the permission check is reused to build the download
+    def get_object(self, queryset=None):
+        if not hasattr(self, "_submission"):
+            self._submission = get_object_or_404(Submission, uuid=self.kwargs.get('pk'))
+        return self._submission
+
     def test_func(self):
         return self.request.user.is_superuser or \
-                self.request.user.groups.filter(name="Programme Committee").exists() or \
-                Submission.objects.get(uuid=self.kwargs.get('pk')).user_id == self.request.user.id
+                is_programme_committee(self.request.user) or \
+                self.get_object().user_id == self.request.user.id
 
 
 class ListSubmission(mixins.LoginRequiredMixin, mixins.UserPassesTestMixin, generic.TemplateView):
@@ -166,13 +207,141 @@ class ListSubmission(mixins.LoginRequiredMixin, mixins.UserPassesTestMixin, gene
 
     # Is the logged in user an admin or a member of the PC?
     def test_func(self):
-        return self.request.user.is_superuser or self.request.user.groups.filter(name="Programme Committee").exists()
+        return self.request.user.is_superuser or is_programme_committee(self.request.user)
+
+
+class ListSubmissionData(ListSubmission):
+    """Serve the submission list to DataTables using its server-side processing protocol"""
+    # DataTables column index -> (name in the JSON rows, ORM field used for ordering and searching). The calibrated
+    # score comes from gambit.ranking rather than the database.
+    columns = (
+        ("title", "title"),
+        ("review_count", "review_count"),
+        ("average_score", "average_score"),
+        ("calibrated_score", None),
+        ("name", "user__profile__name"),
+        ("country", "user__profile__country"),
+        ("submitted_on", "submitted_on"),
+    )
+    # Profile fields of the submitter searched as well as the full text of the submission
+    searchable_fields = ("name", "country")
+    max_page_length = 100
+
+    def get(self, request, *args, **kwargs):
+        params = request.GET
+        submissions = Submission.objects.with_review_stats()
+        records_total = submissions.count()
+
+        year = _get_int(params, "year")
+        if year:
+            submissions = submissions.filter(submitted_on__year=year)
+        search = params.get("search[value]", "").strip()
+        if search:
+            submissions = submissions.filter(pk__in=self.search(search))
+        records_filtered = submissions.count() if year or search else records_total
+
+        start = max(_get_int(params, "start"), 0)
+        length = _get_int(params, "length", 10)
+        if not 0 < length <= self.max_page_length:
+            length = self.max_page_length
+        ranking = get_ranking()
+        ordering = self.get_ordering(params)
+        if any(field.lstrip("-") == "calibrated_score" for field in ordering):
+            # Calibrated scores aren't in the database, so the sort keys of the matching submissions are sorted here
+            # and only the page is fetched in full
+            names = [field.lstrip("-") for field in ordering]
+            stored = [name for name in names if name != "calibrated_score"]
+            rows = [dict(zip(["pk"] + stored, row)) for row in submissions.values_list("pk", *stored)]
+            # One column at a time from the least significant, relying on the sort being stable
+            for field, name in reversed(list(zip(ordering, names))):
+                if name == "calibrated_score":
+                    key = lambda row: ranking.sort_key(row["pk"])
+                else:
+                    key = lambda row, name=name: (row[name] is not None, row[name])
+                rows.sort(key=key, reverse=field.startswith("-"))
+            pks = [row["pk"] for row in rows[start:start + length]]
+            found = {submission.pk: submission for submission in submissions.filter(pk__in=pks)}
+            page = [found[pk] for pk in pks]
+        else:
+            page = submissions.order_by(*ordering)[start:start + length]
+
+        return JsonResponse({
+            "draw": _get_int(params, "draw"),
+            "recordsTotal": records_total,
+            "recordsFiltered": records_filtered,
+            "data": [self.get_row(submission, ranking.get(submission.pk)) for submission in page],
+        })
+
+    def search(self, search):
+        """Return a subquery of the keys of the submissions matching a search of their text or their submitter
+
+        The two are found by separate queries joined with UNION, each of which can use its own index, where a single
+        OR across the join to the submitter's profile could only be answered by scanning every submission.
+        """
+        profiles = Q()
+        for field in self.searchable_fields:
+            profiles |= Q(**{f"{field}__icontains": search})
+        queries = [Submission.objects.filter(user__in=Profile.objects.filter(profiles).values("user_id"))]
+        text = search_filter(search)
+        if text is not None:
+            queries.append(Submission.objects.filter(text))
+        sql, params = zip(*(query.order_by().values("pk").query.sql_with_params() for query in queries))
+        return InSubquery(" UNION ".join(sql), sum(params, ()))
+
+    def get_ordering(self, params):
+        ordering = []
+        index = 0
+        while f"order[{index}][column]" in params:
+            column = _get_int(params, f"order[{index}][column]", -1)
+            if 0 <= column < len(self.columns):
+                direction = "-" if params.get(f"order[{index}][dir]") == "desc" else ""
+                ordering.append(direction + (self.columns[column][1] or self.columns[column][0]))
+            index += 1
+        # The primary key makes the order total so that rows can't repeat or go missing between pages
+        return ordering + ["uuid"]
+
+    def get_row(self, submission, score=None):
+        profile = submission.user.profile
+        submitted_on = timezone.localtime(submission.submitted_on)
+        return {
+            "url": reverse("submission", args=[submission.uuid]),
+            "title": submission.title,
+            "review_count": submission.review_count,
+            "average_score": submission.average_score,
+            # Calibrated score and its 95% confidence interval, and how far the reviewers disagree, see gambit.ranking
+            "calibrated_score": round(score.score, 2) if score else None,
+            "score_interval": [round(score.low, 2), round(score.high, 2)] if score else None,
+            "controversy": round(score.controversy, 2) if score else None,
+            "name": profile.name,
+            "country": profile.country,
+            "submitted_on": defaultfilters.date(submitted_on, "Y-m-d"),
+            "submitted_on_long": defaultfilters.date(submitted_on, "d N Y"),
+            "own": submission.user_id == self.request.user.id,
+        }
 
-    def get_context_data(self, **kwargs):
-        """Return all submissions"""
-        context = super(ListSubmission, self).get_context_data(**kwargs)
-        context["submissions"] = Submission.objects.all().prefetch_related('user__profile')
-        return context
+
+class SearchSubmissions(ListSubmission):
+    """Return the submissions best matching a full-text search of their title, authors and abstract, as JSON"""
+    max_results = 20
+
+    def get(self, request, *args, **kwargs):
+        submissions = Submission.objects.with_review_stats()
+        year = _get_int(request.GET, "year")
+        if year:
+            submissions = submissions.filter(submitted_on__year=year)
+        matches = search_submissions(submissions, request.GET.get("q", ""))[:self.max_results]
+        return JsonResponse({
+            "results": [
+                {
+                    "url": reverse("submission", args=[submission.uuid]),
+                    "title": submission.title,
+                    "name": submission.user.profile.name,
+                    "submitted_on": defaultfilters.date(timezone.localtime(submission.submitted_on), "Y-m-d"),
+                    "rank": submission.search_rank,
+                }
+                for submission in matches
+            ],
+        })
 
 
 class CreateReview(SuccessMessageMixin, mixins.LoginRequiredMixin, mixins.UserPassesTestMixin, generic.edit.CreateView):
@@ -185,7 +354,7 @@ class CreateReview(SuccessMessageMixin, mixins.LoginRequiredMixin, mixins.UserPa
 
     # Is the logged in user an admin or a member of the PC?
     def test_func(self):
-        return self.request.user.is_superuser or self.request.user.groups.filter(name="Programme Committee").exists()
+        return self.request.user.is_superuser or is_programme_committee(self.request.user)
 
     def get_context_data(self, **kwargs):
         """Return submission data"""
@@ -215,7 +384,7 @@ class UpdateReview(SuccessMessageMixin, mixins.LoginRequiredMixin, mixins.UserPa
     # Is the logged in user an admin or a member of the PC?
     def test_func(self):
         return (self.request.user.is_superuser or \
-                self.request.user.groups.filter(name="Programme Committee").exists()) and \
+                is_programme_committee(self.request.user)) and \
                 SubmissionReview.objects.get(uuid=self.kwargs.get('pk')).user_id == self.request.user.id
 
     def get_context_data(self, **kwargs):
@@ -236,25 +405,38 @@ class Help(mixins.LoginRequiredMixin, generic.TemplateView):
     def get_context_data(self, **kwargs):
         """Return help page content"""
         context = super(Help, self).get_context_data(**kwargs)
-        context["help_page_items"] = HelpPageItem.objects.all()
+        context["help_page_items"] = get_help_page_items()
         return context
 
 
+def _get_int(params, key, default=0):
+    try:
+        return int(params.get(key, default))
+    except (TypeError, ValueError):
+        return default
+
 def signup(request):
-    registration_status = RegistrationStatus.objects.first()
-    if not registration_status.disabled:
+    registration_status = get_registration_status()
+    # Registration stays closed until a RegistrationStatus has been added and enabled
+    if registration_status is not None and not registration_status.disabled:
         if request.method == "POST":
             form = SignUpForm(request.POST)
             if form.is_valid():
-                user = form.save()
-                user.refresh_from_db()
-                user.profile.name = form.cleaned_data.get("name")
-                user.profile.country = form.cleaned_data.get("country")
-                user.profile.affiliation = form.cleaned_data.get("affiliation")
-                user.is_active = False
-                user.save()
+                try:
+                    with transaction.atomic():
+                        user = form.save()
+                        user.refresh_from_db()
+                        user.profile.name = form.cleaned_data.get("name")
+                        user.profile.country = form.cleaned_data.get("country")
+                        user.profile.affiliation = form.cleaned_data.get("affiliation")
+                        user.is_active = False
+                        user.save()
+                except IntegrityError:
+                    # Another signup took the username or email address after the form was validated
+                    form.add_error(None, "Username or email address has already been used.")
+                    return render(request, "gambit/signup.html", {"form": form})
                 current_site = get_current_site(request)
-                subject = f"[{CONFERENCE_NAME}] Activate your {CONFERENCE_NAME} CFP account"
+                subject = f"[{settings.CONFERENCE_NAME}] Activate your {settings.CONFERENCE_NAME} CFP account"
                 message = render_to_string("gambit/account_activation_email.html",
                     {
                         "user": user,
@@ -263,6 +445,7 @@ def signup(request):
                         "token": account_activation_token.make_token(user),
                     }
                 )
+                # Queued by gambit.mail.QueuedEmailBackend and delivered by the send_queued_mail worker
                 user.email_user(subject, message)
                 return redirect("account_activation_sent")
         else:
@@ -301,11 +484,15 @@ def account_activation_sent(request):
 @login_required(login_url="login")
 def submit_form_upload(request):
     # Prevent submissions after deadline has passed
-    try:
-        deadline = SubmissionDeadline.objects.first().date
-    except AttributeError as e:
-        raise SystemExit(f"No submission deadline has been added!\n{e!s}")
-    if timezone.now() <= deadline:
+    deadline = get_submission_deadline()
+    if deadline is None:
+        logger.error("No submission deadline has been added! Submissions are closed until one is.")
+        return render(request, "gambit/submit.html",
+            {
+                "deadline_missing": True,
+            }
+        )
+    if timezone.now() <= deadline.date:
         if request.method == "POST":
             form = SubmitForm(request.POST, request.FILES)
             if form.is_valid():
@@ -0,0 +1,18 @@
+import os
+import shutil
+
+
+# Share metrics between the gunicorn workers; see gambit/metrics.py. This must be set before anything imports
+# prometheus_client, which decides when it is first imported whether to keep values in the directory or in memory.
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/gambit-metrics")
+
+
+def on_starting(server):
+    # Values left over from a previous run would otherwise be added to this one's
+    shutil.rmtree(os.environ["PROMETHEUS_MULTIPROC_DIR"], ignore_errors=True)
+    os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"])
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)